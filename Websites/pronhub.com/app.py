@@ -7,11 +7,23 @@ from datetime import datetime
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import time
-import random
 import threading
-from queue import Queue
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from config import PROXY_CONFIG, HEADERS, BASE_URL, SCRAPER_CONFIG, OUTPUT_CONFIG, DEBUG, SSL_CONFIG, SELENIUM_CONFIG, DETAIL_PAGE_CONFIG
+import atexit
+import functools
+import hashlib
+import shutil
+import zlib
+from queue import Queue, Empty
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED, ALL_COMPLETED
+from config import PROXY_CONFIG, HEADERS, BASE_URL, SCRAPER_CONFIG, OUTPUT_CONFIG, DEBUG, SSL_CONFIG, SELENIUM_CONFIG, DETAIL_PAGE_CONFIG, DATABASE_CONFIG, CONCURRENCY_CONFIG
+from network import HttpSessionManager
+from async_fetcher import AsyncDetailFetcher
+from concurrency import AdaptiveConcurrency
+from downloads import DownloadScheduler, BandwidthGovernor
+from m3u8_extractor import extract_m3u8, quality_label
+from listing_parser import parse_listing_page
+from detail_extractor import extract_video_detail
 
 # Selenium相关导入
 from selenium import webdriver
@@ -27,6 +39,12 @@ from webdriver_manager.chrome import ChromeDriverManager
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# 可选的zstd压缩支持（未安装时HTML数据库使用zlib压缩）
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # 简化类型提示，避免导入问题
 try:
     from typing import Dict, List, Optional, Any
@@ -62,13 +80,121 @@ class DatabaseManager:
             # HTML数据库路径
             db_dir = os.path.dirname(db_path)
             self.html_db_path = os.path.join(db_dir, 'pornhub.com.html.db')
+        
+        # 每线程持久连接池（线程本地保存 {数据库路径: 连接}）
+        self._local = threading.local()
+        self._connections = []  # [(线程对象, 连接)]，用于关闭时统一清理
+        self._pool_lock = threading.Lock()
+        self._closed = False
+        
+        # 后台批量写入队列（write-behind）
+        self._write_queue = Queue()
+        self._writer_thread = None
+        self._writer_lock = threading.Lock()
+        self._pending_video_ids = set()  # 已入队但尚未提交的视频ID
+        self._pending_lock = threading.Lock()
+        self.write_stats = {'batches': 0, 'videos': 0, 'errors': 0}
+        self._write_failures = set()  # 后台写入失败的视频ID（take_write_failures取出）
+        self.fts_enabled = False  # init_database中检测FTS5可用后置为True
             
         self.init_database()
         self.init_html_database()
+        
+        # 进程退出时关闭所有连接
+        atexit.register(self.close)
+    
+    def _create_connection(self, path):
+        """创建并调优一个SQLite连接
+        
+        Args:
+            path: 数据库文件路径
+            
+        Returns:
+            sqlite3.Connection: 已设置PRAGMA的连接
+        """
+        conn = sqlite3.connect(
+            path,
+            timeout=DATABASE_CONFIG.get('busy_timeout', 30000) / 1000,
+            check_same_thread=False,  # 允许在关闭时由其他线程统一关闭
+        )
+        conn.row_factory = sqlite3.Row
+        
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA journal_mode={DATABASE_CONFIG.get('journal_mode', 'WAL')}")
+        cursor.execute(f"PRAGMA synchronous={DATABASE_CONFIG.get('synchronous', 'NORMAL')}")
+        cursor.execute(f"PRAGMA cache_size=-{int(DATABASE_CONFIG.get('cache_size_kb', 65536))}")
+        cursor.execute(f"PRAGMA mmap_size={int(DATABASE_CONFIG.get('mmap_size', 268435456))}")
+        cursor.execute(f"PRAGMA busy_timeout={int(DATABASE_CONFIG.get('busy_timeout', 30000))}")
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+        
+        return conn
+    
+    def get_connection(self, html=False):
+        """获取当前线程的持久连接（不存在时创建）
+        
+        连接在线程内复用，不要手动关闭；用作上下文管理器时会自动提交或回滚。
+        
+        Args:
+            html: True返回HTML数据库连接，否则返回视频数据库连接
+            
+        Returns:
+            sqlite3.Connection: 当前线程的数据库连接
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError('DatabaseManager已关闭')
+        
+        path = self.html_db_path if html else self.db_path
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        
+        conn = conns.get(path)
+        if conn is None:
+            conn = self._create_connection(path)
+            conns[path] = conn
+            with self._pool_lock:
+                self._prune_dead_connections()
+                self._connections.append((threading.current_thread(), conn))
+        return conn
+    
+    def _prune_dead_connections(self):
+        """关闭已退出线程遗留的连接（调用方需持有_pool_lock）"""
+        alive = []
+        for thread, conn in self._connections:
+            if thread.is_alive():
+                alive.append((thread, conn))
+            else:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        self._connections = alive
+    
+    def close(self):
+        """关闭连接池中的所有连接（可重复调用）"""
+        # 先把写入队列中剩余的数据落盘
+        self.stop_writer()
+        
+        with self._pool_lock:
+            if self._closed:
+                return
+            self._closed = True
+            connections, self._connections = self._connections, []
+        
+        for _, conn in connections:
+            try:
+                conn.execute('PRAGMA optimize')
+                conn.close()
+            except Exception:
+                pass
+        
+        if DEBUG.get('verbose', False):
+            print(f"✓ 数据库连接已关闭 ({len(connections)} 个)")
     
     def init_database(self):
         """初始化数据库表结构"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             
             # 创建视频表
@@ -122,18 +248,120 @@ class DatabaseManager:
                 )
             ''')
             
+            # 创建采集状态表（替代逐个读取collection_log.txt的完成检查）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS collection_state (
+                    viewkey TEXT PRIMARY KEY,               -- 视频ID
+                    status TEXT NOT NULL DEFAULT 'pending', -- 采集状态（success/failed/pending）
+                    has_html INTEGER NOT NULL DEFAULT 0,    -- 是否已生成HTML页面
+                    has_thumbnail INTEGER NOT NULL DEFAULT 0,  -- 缩略图是否已下载
+                    has_preview INTEGER NOT NULL DEFAULT 0,    -- 预览视频是否已下载
+                    has_m3u8 INTEGER NOT NULL DEFAULT 0,    -- 是否已获取m3u8地址
+                    error_msg TEXT,                         -- 失败原因
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 创建下载记录表（按URL跳过已下载的文件、条件请求刷新、相同内容建立硬链接）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS download_ledger (
+                    url TEXT PRIMARY KEY,                   -- 文件地址
+                    filepath TEXT NOT NULL,                 -- 保存路径
+                    size INTEGER NOT NULL,                  -- 文件大小
+                    sha256 TEXT NOT NULL,                   -- 文件内容的SHA-256
+                    etag TEXT,                              -- 响应的ETag
+                    last_modified TEXT,                     -- 响应的Last-Modified
+                    downloaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    checked_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_download_ledger_sha256 ON download_ledger(sha256)')
+            
             # 创建索引以提高查询性能
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_video_id ON videos(video_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_title ON videos(title)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_uploader ON videos(uploader)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_created_at ON videos(created_at)')
             
+            # 全文搜索索引
+            self._init_search_index(cursor)
+            
             conn.commit()
             print(f"✓ 数据库初始化完成: {self.db_path}")
     
+    def _init_search_index(self, cursor):
+        """创建FTS5全文索引（标题、上传者、分类名）及同步触发器
+        
+        使用trigram分词器以支持中文子串匹配；SQLite不支持FTS5/trigram时回退到LIKE搜索。
+        """
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+                    title, uploader, categories,
+                    tokenize = 'trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            self.fts_enabled = False
+            print(f"⚠️ 当前SQLite不支持FTS5 trigram，搜索将使用LIKE: {e}")
+            return
+        
+        # 视频表变更时同步索引（videos_fts的rowid即videos.id）
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS videos_fts_ai AFTER INSERT ON videos BEGIN
+                INSERT INTO videos_fts (rowid, title, uploader, categories)
+                VALUES (new.id, new.title, new.uploader, '');
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS videos_fts_au AFTER UPDATE OF title, uploader ON videos BEGIN
+                UPDATE videos_fts SET title = new.title, uploader = new.uploader
+                WHERE rowid = new.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS videos_fts_ad AFTER DELETE ON videos BEGIN
+                DELETE FROM videos_fts WHERE rowid = old.id;
+            END
+        ''')
+        
+        # 分类关联变更时重建该视频的分类文本
+        for event, ref in (('INSERT', 'new'), ('DELETE', 'old')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS video_categories_fts_{event.lower()}
+                AFTER {event} ON video_categories BEGIN
+                    UPDATE videos_fts SET categories = COALESCE((
+                        SELECT GROUP_CONCAT(c.name, ' ') FROM video_categories vc
+                        JOIN categories c ON c.id = vc.category_id
+                        WHERE vc.video_id = {ref}.video_id
+                    ), '')
+                    WHERE rowid = {ref}.video_id;
+                END
+            ''')
+        
+        # 旧数据库首次启用索引时回填
+        cursor.execute('SELECT COUNT(*) FROM videos')
+        total_videos = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM videos_fts')
+        if cursor.fetchone()[0] != total_videos:
+            print(f"🔄 正在重建全文索引 ({total_videos} 个视频)...")
+            cursor.execute('DELETE FROM videos_fts')
+            cursor.execute('''
+                INSERT INTO videos_fts (rowid, title, uploader, categories)
+                SELECT v.id, v.title, v.uploader, COALESCE((
+                    SELECT GROUP_CONCAT(c.name, ' ') FROM video_categories vc
+                    JOIN categories c ON c.id = vc.category_id
+                    WHERE vc.video_id = v.id
+                ), '')
+                FROM videos v
+            ''')
+        
+        self.fts_enabled = True
+    
     def init_html_database(self):
         """初始化HTML数据库表结构"""
-        with sqlite3.connect(self.html_db_path) as conn:
+        with self.get_connection(html=True) as conn:
             cursor = conn.cursor()
             
             # 创建HTML页面表
@@ -141,47 +369,160 @@ class DatabaseManager:
                 CREATE TABLE IF NOT EXISTS html_pages (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     url TEXT UNIQUE NOT NULL,               -- 页面URL (唯一)
-                    html_content TEXT NOT NULL,             -- HTML源码
+                    html_content TEXT NOT NULL,             -- HTML源码（旧数据；新数据为空，内容在html_blobs中）
+                    content_hash TEXT,                      -- HTML内容哈希（关联html_blobs.hash）
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,  -- 采集时间
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP   -- 更新时间
                 )
             ''')
             
+            # 旧数据库升级：添加内容哈希列
+            cursor.execute('PRAGMA table_info(html_pages)')
+            if 'content_hash' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE html_pages ADD COLUMN content_hash TEXT')
+            
+            # 创建HTML内容表（按内容哈希去重，压缩存储）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS html_blobs (
+                    hash TEXT PRIMARY KEY,                  -- 原始HTML的SHA-256
+                    codec TEXT NOT NULL,                    -- 压缩方式（zstd/zlib）
+                    size INTEGER NOT NULL,                  -- 原始大小（字节）
+                    data BLOB NOT NULL,                     -- 压缩后的HTML
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 创建重新生成进度表（增量重新生成的水位）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS regenerate_state (
+                    name TEXT PRIMARY KEY,                  -- 水位名称
+                    updated_at TEXT NOT NULL,               -- 已处理页面的最大updated_at
+                    page_id INTEGER NOT NULL,               -- 同一updated_at下已处理的最大页面ID
+                    saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 创建重新生成失败记录表（增量模式下同一页面失败达到次数上限后水位不再等待它）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS regenerate_failures (
+                    page_id INTEGER PRIMARY KEY,            -- html_pages.id
+                    updated_at TEXT NOT NULL,               -- 失败时页面的updated_at（页面内容更新后重新计数）
+                    url TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 1,    -- 连续失败次数
+                    last_error TEXT,
+                    failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
             # 创建索引以提高查询性能
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_html_pages_url ON html_pages(url)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_html_pages_created_at ON html_pages(created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_html_pages_content_hash ON html_pages(content_hash)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_html_pages_updated_at ON html_pages(updated_at)')
             
             conn.commit()
             print(f"✓ HTML数据库初始化完成: {self.html_db_path}")
     
+    @staticmethod
+    def _html_codec():
+        """返回HTML压缩方式：优先zstd，未安装zstandard时使用zlib"""
+        codec = DATABASE_CONFIG.get('html_codec', 'auto')
+        if codec == 'auto':
+            return 'zstd' if zstandard else 'zlib'
+        if codec == 'zstd' and not zstandard:
+            print("⚠️ 未安装zstandard，HTML改用zlib压缩")
+            return 'zlib'
+        return codec
+    
+    @staticmethod
+    def _compress_html(raw, codec):
+        """压缩HTML字节串"""
+        level = DATABASE_CONFIG.get('html_compress_level')
+        if codec == 'zstd':
+            return zstandard.ZstdCompressor(level=level or 10).compress(raw)
+        return zlib.compress(raw, level or 6)
+    
+    @staticmethod
+    def _decompress_html(data, codec):
+        """解压HTML内容并解码为字符串"""
+        if codec == 'zstd':
+            if not zstandard:
+                raise RuntimeError("该HTML页面使用zstd压缩，请先安装zstandard: pip install zstandard")
+            raw = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            raw = zlib.decompress(data)
+        return raw.decode('utf-8', errors='replace')
+    
+    def _decode_html_row(self, row):
+        """把html_pages与html_blobs的联合查询结果转换为页面字典（透明解压）"""
+        page = dict(row)
+        data = page.pop('blob_data', None)
+        codec = page.pop('blob_codec', None)
+        if data is not None:
+            page['html_content'] = self._decompress_html(data, codec)
+        return page
+    
+    # html_pages联合html_blobs的查询，供读取方法复用
+    _HTML_PAGE_SELECT = '''
+        SELECT p.*, b.codec AS blob_codec, b.data AS blob_data
+        FROM html_pages p
+        LEFT JOIN html_blobs b ON b.hash = p.content_hash
+    '''
+    
     def insert_html_page(self, url, html_content):
         """插入或更新HTML页面数据
         
+        HTML按内容哈希压缩存储；内容与已保存的版本相同时不写入。
+        
         Args:
             url: 页面URL
             html_content: HTML源码
-            
+        
         Returns:
             int: 插入的HTML页面ID
         """
+        raw = html_content.encode('utf-8', errors='replace')
+        content_hash = hashlib.sha256(raw).hexdigest()
+        
         try:
-            with sqlite3.connect(self.html_db_path) as conn:
+            with self.get_connection(html=True) as conn:
                 cursor = conn.cursor()
                 
-                # 插入或更新HTML页面
+                # 内容未变化则跳过写入
+                cursor.execute('SELECT id, content_hash FROM html_pages WHERE url = ?', (url,))
+                existing = cursor.fetchone()
+                if existing and existing['content_hash'] == content_hash:
+                    if DEBUG.get('verbose', False):
+                        print(f"✓ HTML页面未变化，跳过写入: {url} (ID: {existing['id']})")
+                    return existing['id']
+                
+                # 保存压缩内容（相同内容只存一份）
+                cursor.execute('SELECT 1 FROM html_blobs WHERE hash = ?', (content_hash,))
+                if not cursor.fetchone():
+                    codec = self._html_codec()
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO html_blobs (hash, codec, size, data)
+                        VALUES (?, ?, ?, ?)
+                    ''', (content_hash, codec, len(raw), self._compress_html(raw, codec)))
+                
+                # 插入或更新HTML页面（保留原有ID和采集时间；updated_at精确到毫秒，供增量重新生成使用）
                 cursor.execute('''
-                    INSERT OR REPLACE INTO html_pages (url, html_content, updated_at)
-                    VALUES (?, ?, CURRENT_TIMESTAMP)
-                ''', (url, html_content))
-                
-                html_id = cursor.lastrowid
+                    INSERT INTO html_pages (url, html_content, content_hash, updated_at)
+                    VALUES (?, '', ?, STRFTIME('%Y-%m-%d %H:%M:%f', 'now'))
+                    ON CONFLICT(url) DO UPDATE SET
+                        html_content = '',
+                        content_hash = excluded.content_hash,
+                        updated_at = excluded.updated_at
+                ''', (url, content_hash))
+                
+                html_id = existing['id'] if existing else cursor.lastrowid
                 conn.commit()
                 
                 if DEBUG.get('verbose', False):
                     print(f"✓ HTML页面已保存: {url} (ID: {html_id})")
                 
                 return html_id
-                
+        
         except Exception as e:
             print(f"❌ 保存HTML页面失败: {e}")
             raise
@@ -191,22 +532,19 @@ class DatabaseManager:
         
         Args:
             url: 页面URL
-            
+        
         Returns:
             dict: HTML页面数据，如果不存在返回None
         """
         try:
-            with sqlite3.connect(self.html_db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.get_connection(html=True) as conn:
                 cursor = conn.cursor()
                 
-                cursor.execute('''
-                    SELECT * FROM html_pages WHERE url = ?
-                ''', (url,))
+                cursor.execute(self._HTML_PAGE_SELECT + ' WHERE p.url = ?', (url,))
                 
                 row = cursor.fetchone()
-                return dict(row) if row else None
-                
+                return self._decode_html_row(row) if row else None
+        
         except Exception as e:
             print(f"❌ 获取HTML页面失败: {e}")
             return None
@@ -216,86 +554,258 @@ class DatabaseManager:
         
         Args:
             limit: 限制返回数量
-            
+        
         Returns:
             list: HTML页面数据列表
         """
         try:
-            with sqlite3.connect(self.html_db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.get_connection(html=True) as conn:
                 cursor = conn.cursor()
                 
-                query = 'SELECT * FROM html_pages ORDER BY created_at DESC'
+                query = self._HTML_PAGE_SELECT + ' ORDER BY p.created_at DESC'
                 if limit:
                     query += f' LIMIT {limit}'
                 
                 cursor.execute(query)
                 rows = cursor.fetchall()
-                return [dict(row) for row in rows]
-                
+                return [self._decode_html_row(row) for row in rows]
+        
         except Exception as e:
             print(f"❌ 获取HTML页面列表失败: {e}")
             return []
+    
+    def sample_html_pages(self, count, url_like=None):
+        """随机抽取HTML页面（用于构建解析性能测试的样本集）
+        
+        Args:
+            count: 抽取数量
+            url_like: URL的LIKE条件（如'%view_video.php%'），为None时不限制
+        
+        Returns:
+            list: HTML页面数据（html_content已解压）
+        """
+        with self.get_connection(html=True) as conn:
+            cursor = conn.cursor()
+            where = ' WHERE p.url LIKE ?' if url_like else ''
+            params = (url_like, count) if url_like else (count,)
+            cursor.execute(self._HTML_PAGE_SELECT + where + ' ORDER BY RANDOM() LIMIT ?', params)
+            return [self._decode_html_row(row) for row in cursor.fetchall()]
+    
+    def count_html_pages(self, since=None):
+        """统计HTML页面数量
+        
+        Args:
+            since: 只统计该水位之后更新的页面，格式同iter_html_pages
+        
+        Returns:
+            int: 页面数量
+        """
+        with self.get_connection(html=True) as conn:
+            cursor = conn.cursor()
+            if since is None:
+                cursor.execute('SELECT COUNT(*) FROM html_pages')
+            else:
+                since_updated, since_id = since if isinstance(since, (tuple, list)) else (since, 0)
+                cursor.execute('''
+                    SELECT COUNT(*) FROM html_pages
+                    WHERE updated_at > ? OR (updated_at = ? AND id > ?)
+                ''', (since_updated, since_updated, since_id))
+            return cursor.fetchone()[0]
+    
+    def iter_html_pages(self, batch_size=100, since=None, limit=None):
+        """分批流式读取HTML页面（键集分页，内存占用与batch_size成正比）
+        
+        默认按采集时间倒序返回（与get_all_html_pages一致）；指定since时按(updated_at, id)正序
+        只返回该水位之后更新的页面。
+        
+        Args:
+            batch_size: 每次从数据库读取的页面数
+            since: updated_at时间字符串，或(updated_at, id)元组
+            limit: 最多返回的页面数量
+        
+        Yields:
+            dict: HTML页面数据（html_content已解压）
+        """
+        cursor = self.get_connection(html=True).cursor()
+        if since is None:
+            order = ' ORDER BY p.created_at DESC, p.id DESC LIMIT ?'
+            keyset = ' WHERE p.created_at < ? OR (p.created_at = ? AND p.id < ?)'
+            last = None
+        else:
+            order = ' ORDER BY p.updated_at, p.id LIMIT ?'
+            keyset = ' WHERE p.updated_at > ? OR (p.updated_at = ? AND p.id > ?)'
+            last = tuple(since) if isinstance(since, (tuple, list)) else (since, 0)
+        
+        returned = 0
+        while limit is None or returned < limit:
+            size = batch_size if limit is None else min(batch_size, limit - returned)
+            if last is None:
+                cursor.execute(self._HTML_PAGE_SELECT + order, (size,))
+            else:
+                cursor.execute(self._HTML_PAGE_SELECT + keyset + order, (last[0], last[0], last[1], size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            for row in rows:
+                yield self._decode_html_row(row)
+            returned += len(rows)
+            
+            tail = rows[-1]
+            last = (tail['created_at'] if since is None else tail['updated_at'], tail['id'])
+            if len(rows) < size:
+                break
+    
+    def get_regenerate_watermark(self, name='regenerate'):
+        """获取增量重新生成的水位
+        
+        Returns:
+            tuple: (updated_at, 页面ID)，从未运行过时返回None
+        """
+        with self.get_connection(html=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT updated_at, page_id FROM regenerate_state WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            return (row['updated_at'], row['page_id']) if row else None
+    
+    def set_regenerate_watermark(self, watermark, name='regenerate'):
+        """保存增量重新生成的水位
+        
+        Args:
+            watermark: (updated_at, 页面ID)
+        """
+        with self.get_connection(html=True) as conn:
+            conn.execute('''
+                INSERT INTO regenerate_state (name, updated_at, page_id, saved_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(name) DO UPDATE SET
+                    updated_at = excluded.updated_at,
+                    page_id = excluded.page_id,
+                    saved_at = CURRENT_TIMESTAMP
+            ''', (name, watermark[0], watermark[1]))
+    
+    def record_regenerate_failure(self, watermark_key, url, error):
+        """记录增量重新生成中处理失败的页面
+        
+        Args:
+            watermark_key: 页面的(updated_at, 页面ID)
+            url: 页面URL
+            error: 失败原因
+        
+        Returns:
+            int: 该页面（同一updated_at）的连续失败次数
+        """
+        updated_at, page_id = watermark_key
+        with self.get_connection(html=True) as conn:
+            conn.execute('''
+                INSERT INTO regenerate_failures (page_id, updated_at, url, attempts, last_error, failed_at)
+                VALUES (?, ?, ?, 1, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(page_id) DO UPDATE SET
+                    attempts = CASE WHEN updated_at = excluded.updated_at THEN attempts + 1 ELSE 1 END,
+                    updated_at = excluded.updated_at,
+                    url = excluded.url,
+                    last_error = excluded.last_error,
+                    failed_at = CURRENT_TIMESTAMP
+            ''', (page_id, updated_at, url, str(error)))
+            row = conn.execute('SELECT attempts FROM regenerate_failures WHERE page_id = ?', (page_id,)).fetchone()
+            return row['attempts']
+    
+    def clear_regenerate_failures(self, page_ids):
+        """删除已处理成功的页面的失败记录"""
+        page_ids = list(page_ids)
+        if not page_ids:
+            return
+        with self.get_connection(html=True) as conn:
+            for chunk in self._chunks(page_ids):
+                conn.execute(f'DELETE FROM regenerate_failures WHERE page_id IN ({",".join("?" * len(chunk))})', chunk)
+    
+    def compact_html_database(self, batch_size=200):
+        """压缩HTML数据库：把旧的明文HTML迁移为压缩存储，删除无引用的内容并回收空间
+        
+        Args:
+            batch_size: 每个事务迁移的页面数
+        
+        Returns:
+            dict: 迁移页面数、删除内容数、压缩前后文件大小
+        """
+        size_before = os.path.getsize(self.html_db_path)
+        migrated = 0
+        conn = self.get_connection(html=True)
+        cursor = conn.cursor()
+        
+        # 1. 迁移旧数据（分批提交，避免一次读入全部HTML）
+        while True:
+            cursor.execute('''
+                SELECT id, html_content FROM html_pages
+                WHERE content_hash IS NULL
+                LIMIT ?
+            ''', (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            with conn:
+                codec = self._html_codec()
+                for row in rows:
+                    raw = (row['html_content'] or '').encode('utf-8', errors='replace')
+                    content_hash = hashlib.sha256(raw).hexdigest()
+                    cursor.execute('SELECT 1 FROM html_blobs WHERE hash = ?', (content_hash,))
+                    if not cursor.fetchone():
+                        cursor.execute('''
+                            INSERT INTO html_blobs (hash, codec, size, data)
+                            VALUES (?, ?, ?, ?)
+                        ''', (content_hash, codec, len(raw), self._compress_html(raw, codec)))
+                    cursor.execute('''
+                        UPDATE html_pages SET html_content = '', content_hash = ? WHERE id = ?
+                    ''', (content_hash, row['id']))
+            migrated += len(rows)
+            print(f"🔄 已迁移 {migrated} 个HTML页面到压缩存储")
+        
+        # 2. 删除不再被任何页面引用的内容
+        with conn:
+            cursor.execute('''
+                DELETE FROM html_blobs
+                WHERE hash NOT IN (SELECT content_hash FROM html_pages WHERE content_hash IS NOT NULL)
+            ''')
+            removed_blobs = cursor.rowcount
+        
+        # 3. 回收空间
+        cursor.execute('VACUUM')
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        size_after = os.path.getsize(self.html_db_path)
+        
+        return {
+            'migrated': migrated,
+            'removed_blobs': removed_blobs,
+            'size_before': size_before,
+            'size_after': size_after,
+        }
 
-    def insert_video(self, video_data):
-        """插入视频数据
+    def insert_video(self, video_data, collection_state=None):
+        """插入视频数据（同步写入，单独一个事务）
         
         Args:
             video_data: 视频数据字典
-            
+            collection_state: 采集状态字段字典，与视频数据在同一事务中写入
+        
         Returns:
             插入的视频记录ID
         """
-        with sqlite3.connect(self.db_path) as conn:
+        video_id = video_data.get('viewkey') or video_data.get('video_id', '')
+        title = video_data.get('title', '')
+        
+        with self.get_connection() as conn:
             cursor = conn.cursor()
-            
-            # 准备视频数据
-            video_id = video_data.get('viewkey') or video_data.get('video_id', '')
-            title = video_data.get('title', '')
-            original_url = video_data.get('video_url', '')
-            uploader = video_data.get('uploader', '')
-            views = video_data.get('views', '')
-            duration = video_data.get('duration', '')
-            publish_time = video_data.get('publish_time', '')
-            best_m3u8_url = video_data.get('best_m3u8_url', '')
-            thumbnail_url = video_data.get('thumbnail_url', '')
-            preview_url = video_data.get('preview_url', '')
-            
             try:
-                # 插入或更新视频记录
-                cursor.execute('''
-                    INSERT OR REPLACE INTO videos 
-                    (video_id, title, original_url, uploader, views, duration, 
-                     publish_time, best_m3u8_url, thumbnail_url, preview_url, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (video_id, title, original_url, uploader, views, duration,
-                      publish_time, best_m3u8_url, thumbnail_url, preview_url))
-                
-                # 获取插入的视频记录ID
-                db_video_id = cursor.lastrowid
-                if not db_video_id:
-                    # 如果是更新操作，获取现有记录ID
-                    cursor.execute('SELECT id FROM videos WHERE video_id = ?', (video_id,))
-                    result = cursor.fetchone()
-                    db_video_id = result[0] if result else None
-                
+                db_ids = self._write_videos(cursor, [dict(video_data, _collection_state=collection_state)])
+                db_video_id = db_ids.get(video_id)
                 if not db_video_id:
                     raise Exception(f"无法获取视频记录ID: {video_id}")
                 
-                # 处理分类数据
-                categories = video_data.get('categories', [])
-                if categories:
-                    self._insert_video_categories(cursor, db_video_id, categories)
-                
-                # 处理M3U8链接数据
-                m3u8_urls = video_data.get('m3u8_urls', [])
-                if m3u8_urls:
-                    self._insert_m3u8_urls(cursor, db_video_id, m3u8_urls)
-                
                 conn.commit()
                 print(f"✓ 视频数据已保存到数据库: {title} (ID: {video_id})")
                 return db_video_id
-                
+            
             except sqlite3.IntegrityError as e:
                 print(f"❌ 数据库插入错误: {e}")
                 raise
@@ -303,62 +813,449 @@ class DatabaseManager:
                 print(f"❌ 保存视频数据失败: {e}")
                 raise
     
-    def _insert_video_categories(self, cursor, video_db_id, categories):
-        """插入视频分类关联数据"""
-        # 先删除现有的分类关联
-        cursor.execute('DELETE FROM video_categories WHERE video_id = ?', (video_db_id,))
+    def enqueue_video(self, video_data, collection_state=None):
+        """将视频数据加入后台写入队列，由写入线程批量提交
         
-        for category in categories:
-            category_name = category.get('name', '').strip()
-            if not category_name:
-                continue
-                
-            # 插入分类（如果不存在）
-            cursor.execute('INSERT OR IGNORE INTO categories (name) VALUES (?)', (category_name,))
+        调用方不会等待SQLite锁；数据在flush_writes()或close()返回时保证已提交。
+        
+        Args:
+            video_data: 视频数据字典
+            collection_state: 采集状态字段字典，与视频数据在同一事务中写入
+        """
+        self.start_writer()
+        video_id = video_data.get('viewkey') or video_data.get('video_id', '')
+        with self._pending_lock:
+            self._pending_video_ids.add(video_id)
+        self._write_queue.put(dict(video_data, _collection_state=collection_state))
+    
+    def start_writer(self):
+        """启动后台写入线程（如果还没启动）"""
+        with self._writer_lock:
+            if self._writer_thread and self._writer_thread.is_alive():
+                return
+            if self._closed:
+                raise sqlite3.ProgrammingError('DatabaseManager已关闭')
+            self._writer_thread = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+            self._writer_thread.start()
+    
+    def flush_writes(self):
+        """等待写入队列中的所有视频数据提交完成"""
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._write_queue.join()
+    
+    def take_write_failures(self):
+        """取出并清空后台写入失败的视频ID（调用前先flush_writes）
+        
+        Returns:
+            set: 视频ID
+        """
+        with self._pending_lock:
+            failures, self._write_failures = self._write_failures, set()
+        return failures
+    
+    def stop_writer(self):
+        """提交剩余数据并停止后台写入线程"""
+        with self._writer_lock:
+            thread = self._writer_thread
+            self._writer_thread = None
+        if thread and thread.is_alive():
+            self._write_queue.put(None)
+            thread.join()
+    
+    def _writer_loop(self):
+        """后台写入线程：每满N条或每隔T毫秒提交一次"""
+        batch_size = max(1, int(DATABASE_CONFIG.get('write_batch_size', 50)))
+        flush_interval = DATABASE_CONFIG.get('write_flush_interval_ms', 500) / 1000
+        
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                self._write_queue.task_done()
+                break
             
-            # 获取分类ID
-            cursor.execute('SELECT id FROM categories WHERE name = ?', (category_name,))
-            category_id = cursor.fetchone()[0]
+            batch = [item]
+            stop = False
+            deadline = time.time() + flush_interval
+            while len(batch) < batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._write_queue.get(timeout=remaining)
+                except Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
             
-            # 插入视频分类关联
-            cursor.execute('''
-                INSERT OR IGNORE INTO video_categories (video_id, category_id) 
-                VALUES (?, ?)
-            ''', (video_db_id, category_id))
+            try:
+                self._commit_video_batch(batch)
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+            
+            if stop:
+                self._write_queue.task_done()
+                break
     
-    def _insert_m3u8_urls(self, cursor, video_db_id, m3u8_urls):
-        """插入M3U8链接数据"""
-        # 先删除现有的M3U8链接
-        cursor.execute('DELETE FROM m3u8_urls WHERE video_id = ?', (video_db_id,))
+    def _commit_video_batch(self, batch):
+        """在一个事务中提交一批视频数据和采集状态更新，失败时逐条重试以隔离错误数据
         
-        for url in m3u8_urls:
-            if not url or url == 'N/A':
-                continue
-                
-            # 尝试从URL中提取质量信息
-            quality = 'Unknown'
-            for q in ['1080P', '720P', '480P', '240P', 'HD', 'SD']:
-                if q in url:
-                    quality = q
-                    break
+        按队列顺序写入：连续的视频数据或连续的状态更新合并为一次批量写入，
+        同一视频先后入队的状态（如先失败后成功）以最后入队的为准。
+        """
+        videos = [item for item in batch if isinstance(item, dict)]
+        try:
+            try:
+                conn = self.get_connection()
+            except Exception as e:
+                # 连接不可用（如数据库已关闭）：整批按失败处理，写入线程继续运行
+                self.write_stats['errors'] += len(batch)
+                with self._pending_lock:
+                    self._write_failures.update(item.get('viewkey') or item.get('video_id', '') for item in videos)
+                print(f"❌ 无法获取数据库连接，丢弃 {len(batch)} 条待写入数据: {e}")
+                return
             
-            # 插入M3U8链接
-            cursor.execute('''
-                INSERT INTO m3u8_urls (video_id, quality, url) 
+            try:
+                with conn:
+                    cursor = conn.cursor()
+                    for is_video, items in groupby(batch, key=lambda item: isinstance(item, dict)):
+                        if is_video:
+                            self._write_videos(cursor, list(items))
+                        else:
+                            self._write_collection_states(cursor, [(item[1], item[2]) for item in items])
+                self.write_stats['batches'] += 1
+                self.write_stats['videos'] += len(videos)
+                if videos:
+                    print(f"✓ 批量写入 {len(videos)} 个视频到数据库")
+            except Exception as e:
+                print(f"⚠️ 批量写入失败，改为逐条写入: {e}")
+                for item in batch:
+                    if isinstance(item, dict):
+                        try:
+                            with conn:
+                                self._write_videos(conn.cursor(), [item])
+                            self.write_stats['videos'] += 1
+                        except Exception as row_error:
+                            self.write_stats['errors'] += 1
+                            with self._pending_lock:
+                                self._write_failures.add(item.get('viewkey') or item.get('video_id', ''))
+                            print(f"❌ 保存视频数据失败: {item.get('viewkey', 'N/A')}: {row_error}")
+                    else:
+                        try:
+                            with conn:
+                                self._write_collection_states(conn.cursor(), [(item[1], item[2])])
+                        except Exception as row_error:
+                            self.write_stats['errors'] += 1
+                            print(f"❌ 保存采集状态失败: {item[1]}: {row_error}")
+        finally:
+            with self._pending_lock:
+                for video_data in videos:
+                    self._pending_video_ids.discard(video_data.get('viewkey') or video_data.get('video_id', ''))
+
+    @staticmethod
+    def _chunks(items, size=500):
+        """按SQLite参数数量上限切分列表"""
+        items = list(items)
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+    
+    @staticmethod
+    def _guess_m3u8_quality(url):
+        """从URL中推断M3U8质量标识"""
+        return quality_label(url) or 'Unknown'
+    
+    def _write_videos(self, cursor, videos):
+        """用executemany写入一批视频及其分类、M3U8链接（调用方负责事务）
+        
+        Args:
+            cursor: 数据库游标
+            videos: 视频数据字典列表
+        
+        Returns:
+            dict: {视频ID: 视频表ID}
+        """
+        # 同一批次中重复的视频只保留最后一条
+        by_id = {}
+        for video_data in videos:
+            video_id = video_data.get('viewkey') or video_data.get('video_id', '')
+            by_id[video_id] = video_data
+        
+        # 1. 插入或更新视频记录（冲突时原地更新，保留原有ID和采集时间）
+        cursor.executemany('''
+            INSERT INTO videos
+            (video_id, title, original_url, uploader, views, duration,
+             publish_time, best_m3u8_url, thumbnail_url, preview_url, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(video_id) DO UPDATE SET
+                title = excluded.title,
+                original_url = excluded.original_url,
+                uploader = excluded.uploader,
+                views = excluded.views,
+                duration = excluded.duration,
+                publish_time = excluded.publish_time,
+                best_m3u8_url = excluded.best_m3u8_url,
+                thumbnail_url = excluded.thumbnail_url,
+                preview_url = excluded.preview_url,
+                updated_at = CURRENT_TIMESTAMP
+        ''', [(video_id,
+               v.get('title', ''),
+               v.get('video_url', ''),
+               v.get('uploader', ''),
+               v.get('views', ''),
+               v.get('duration', ''),
+               v.get('publish_time', ''),
+               v.get('best_m3u8_url', ''),
+               v.get('thumbnail_url', ''),
+               v.get('preview_url', '')) for video_id, v in by_id.items()])
+        
+        # 2. 批量获取视频表ID
+        db_ids = {}
+        for chunk in self._chunks(by_id.keys()):
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT id, video_id FROM videos WHERE video_id IN ({placeholders})', chunk)
+            for row in cursor.fetchall():
+                db_ids[row[1]] = row[0]
+        
+        # 3. 处理分类数据（先删除现有关联再重建）
+        category_names = {}
+        for video_id, v in by_id.items():
+            if v.get('categories') and video_id in db_ids:
+                category_names[db_ids[video_id]] = [c.get('name', '').strip() for c in v['categories']
+                                                    if c.get('name', '').strip()]
+        if category_names:
+            cursor.executemany('DELETE FROM video_categories WHERE video_id = ?',
+                               [(db_id,) for db_id in category_names])
+            
+            all_names = {name for names in category_names.values() for name in names}
+            cursor.executemany('INSERT OR IGNORE INTO categories (name) VALUES (?)',
+                               [(name,) for name in all_names])
+            
+            category_ids = {}
+            for chunk in self._chunks(all_names):
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'SELECT id, name FROM categories WHERE name IN ({placeholders})', chunk)
+                for row in cursor.fetchall():
+                    category_ids[row[1]] = row[0]
+            
+            cursor.executemany('''
+                INSERT OR IGNORE INTO video_categories (video_id, category_id)
+                VALUES (?, ?)
+            ''', [(db_id, category_ids[name]) for db_id, names in category_names.items() for name in names])
+        
+        # 4. 处理M3U8链接数据（先删除现有链接再重建）
+        m3u8_by_db_id = {db_ids[video_id]: v['m3u8_urls'] for video_id, v in by_id.items()
+                         if v.get('m3u8_urls') and video_id in db_ids}
+        if m3u8_by_db_id:
+            cursor.executemany('DELETE FROM m3u8_urls WHERE video_id = ?',
+                               [(db_id,) for db_id in m3u8_by_db_id])
+            cursor.executemany('''
+                INSERT INTO m3u8_urls (video_id, quality, url)
                 VALUES (?, ?, ?)
-            ''', (video_db_id, quality, url))
+            ''', [(db_id, self._guess_m3u8_quality(url), url)
+                  for db_id, urls in m3u8_by_db_id.items() for url in urls if url and url != 'N/A'])
+        
+        # 5. 写入采集状态（与视频数据在同一事务中）
+        states = [(video_id, v['_collection_state']) for video_id, v in by_id.items() if v.get('_collection_state')]
+        if states:
+            self._write_collection_states(cursor, states)
+        
+        return db_ids
+
+    # 采集状态表中允许更新的字段
+    COLLECTION_STATE_FIELDS = ('status', 'error_msg', 'has_html', 'has_thumbnail', 'has_preview', 'has_m3u8')
+    
+    def enqueue_collection_update(self, viewkey, **fields):
+        """把采集状态更新（如下载完成的文件标记、失败状态）加入后台写入队列
+        
+        Args:
+            viewkey: 视频ID
+            **fields: 要更新的字段，见COLLECTION_STATE_FIELDS
+        """
+        if not viewkey:
+            return
+        unknown = set(fields) - set(self.COLLECTION_STATE_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的采集状态字段: {', '.join(sorted(unknown))}")
+        self.start_writer()
+        self._write_queue.put(('state', viewkey, fields))
+    
+    def _write_collection_states(self, cursor, updates):
+        """写入采集状态（调用方负责事务）
+        
+        Args:
+            cursor: 数据库游标
+            updates: [(视频ID, 字段字典)]，按顺序写入，字段相同的连续更新用一次executemany写入
+        """
+        for columns, group in groupby(updates, key=lambda update: tuple(sorted(update[1]))):
+            rows = [(viewkey, *[fields[c] for c in columns]) for viewkey, fields in group]
+            assignments = ''.join(f'{c} = excluded.{c}, ' for c in columns)
+            cursor.executemany(f'''
+                INSERT INTO collection_state (viewkey{''.join(', ' + c for c in columns)})
+                VALUES (?{', ?' * len(columns)})
+                ON CONFLICT(viewkey) DO UPDATE SET {assignments}updated_at = CURRENT_TIMESTAMP
+            ''', rows)
+    
+    def is_video_collected(self, viewkey):
+        """检查视频是否已成功采集（视频数据已入库且文件已生成，包括写入队列中尚未提交的）"""
+        return viewkey in self.get_completed_video_ids([viewkey])
+    
+    def get_completed_video_ids(self, viewkeys):
+        """批量查询已成功采集的视频
+        
+        Args:
+            viewkeys: 视频ID列表
+        
+        Returns:
+            set: 其中已成功采集的视频ID
+        """
+        viewkeys = [v for v in dict.fromkeys(viewkeys) if v]
+        with self._pending_lock:
+            completed = {v for v in viewkeys if v in self._pending_video_ids}
+        
+        remaining = [v for v in viewkeys if v not in completed]
+        if remaining:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                for chunk in self._chunks(remaining):
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(f'''
+                        SELECT viewkey FROM collection_state
+                        WHERE status = 'success' AND viewkey IN ({placeholders})
+                    ''', chunk)
+                    completed.update(row[0] for row in cursor.fetchall())
+        return completed
+    
+    def get_download_record(self, url):
+        """获取下载记录
+        
+        Args:
+            url: 文件地址
+        
+        Returns:
+            dict: 下载记录（filepath、size、sha256、etag、last_modified），没有记录时返回None
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT url, filepath, size, sha256, etag, last_modified
+                FROM download_ledger WHERE url = ?
+            ''', (url,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    def find_download_by_hash(self, sha256, exclude_path=None):
+        """按内容哈希查找已下载的文件（用于相同内容的文件之间建立硬链接）
+        
+        Args:
+            sha256: 文件内容的SHA-256
+            exclude_path: 排除的文件路径
+        
+        Returns:
+            list: 已下载的文件路径
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT DISTINCT filepath FROM download_ledger WHERE sha256 = ? AND filepath != ?',
+                           (sha256, exclude_path or ''))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def record_download(self, url, filepath, size, sha256, etag=None, last_modified=None):
+        """记录一次成功的下载
+        
+        Args:
+            url: 文件地址
+            filepath: 保存路径
+            size: 文件大小
+            sha256: 文件内容的SHA-256
+            etag: 响应的ETag（用于条件请求）
+            last_modified: 响应的Last-Modified（用于条件请求）
+        """
+        with self.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO download_ledger (url, filepath, size, sha256, etag, last_modified, downloaded_at, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                ON CONFLICT(url) DO UPDATE SET
+                    filepath = excluded.filepath,
+                    size = excluded.size,
+                    sha256 = excluded.sha256,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    downloaded_at = CURRENT_TIMESTAMP,
+                    checked_at = CURRENT_TIMESTAMP
+            ''', (url, filepath, size, sha256, etag, last_modified))
+    
+    def touch_download(self, url):
+        """条件请求确认文件未变化（304）时更新检查时间"""
+        with self.get_connection() as conn:
+            conn.execute('UPDATE download_ledger SET checked_at = CURRENT_TIMESTAMP WHERE url = ?', (url,))
+    
+    def import_collection_logs(self, data_folder):
+        """从旧版本的collection_log.txt导入采集状态（仅在采集状态表为空时执行一次）
+        
+        Args:
+            data_folder: data目录路径
+        
+        Returns:
+            int: 导入的记录数
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM collection_state LIMIT 1')
+            if cursor.fetchone() or not os.path.isdir(data_folder):
+                return 0
+            
+            updates = []
+            for viewkey in os.listdir(data_folder):
+                folder_path = os.path.join(data_folder, viewkey)
+                log_file = os.path.join(folder_path, 'collection_log.txt')
+                try:
+                    with open(log_file, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                except OSError:
+                    continue
+                
+                updates.append((viewkey, {
+                    'status': 'success' if '采集状态: 成功' in content else 'failed',
+                    'has_html': int(os.path.exists(os.path.join(folder_path, OUTPUT_CONFIG['html_filename']))),
+                    'has_thumbnail': int(os.path.exists(os.path.join(folder_path, OUTPUT_CONFIG['thumbnail_filename']))),
+                    'has_preview': int(os.path.exists(os.path.join(folder_path, OUTPUT_CONFIG['preview_filename']))),
+                    'has_m3u8': int('m3u8地址: 已获取' in content),
+                }))
+            
+            if not updates:
+                return 0
+            
+            # 只有视频数据也已入库的才算采集成功（与原来"本地+数据库"的跳过条件一致）
+            in_db = set()
+            for chunk in self._chunks([viewkey for viewkey, _ in updates]):
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'SELECT video_id FROM videos WHERE video_id IN ({placeholders})', chunk)
+                in_db.update(row[0] for row in cursor.fetchall())
+            for viewkey, fields in updates:
+                if fields['status'] == 'success' and viewkey not in in_db:
+                    fields['status'] = 'pending'
+            
+            self._write_collection_states(cursor, updates)
+            conn.commit()
+        
+        print(f"✓ 已从采集日志导入 {len(updates)} 条采集状态")
+        return len(updates)
     
     def video_exists(self, video_id):
-        """检查视频是否已存在于数据库中"""
-        with sqlite3.connect(self.db_path) as conn:
+        """检查视频是否已存在于数据库中（包括写入队列中尚未提交的）"""
+        with self._pending_lock:
+            if video_id in self._pending_video_ids:
+                return True
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT COUNT(*) FROM videos WHERE video_id = ?', (video_id,))
             return cursor.fetchone()[0] > 0
     
     def get_video_by_id(self, video_id):
         """根据视频ID获取视频信息"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -393,31 +1290,116 @@ class DatabaseManager:
             
             return video_data
     
-    def search_videos(self, query=None, limit=100, offset=0):
-        """搜索视频"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+    @staticmethod
+    def _parse_search_cursor(after, fts):
+        """解析search_cursor（全文搜索为"相关度|ID"，其他为"采集时间|ID"）
+        
+        Returns:
+            tuple: (相关度或采集时间, ID)
+        
+        Raises:
+            ValueError: 游标格式无效或与当前搜索方式不匹配（如用无关键词列表的游标翻页关键词搜索）
+        """
+        expected = '相关度|ID' if fts else '采集时间|ID'
+        key, sep, last_id = after.rpartition('|')
+        try:
+            if not sep or not last_id.isdigit():
+                raise ValueError
+            if fts:
+                return float(key), int(last_id)
+            if not re.match(r'\d{4}-\d{2}-\d{2}', key):
+                raise ValueError
+            return key, int(last_id)
+        except ValueError:
+            raise ValueError(f"无效的翻页游标: {after!r}（当前搜索方式需要\"{expected}\"格式，请使用同一搜索输出的下一页游标）") from None
+    
+    def _build_fts_query(self, query):
+        """把用户关键词转换为FTS5 MATCH表达式
+        
+        trigram分词器要求每个词至少3个字符，否则返回None由调用方改用LIKE。
+        """
+        if not self.fts_enabled:
+            return None
+        terms = query.split()
+        if not terms or any(len(term) < 3 for term in terms):
+            return None
+        return ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+    
+    def search_videos(self, query=None, limit=100, offset=0, after=None):
+        """搜索视频
+        
+        有关键词时使用FTS5全文索引按相关度排序，否则按采集时间倒序。
+        每条结果带有search_cursor，把上一页最后一条的search_cursor作为after传入即可翻页（键集分页）。
+        
+        Args:
+            query: 搜索关键词（匹配标题、上传者、分类名）
+            limit: 返回数量
+            offset: 偏移量（兼容旧接口，推荐使用after）
+            after: 上一页最后一条结果的search_cursor
+        
+        Returns:
+            list: 视频数据字典列表
+        
+        Raises:
+            ValueError: after不是当前搜索方式的有效游标
+        """
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             
-            if query:
-                cursor.execute('''
-                    SELECT * FROM videos 
-                    WHERE title LIKE ? OR uploader LIKE ?
-                    ORDER BY created_at DESC
-                    LIMIT ? OFFSET ?
-                ''', (f'%{query}%', f'%{query}%', limit, offset))
+            fts_query = self._build_fts_query(query) if query else None
+            if fts_query:
+                sql = '''
+                    SELECT v.*, f.score FROM (
+                        SELECT rowid AS id, bm25(videos_fts, 10.0, 5.0, 2.0) AS score
+                        FROM videos_fts WHERE videos_fts MATCH ?
+                    ) f
+                    JOIN videos v ON v.id = f.id
+                '''
+                params = [fts_query]
+                if after:
+                    last_score, last_id = self._parse_search_cursor(after, fts=True)
+                    sql += ' WHERE f.score > ? OR (f.score = ? AND f.id > ?)'
+                    params += [last_score, last_score, last_id]
+                sql += ' ORDER BY f.score, f.id LIMIT ?'
             else:
-                cursor.execute('''
-                    SELECT * FROM videos 
-                    ORDER BY created_at DESC
-                    LIMIT ? OFFSET ?
-                ''', (limit, offset))
+                sql = 'SELECT * FROM videos'
+                params = []
+                conditions = []
+                if query:
+                    conditions.append('''(title LIKE ? OR uploader LIKE ? OR id IN (
+                        SELECT vc.video_id FROM video_categories vc
+                        JOIN categories c ON c.id = vc.category_id
+                        WHERE c.name LIKE ?
+                    ))''')
+                    params += [f'%{query}%'] * 3
+                if after:
+                    last_created, last_id = self._parse_search_cursor(after, fts=False)
+                    conditions.append('(created_at < ? OR (created_at = ? AND id < ?))')
+                    params += [last_created, last_created, last_id]
+                if conditions:
+                    sql += ' WHERE ' + ' AND '.join(conditions)
+                sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+            params.append(limit)
+            
+            if offset and not after:
+                sql += ' OFFSET ?'
+                params.append(offset)
+            
+            cursor.execute(sql, params)
             
-            return [dict(row) for row in cursor.fetchall()]
+            videos = []
+            for row in cursor.fetchall():
+                video = dict(row)
+                if fts_query:
+                    video['search_cursor'] = f"{video['score']!r}|{video['id']}"
+                else:
+                    video['search_cursor'] = f"{video['created_at']}|{video['id']}"
+                videos.append(video)
+            return videos
     
     def get_statistics(self):
         """获取数据库统计信息"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             
             # 总视频数
@@ -464,8 +1446,7 @@ class DatabaseManager:
     
     def export_to_json(self, output_file, limit=None):
         """导出数据到JSON文件"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             
             query = 'SELECT * FROM videos ORDER BY created_at DESC'
@@ -505,17 +1486,59 @@ class DatabaseManager:
             
             print(f"✓ 数据已导出到: {output_file} ({len(videos)} 条记录)")
 
+def with_driver_lock(method):
+    """在浏览器锁内执行方法（WebDriver不是线程安全的，主线程和工作线程的浏览器操作必须串行）"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._driver_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class PornhubScraper:
-    def __init__(self, use_selenium=None):
-        self.base_url = BASE_URL
-        self.proxies = PROXY_CONFIG
+    def __init__(self, use_selenium=None, base_url=None, db_path=None, proxies=None):
+        """初始化采集器
+        
+        Args:
+            use_selenium: 是否使用Selenium，为None时使用配置文件中的设置
+            base_url: 列表页地址，为None时使用配置文件中的BASE_URL（负载测试时指向本地模拟服务器）
+            db_path: 数据库文件路径，为None时使用默认路径
+            proxies: 代理设置，为None时使用配置文件中的PROXY_CONFIG
+        """
+        self.base_url = base_url or BASE_URL
+        # 站点根地址（拼接详情页地址用）
+        parsed_base = urlparse(self.base_url)
+        self.site_root = f"{parsed_base.scheme}://{parsed_base.netloc}"
+        self.proxies = PROXY_CONFIG if proxies is None else proxies
         self.headers = HEADERS
-        self.download_queue = Queue()
+        
+        # 共享HTTP连接池（直连和代理各一个Session，所有线程复用）
+        self.http = HttpSessionManager(headers=self.headers, proxies=self.proxies)
+        
+        # 详情页和下载的自适应并发控制（按主机根据错误率和延迟调整）
+        self.analysis_concurrency = AdaptiveConcurrency(
+            '详情页',
+            initial=DETAIL_PAGE_CONFIG.get('max_workers_requests', 5),
+            max_limit=CONCURRENCY_CONFIG.get('analysis_max_workers', 20),
+        )
+        self.download_concurrency = AdaptiveConcurrency(
+            '下载',
+            initial=SCRAPER_CONFIG.get('download_threads', 10),
+            max_limit=CONCURRENCY_CONFIG.get('download_max_workers', 30),
+        )
+        # 下载队列：缩略图优先，各视频之间轮流下载
+        self.download_queue = DownloadScheduler()
+        # 下载带宽和每主机连接数限制（所有下载线程共享）
+        self.bandwidth = BandwidthGovernor()
         self.download_results = {}
         self.download_lock = threading.Lock()
         
         # 初始化数据库管理器
-        self.db = DatabaseManager()
+        self.db = DatabaseManager(db_path)
+        
+        # 首次使用采集状态表时，从已有的collection_log.txt导入
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.db.import_collection_logs(os.path.join(script_dir, OUTPUT_CONFIG['data_folder']))
         
         # 确定是否使用Selenium
         if use_selenium is None:
@@ -524,6 +1547,12 @@ class PornhubScraper:
             self.use_selenium = use_selenium
         
         self.driver = None
+        # 所有WebDriver操作都在此锁内进行（可重入：加锁的方法之间会互相调用）
+        self._driver_lock = threading.RLock()
+        # 浏览器Cookie导入HTTP会话的状态（版本号用于多线程同时发现Cookie过期时只重新验证一次）
+        self.browser_session_synced = False
+        self._browser_session_generation = 0
+        self._reverify_failed_generations = set()  # 重新验证失败过的会话版本（不再重复尝试）
         self.ad_monitor_thread = None
         self.stop_ad_monitor = False
         
@@ -533,6 +1562,7 @@ class PornhubScraper:
             # 启动广告监控线程
             self.start_ad_monitor()
     
+    @with_driver_lock
     def init_selenium_driver(self):
         """初始化Selenium WebDriver"""
         try:
@@ -745,18 +1775,38 @@ class PornhubScraper:
     
     def close_driver(self):
         """关闭WebDriver"""
-        # 停止广告监控线程
+        # 停止广告监控线程（在加锁之前，监控线程可能正在等待浏览器锁）
         self.stop_ad_monitor_thread()
         
-        if self.driver:
-            try:
-                self.driver.quit()
-                print("✓ WebDriver已关闭")
-            except Exception as e:
-                print(f"关闭WebDriver时出错: {e}")
-            finally:
-                self.driver = None
+        with self._driver_lock:
+            if self.driver:
+                try:
+                    self.driver.quit()
+                    print("✓ WebDriver已关闭")
+                except Exception as e:
+                    print(f"关闭WebDriver时出错: {e}")
+                finally:
+                    self.driver = None
+    
+    def ensure_driver(self):
+        """需要浏览器时确保WebDriver已启动（optimized_run在详情页阶段前会关闭浏览器）
+        
+        Returns:
+            bool: WebDriver是否可用
+        """
+        with self._driver_lock:
+            if self.driver:
+                return True
+            if not self.use_selenium:
+                return False
+            print("🌐 重新启动浏览器...")
+            self.init_selenium_driver()
+            if not self.driver:
+                return False
+        self.start_ad_monitor()
+        return True
     
+    @with_driver_lock
     def close_ad_tabs(self):
         """关闭广告标签页"""
         try:
@@ -840,6 +1890,7 @@ class PornhubScraper:
                 print(f"URL验证出错: {e}")
             return False
     
+    @with_driver_lock
     def handle_age_verification(self):
         """处理年龄验证弹窗 - 强制点击版本"""
         try:
@@ -1012,12 +2063,13 @@ class PornhubScraper:
     
     def get_page(self, url):
         """获取页面内容"""
-        # 如果使用Selenium且driver可用
-        if self.use_selenium and self.driver:
+        # 如果使用Selenium且driver可用（浏览器Cookie已导入HTTP会话后直接使用requests）
+        if self.use_selenium and self.driver and not self.browser_session_synced:
             return self.get_page_selenium(url)
         else:
             return self.get_page_requests(url)
     
+    @with_driver_lock
     def get_page_selenium(self, url):
         """使用Selenium获取页面内容"""
         max_retries = SCRAPER_CONFIG.get('max_retries', 5)  # 增加重试次数
@@ -1027,7 +2079,8 @@ class PornhubScraper:
                 if DEBUG['verbose']:
                     print(f"Selenium访问: {url} (尝试 {attempt + 1}/{max_retries})")
                 
-                # 访问页面
+                # 访问页面（与requests共享限速）
+                self.http.rate_limiter.acquire(url)
                 self.driver.get(url)
                 
                 # 等待页面基本加载
@@ -1099,6 +2152,9 @@ class PornhubScraper:
                 if page_source and len(page_source) > 1000:  # 确保页面内容足够
                     if DEBUG['verbose']:
                         print(f"✓ Selenium成功获取页面: {len(page_source)} 字符")
+                    # 通过验证后导入Cookie，后续请求不再经过浏览器
+                    if not self.browser_session_synced and not self.detect_interstitial(page_source):
+                        self.sync_browser_session()
                     return page_source
                 else:
                     print(f"页面内容无效或过短: {len(page_source) if page_source else 0} 字符")
@@ -1140,6 +2196,7 @@ class PornhubScraper:
         # 检测是否在GitHub Actions环境中
         is_github_actions = self.is_github_actions_environment()
         
+        use_proxy = None
         for attempt in range(max_retries):
             try:
                 # 完全忽略SSL验证
@@ -1150,23 +2207,20 @@ class PornhubScraper:
                     'allow_redirects': True,  # 允许重定向
                 }
                 
-                # 在GitHub Actions环境中不使用代理
-                if is_github_actions:
-                    if attempt == 0:
-                        response = requests.get(url, **kwargs)
-                    else:
-                        # 重试时也不使用代理
-                        response = requests.get(url, **kwargs)
-                else:
-                    # 尝试不使用代理
-                    if attempt == 0:
-                        response = requests.get(url, **kwargs)
-                    else:
-                        # 后续尝试使用代理
-                        kwargs['proxies'] = self.proxies
-                        response = requests.get(url, **kwargs)
+                # 按线路健康状况选择直连或代理（GitHub Actions环境中不使用代理），重试时优先换一条线路
+                use_proxy = self.http.choose_route(allow_proxy=not is_github_actions, avoid=use_proxy)
+                generation = self._browser_session_generation
+                response = self.http.get(url, proxied=use_proxy, concurrency=self.analysis_concurrency, **kwargs)
                 
                 response.raise_for_status()
+                
+                # 被年龄验证或地区限制拦截时（Cookie过期），用浏览器重新验证后重试
+                blocked = self.detect_interstitial(response.text)
+                if blocked:
+                    print(f"⚠️ 请求被拦截（{blocked}）: {url}")
+                    if attempt < max_retries - 1 and self.reverify_browser_session(generation):
+                        continue
+                    return None
                 return response.text
                 
             except requests.exceptions.SSLError as e:
@@ -1198,15 +2252,25 @@ class PornhubScraper:
     
     def parse_video_list(self, html_content):
         """解析视频列表页面"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        video_list = soup.find('ul', {'id': 'videoCategory'})
+        video_list = parse_listing_page(html_content).video_list_soup()
         
         if not video_list:
             print("未找到视频列表")
             return []
         
+        items = video_list.find_all('li', class_='pcVideoListItem')
+        
+        # 批量剔除已采集的视频（每个列表页一次数据库查询），避免请求其详情页
+        completed = set()
+        if SCRAPER_CONFIG.get('skip_existing', True):
+            completed = self.db.get_completed_video_ids([li.get('data-video-vkey', '') for li in items])
+            if completed and DEBUG['verbose']:
+                print(f"跳过 {len(completed)} 个已采集的视频")
+        
         videos = []
-        for li in video_list.find_all('li', class_='pcVideoListItem'):
+        for li in items:
+            if li.get('data-video-vkey', '') in completed:
+                continue
             try:
                 # 提取视频信息
                 video_data = self.extract_video_info(li)
@@ -1219,46 +2283,12 @@ class PornhubScraper:
         return videos
     
     def check_is_last_page(self, html_content):
-        """检查是否为最后一页"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        showing_counter = soup.find('div', class_='showingCounter')
-        
-        if showing_counter:
-            counter_text = showing_counter.get_text(strip=True)
-            # 匹配格式：显示1-32个，共有749个
-            import re
-            pattern = r'显示(\d+)-(\d+)个，共有(\d+)个'
-            match = re.search(pattern, counter_text)
-            
-            if match:
-                end_num = int(match.group(2))
-                total_num = int(match.group(3))
-                return end_num == total_num
-        
-        return False
+        """检查是否为最后一页（showingCounter的结束序号等于总数）"""
+        return parse_listing_page(html_content).is_last_page()
     
     def get_total_pages(self, html_content):
-        """获取总页数"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        showing_counter = soup.find('div', class_='showingCounter')
-        
-        if showing_counter:
-            counter_text = showing_counter.get_text(strip=True)
-            import re
-            pattern = r'显示(\d+)-(\d+)个，共有(\d+)个'
-            match = re.search(pattern, counter_text)
-            
-            if match:
-                start_num = int(match.group(1))
-                end_num = int(match.group(2))
-                total_num = int(match.group(3))
-                
-                # 计算总页数
-                items_per_page = end_num - start_num + 1
-                total_pages = (total_num + items_per_page - 1) // items_per_page
-                return total_pages
-        
-        return None
+        """获取总页数（由showingCounter的每页数量和总数计算）"""
+        return parse_listing_page(html_content).total_pages()
     
     def extract_video_info(self, li_element):
         """从li元素中提取视频信息"""
@@ -1416,10 +2446,11 @@ class PornhubScraper:
         """获取视频详细信息（发布时间、分类、m3u8地址）"""
         try:
             # 构建视频页面URL
-            video_url = f"https://cn.pornhub.com/view_video.php?viewkey={viewkey}"
+            video_url = f"{self.site_root}/view_video.php?viewkey={viewkey}"
             
             # 获取视频页面
             max_retries = 3
+            use_proxy = None
             for attempt in range(max_retries):
                 try:
                     kwargs = {
@@ -1429,11 +2460,9 @@ class PornhubScraper:
                         'allow_redirects': True,
                     }
                     
-                    if attempt == 0:
-                        response = requests.get(video_url, **kwargs)
-                    else:
-                        kwargs['proxies'] = self.proxies
-                        response = requests.get(video_url, **kwargs)
+                    # 按线路健康状况选择直连或代理，重试时优先换一条线路
+                    use_proxy = self.http.choose_route(avoid=use_proxy)
+                    response = self.http.get(video_url, proxied=use_proxy, concurrency=self.analysis_concurrency, **kwargs)
                     
                     response.raise_for_status()
                     html_content = response.text
@@ -1474,54 +2503,14 @@ class PornhubScraper:
                             'url': category_url
                         })
             
-            # 3. 获取m3u8地址
-            m3u8_urls = []
-            scripts = soup.find_all('script')
-            
-            for script in scripts:
-                script_content = script.string
-                if script_content:
-                    # 查找m3u8相关的URL
-                    m3u8_patterns = [
-                        r'https?://[^"\']*\.m3u8[^"\']*',
-                        r'"videoUrl":"([^"]*\.m3u8[^"]*)"',
-                        r"'videoUrl':'([^']*\.m3u8[^']*)'",
-                        r'"url":"([^"]*\.m3u8[^"]*)"',
-                        r"'url':'([^']*\.m3u8[^']*)'",
-                    ]
-                    
-                    for pattern in m3u8_patterns:
-                        matches = re.findall(pattern, script_content, re.IGNORECASE)
-                        for match in matches:
-                            if isinstance(match, tuple):
-                                match = match[0]
-                            if match and match not in m3u8_urls:
-                                # 清理URL（移除转义字符）
-                                clean_url = match.replace('\\/', '/')
-                                m3u8_urls.append(clean_url)
-            
-            # 4. 选择最佳m3u8地址（优先1080P，其次720P）
-            best_m3u8_url = ''
-            if m3u8_urls:
-                # 按优先级排序
-                priority_order = ['1080P', '720P', '480P', '240P']
-                for priority in priority_order:
-                    for url in m3u8_urls:
-                        if priority in url:
-                            best_m3u8_url = url
-                            break
-                    if best_m3u8_url:
-                        break
-                
-                # 如果没有找到优先级匹配的，使用第一个
-                if not best_m3u8_url and m3u8_urls:
-                    best_m3u8_url = m3u8_urls[0]
+            # 3. 获取m3u8地址并选择最佳地址（优先1080P，其次720P）
+            m3u8 = extract_m3u8(html_content)
             
             return {
                 'publish_time': publish_time,
                 'categories': categories,
-                'm3u8_urls': m3u8_urls,
-                'best_m3u8_url': best_m3u8_url
+                'm3u8_urls': m3u8['m3u8_urls'],
+                'best_m3u8_url': m3u8['best_m3u8_url']
             }
             
         except Exception as e:
@@ -1534,25 +2523,39 @@ class PornhubScraper:
             }
     
     def is_video_completed(self, viewkey):
-        """检查视频是否已完成采集"""
+        """检查视频是否已完成采集（查询数据库中的采集状态，成功即表示视频数据和文件都已生成）"""
         try:
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            folder_path = os.path.join(script_dir, OUTPUT_CONFIG['data_folder'], viewkey)
-            log_file = os.path.join(folder_path, 'collection_log.txt')
-            
-            if not os.path.exists(log_file):
-                return False
-            
-            # 读取日志文件
-            with open(log_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 检查是否包含成功标记
-            return '采集状态: 成功' in content
-            
+            return self.db.is_video_collected(viewkey)
         except Exception as e:
             return False
     
+    @staticmethod
+    def _collection_state(video_data, success=True, error_msg=''):
+        """构建采集状态字段"""
+        return {
+            'status': 'success' if success else 'failed',
+            'has_html': int(success),
+            'has_m3u8': int(bool(video_data.get('best_m3u8_url'))),
+            'error_msg': error_msg or None,
+        }
+    
+    def record_collection(self, video_data, folder_path, success=True, error_msg=''):
+        """记录采集结果：更新数据库中的采集状态，并按配置导出文本采集日志"""
+        self.db.enqueue_collection_update(video_data.get('viewkey'),
+                                          **self._collection_state(video_data, success, error_msg))
+        if OUTPUT_CONFIG.get('write_collection_log', True):
+            self.create_collection_log(video_data, folder_path, success=success, error_msg=error_msg)
+    
+    def _record_download_result(self, filepath, success):
+        """下载完成后更新对应视频的文件标记"""
+        artifact = {
+            OUTPUT_CONFIG['thumbnail_filename']: 'has_thumbnail',
+            OUTPUT_CONFIG['preview_filename']: 'has_preview',
+        }.get(os.path.basename(filepath))
+        if artifact:
+            viewkey = os.path.basename(os.path.dirname(filepath))
+            self.db.enqueue_collection_update(viewkey, **{artifact: int(success)})
+    
     def create_collection_log(self, video_data, folder_path, success=True, error_msg=''):
         """创建采集日志"""
         try:
@@ -1596,44 +2599,231 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             print(f"创建采集日志失败: {e}")
             return False
     
-    def download_file(self, url, filepath):
-        """下载文件"""
+    @staticmethod
+    def _content_range_total(response):
+        """从Content-Range响应头（bytes start-end/total）中解析起始位置和文件总大小
+        
+        Returns:
+            tuple: (起始位置, 总大小)，无法解析的部分为None
+        """
+        match = re.match(r'bytes (?:(\d+)-\d+|\*)/(\d+|\*)', response.headers.get('Content-Range', ''))
+        if not match:
+            return None, None
+        start = int(match.group(1)) if match.group(1) else None
+        total = int(match.group(2)) if match.group(2) != '*' else None
+        return start, total
+    
+    @staticmethod
+    def _read_part_validators(part_path):
+        """读取开始下载.part文件时响应的ETag和Last-Modified（保存在旁边的.part.json中）
+        
+        Returns:
+            tuple: (ETag, Last-Modified)，没有记录时为(None, None)
+        """
+        try:
+            with open(part_path + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return meta.get('etag'), meta.get('last_modified')
+        except (OSError, ValueError):
+            return None, None
+    
+    @staticmethod
+    def _write_part_validators(part_path, etag, last_modified):
+        """记录开始下载.part文件时响应的ETag和Last-Modified，续传时用If-Range确认文件未变化"""
+        with open(part_path + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'etag': etag, 'last_modified': last_modified}, f)
+    
+    @staticmethod
+    def _discard_part(part_path):
+        """删除.part文件及其校验信息"""
+        for path in (part_path, part_path + '.json'):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    @staticmethod
+    def _file_sha256(filepath):
+        """分块计算文件的SHA-256"""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _link_file(source, target, copy_fallback=False):
+        """用硬链接把source放到target（原子替换）；不支持硬链接时按需复制
+        
+        Returns:
+            bool: 是否成功
+        """
+        temp_path = target + '.link'
+        try:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            os.link(source, temp_path)
+        except OSError:
+            if not copy_fallback:
+                return False
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
+        return True
+    
+    def _reuse_downloaded_file(self, record, filepath):
+        """按下载记录复用已下载的文件
+        
+        目标文件已存在且大小一致时直接使用；目标文件不存在但记录中的文件还在时链接（或复制）过来。
+        
+        Returns:
+            bool: 目标文件是否可用
+        """
+        if os.path.exists(filepath) and os.path.getsize(filepath) == record['size']:
+            return True
+        source = record['filepath']
+        if source != filepath and os.path.exists(source) and os.path.getsize(source) == record['size']:
+            return self._link_file(source, filepath, copy_fallback=True)
+        return False
+    
+    def _deduplicate_download(self, filepath, sha256):
+        """新下载的文件与其他视频已下载的文件内容相同时，替换为指向同一内容的硬链接"""
+        if not SCRAPER_CONFIG.get('download_hardlink', True):
+            return
+        size = os.path.getsize(filepath)
+        for existing in self.db.find_download_by_hash(sha256, exclude_path=filepath):
+            try:
+                if not os.path.exists(existing) or os.path.getsize(existing) != size:
+                    continue
+                if os.path.samefile(existing, filepath) or self._link_file(existing, filepath):
+                    return
+            except OSError:
+                continue
+    
+    def download_file(self, url, filepath, task_type=None):
+        """下载文件
+        
+        分块流式写入同目录下的.part临时文件，完成并校验大小后原子重命名为目标文件；
+        传输中断时保留.part文件，重试（包括之后的运行）时用Range请求从断点继续下载，
+        并用If-Range带上开始下载时的ETag/Last-Modified，文件已变化时从头下载。
+        每块数据写入前经过带宽控制，同一主机的连接数受max_connections_per_host限制。
+        下载记录中已有该URL时跳过下载（download_revalidate开启时用条件请求确认未变化），
+        内容与已下载的其他文件相同时建立硬链接。
+        
+        Args:
+            url: 文件地址
+            filepath: 保存路径
+            task_type: 任务类型（用于按类别限速）
+        """
         max_retries = SCRAPER_CONFIG.get('max_retries', 3)
+        chunk_size = SCRAPER_CONFIG.get('download_chunk_size', 64 * 1024)
+        part_path = filepath + '.part'
+        task_class = DownloadScheduler.task_class(task_type)
         
         # 检测是否在GitHub Actions环境中
         is_github_actions = self.is_github_actions_environment()
         
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        use_proxy = None
+        
+        # 同一URL已下载过：直接复用，或在开启刷新时用条件请求确认
+        record = self.db.get_download_record(url)
+        revalidate = False
+        if record and self._reuse_downloaded_file(record, filepath):
+            if not SCRAPER_CONFIG.get('download_revalidate', False):
+                return True
+            revalidate = True
+        
+        validators = (None, None)
         for attempt in range(max_retries):
             try:
+                # 已下载的部分从断点继续（用If-Range确认服务器上的文件仍是开始下载时的版本）
+                offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                part_validators = self._read_part_validators(part_path) if offset else (None, None)
+                part_etag, part_last_modified = part_validators
+                if part_etag and part_etag.startswith('W/'):
+                    part_etag = None  # 弱ETag不能用于If-Range
+                if offset and not (part_etag or part_last_modified):
+                    # 无法确认.part是否属于当前版本的文件
+                    self._discard_part(part_path)
+                    offset = 0
+                headers = dict(self.headers)
+                if offset:
+                    headers['Range'] = f'bytes={offset}-'
+                    headers['If-Range'] = part_etag or part_last_modified
+                elif revalidate:
+                    if record.get('etag'):
+                        headers['If-None-Match'] = record['etag']
+                    if record.get('last_modified'):
+                        headers['If-Modified-Since'] = record['last_modified']
+                
                 # 完全忽略SSL验证
                 kwargs = {
-                    'headers': self.headers,
+                    'headers': headers,
                     'timeout': SCRAPER_CONFIG['timeout'],
                     'verify': False,  # 不验证SSL证书
                     'allow_redirects': True,  # 允许重定向
                 }
                 
-                # 在GitHub Actions环境中不使用代理
-                if is_github_actions:
-                    if attempt == 0:
-                        response = requests.get(url, **kwargs)
-                    else:
-                        # 重试时也不使用代理
-                        response = requests.get(url, **kwargs)
-                else:
-                    # 尝试不使用代理
-                    if attempt == 0:
-                        response = requests.get(url, **kwargs)
+                # 按线路健康状况选择直连或代理（GitHub Actions环境中不使用代理），重试时优先换一条线路
+                use_proxy = self.http.choose_route(allow_proxy=not is_github_actions, avoid=use_proxy)
+                with self.bandwidth.connection(url), \
+                        self.http.stream(url, proxied=use_proxy, concurrency=self.download_concurrency, **kwargs) as response:
+                    if response.status_code == 304 and revalidate:
+                        # 文件未变化
+                        self.db.touch_download(url)
+                        return True
+                    
+                    if response.status_code == 416 and offset:
+                        # 断点超出文件大小：.part已经完整，或者服务器上的文件变了
+                        _, expected_size = self._content_range_total(response)
+                        if expected_size != offset:
+                            self._discard_part(part_path)
+                            print(f"断点续传位置无效，重新下载: {os.path.basename(filepath)}")
+                            continue
+                        validators = part_validators
                     else:
-                        # 后续尝试使用代理
-                        kwargs['proxies'] = self.proxies
-                        response = requests.get(url, **kwargs)
-                
-                response.raise_for_status()
+                        response.raise_for_status()
+                        
+                        start, expected_size = self._content_range_total(response)
+                        etag = response.headers.get('ETag')
+                        if response.status_code == 206 and (start != offset or (offset and etag and part_validators[0] and etag != part_validators[0])):
+                            # 返回的片段与断点不符或文件已变化：删除.part，下次不带Range重新下载
+                            self._discard_part(part_path)
+                            print(f"续传响应与断点不符，重新下载: {os.path.basename(filepath)}")
+                            continue
+                        if response.status_code == 206 and offset:
+                            mode = 'ab'
+                            validators = part_validators
+                        elif response.status_code == 206:
+                            # 未请求Range却返回从0开始的片段：按Content-Range的总大小校验
+                            mode = 'wb'
+                            validators = (etag, response.headers.get('Last-Modified'))
+                            self._write_part_validators(part_path, *validators)
+                        else:
+                            # 服务器不支持Range或文件已变化（If-Range不匹配时返回200）：从头下载
+                            offset, mode = 0, 'wb'
+                            validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                            self._write_part_validators(part_path, *validators)
+                            expected_size = None
+                            if 'Content-Encoding' not in response.headers and response.headers.get('Content-Length'):
+                                expected_size = int(response.headers['Content-Length'])
+                        
+                        with open(part_path, mode) as f:
+                            for chunk in response.iter_content(chunk_size=chunk_size):
+                                self.bandwidth.consume(len(chunk), task_class)
+                                f.write(chunk)
+                
+                # 校验文件大小，不完整时保留.part文件续传
+                downloaded = os.path.getsize(part_path)
+                if expected_size is not None and downloaded != expected_size:
+                    print(f"下载不完整 {url} (尝试 {attempt + 1}/{max_retries}): {downloaded}/{expected_size} 字节")
+                    if downloaded > expected_size:
+                        self._discard_part(part_path)
+                    continue
                 
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
+                sha256 = self._file_sha256(part_path)
+                os.replace(part_path, filepath)
+                self._discard_part(part_path)
+                self._deduplicate_download(filepath, sha256)
+                self.db.record_download(url, filepath, downloaded, sha256, *validators)
                 return True
                 
             except requests.exceptions.SSLError as e:
@@ -1678,7 +2868,7 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                 if SCRAPER_CONFIG.get('show_worker_info', False):
                     print(f"线程 {worker_id}: 开始下载 {task_type} - {os.path.basename(filepath)}")
                 
-                success = self.download_file(url, filepath)
+                success = self.download_file(url, filepath, task_type)
                 
                 with self.download_lock:
                     self.download_results[filepath] = success
@@ -1687,6 +2877,9 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                     elif not success:
                         print(f"线程 {worker_id}: ✗ {task_type} 下载失败")
                 
+                # 更新数据库中的文件标记
+                self._record_download_result(filepath, success)
+                
                 self.download_queue.task_done()
                 
             except Exception as e:
@@ -1699,9 +2892,9 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                     pass  # 忽略task_done调用过多的错误
     
     def start_download_workers(self):
-        """启动下载工作线程"""
+        """启动下载工作线程（按自适应并发上限启动，实际并发由download_concurrency控制）"""
         self.download_workers = []
-        num_threads = SCRAPER_CONFIG.get('download_threads', 30)
+        num_threads = max(SCRAPER_CONFIG.get('download_threads', 30), self.download_concurrency.max_limit)
         
         for i in range(num_threads):
             worker = threading.Thread(target=self.download_worker, args=(i+1,))
@@ -1727,13 +2920,27 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
         if DEBUG['verbose']:
             print("所有下载线程已停止")
     
-    def add_download_task(self, url, filepath, task_type):
-        """添加下载任务到队列"""
-        self.download_queue.put((url, filepath, task_type))
+    def add_download_task(self, url, filepath, task_type, size_hint=None):
+        """添加下载任务到队列
+        
+        Args:
+            url: 文件地址
+            filepath: 保存路径
+            task_type: 任务类型（缩略图/预览视频，决定下载优先级）
+            size_hint: 文件大小估计（字节），可选
+        
+        Returns:
+            bool: 是否加入了队列（同一文件已在队列中时返回False）
+        """
+        return self.download_queue.put((url, filepath, task_type), size_hint=size_hint)
     
     def wait_for_downloads(self):
         """等待所有下载完成"""
         self.download_queue.join()
+        if DEBUG['verbose']:
+            print(f"📥 下载队列 - {self.download_queue.format_stats()}")
+            print(f"📥 已下载 {self.bandwidth.bytes_transferred / 1024 / 1024:.1f}MB，"
+                  f"带宽限制等待 {self.bandwidth.throttled_seconds:.1f}s")
         return self.download_results
     
     def create_html_page(self, video_data, folder_path):
@@ -2687,25 +3894,11 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
         script_dir = os.path.dirname(os.path.abspath(__file__))
         folder_path = os.path.join(script_dir, OUTPUT_CONFIG['data_folder'], viewkey)
         
-        # 检查是否已存在（优先检查本地文件，只有本地和数据库都存在才跳过）
-        if SCRAPER_CONFIG.get('skip_existing', True):
-            # 检查本地文件是否存在
-            file_exists = self.is_video_completed(viewkey)
-            
-            if file_exists:
-                # 本地文件存在，再检查数据库中是否也存在
-                db_exists = self.db.video_exists(viewkey)
-                
-                if db_exists:
-                    # 本地文件和数据库都存在，才跳过
-                    if DEBUG['verbose']:
-                        print(f"跳过已存在的视频 (本地+数据库): {video_data.get('title', 'N/A')} (ID: {viewkey})")
-                    return True
-                else:
-                    # 本地文件存在但数据库不存在，不跳过，重新处理以补充数据库
-                    if DEBUG['verbose']:
-                        print(f"本地文件存在但数据库缺失，重新处理: {video_data.get('title', 'N/A')} (ID: {viewkey})")
-            # 本地文件不存在，不跳过，继续处理
+        # 检查是否已采集（采集状态与视频数据在同一事务中写入，成功即表示数据库和文件都已生成）
+        if SCRAPER_CONFIG.get('skip_existing', True) and self.is_video_completed(viewkey):
+            if DEBUG['verbose']:
+                print(f"跳过已存在的视频: {video_data.get('title', 'N/A')} (ID: {viewkey})")
+            return True
         
         if DEBUG['verbose']:
             print(f"处理视频: {video_data.get('title', 'N/A')} (ID: {viewkey})")
@@ -2715,14 +3908,11 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
         os.makedirs(folder_path, exist_ok=True)
         
         try:
-            # 1. 保存视频数据到数据库
-            db_video_id = self.db.insert_video(video_data)
-            
             # 启动下载工作线程（如果还没启动）
             if not hasattr(self, 'download_workers') or not self.download_workers:
                 self.start_download_workers()
             
-            # 2. 添加下载任务到队列
+            # 1. 添加下载任务到队列
             download_tasks = []
             if video_data.get('thumbnail_url'):
                 thumbnail_path = os.path.join(folder_path, OUTPUT_CONFIG['thumbnail_filename'])
@@ -2734,23 +3924,27 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                 self.add_download_task(video_data['preview_url'], preview_path, "预览视频")
                 download_tasks.append(("预览视频", preview_path))
             
-            # 3. 创建HTML页面
+            # 2. 创建HTML页面
             html_path = self.create_html_page(video_data, folder_path)
             if DEBUG['verbose']:
                 print(f"HTML页面创建成功: {html_path}")
             
-            # 4. 创建采集日志
-            self.create_collection_log(video_data, folder_path, success=True)
+            # 3. 保存视频数据和采集状态到数据库（文件生成后最后入库，加入后台批量写入队列，不阻塞当前线程）
+            self.db.enqueue_video(video_data, collection_state=self._collection_state(video_data, success=True))
+            
+            # 4. 导出文本采集日志（可选）
+            if OUTPUT_CONFIG.get('write_collection_log', True):
+                self.create_collection_log(video_data, folder_path, success=True)
             
             if DEBUG['verbose']:
-                print(f"✓ 视频数据已保存到数据库 (DB ID: {db_video_id})")
+                print(f"✓ 视频数据已加入数据库写入队列: {viewkey}")
             
             return True
             
         except Exception as e:
             error_msg = f"处理视频时出错: {e}"
             print(f"❌ {error_msg}")
-            self.create_collection_log(video_data, folder_path, success=False, error_msg=error_msg)
+            self.record_collection(video_data, folder_path, success=False, error_msg=error_msg)
             if DEBUG['verbose']:
                 import traceback
                 traceback.print_exc()
@@ -2791,12 +3985,12 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                 # 更新日志
                 if has_downloads:
                     if download_success:
-                        self.create_collection_log(video_data, folder_path, success=True)
+                        self.record_collection(video_data, folder_path, success=True)
                     else:
-                        self.create_collection_log(video_data, folder_path, success=False, error_msg="部分文件下载失败")
+                        self.record_collection(video_data, folder_path, success=False, error_msg="部分文件下载失败")
                 else:
                     # 没有下载任务，只创建HTML页面
-                    self.create_collection_log(video_data, folder_path, success=True)
+                    self.record_collection(video_data, folder_path, success=True)
                     
         except Exception as e:
             print(f"更新采集日志时出错: {e}")
@@ -2848,8 +4042,7 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                     print(f"检测到第 {current_page} 页为最后一页，停止抓取")
                 break
             
-            # 添加随机延迟，避免被封
-            time.sleep(random.uniform(SCRAPER_CONFIG['delay_min'], SCRAPER_CONFIG['delay_max']))
+            # 请求频率由共享的令牌桶限速器控制（RATE_LIMIT_CONFIG）
             current_page += 1
         
         if DEBUG['verbose']:
@@ -2917,8 +4110,7 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                     print(f"检测到第 {current_page} 页为最后一页，停止抓取")
                 break
             
-            # 添加随机延迟，避免被封
-            time.sleep(random.uniform(SCRAPER_CONFIG['delay_min'], SCRAPER_CONFIG['delay_max']))
+            # 请求频率由共享的令牌桶限速器控制（RATE_LIMIT_CONFIG）
             current_page += 1
         
         if DEBUG['verbose']:
@@ -2979,6 +4171,9 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             # 启动边解析边下载
             success_count = self.scrape_and_download_pages(start_page, end_page, auto_detect_last)
             
+            # 确保所有视频数据已写入数据库
+            self.db.flush_writes()
+            
             # 等待所有下载完成
             if DEBUG['verbose']:
                 print(f"\n等待所有下载任务完成...")
@@ -3006,6 +4201,7 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             # 关闭WebDriver
             self.close_driver()
 
+    @with_driver_lock
     def check_page_type(self, page_source):
         """检查页面类型"""
         try:
@@ -3071,10 +4267,104 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             print("⚠️  未知页面类型")
             return "unknown"
             
-        except Exception as e:
-            print(f"页面类型检测出错: {e}")
-            return "unknown"
+        except Exception as e:
+            print(f"页面类型检测出错: {e}")
+            return "unknown"
+    
+    @staticmethod
+    def detect_interstitial(html_content):
+        """检查HTTP获取到的页面是否为年龄验证或地区限制拦截页（而不是列表页或详情页）
+        
+        Args:
+            html_content: 页面源码
+        
+        Returns:
+            str: 'age_verification'或'region_restricted'，正常页面返回None
+        """
+        if not html_content:
+            return None
+        if 'pcVideoListItem' in html_content or 'flashvars' in html_content:
+            return None
+        if 'js-ageDisclaimerModal' in html_content or 'gtm-event-age-verification' in html_content:
+            return 'age_verification'
+        if 'elected officials' in html_content or 'device-based verification' in html_content:
+            return 'region_restricted'
+        return None
+    
+    @with_driver_lock
+    def sync_browser_session(self):
+        """把浏览器的Cookie和User-Agent导入共享HTTP会话（通过年龄验证后调用）
+        
+        之后的列表页和详情页都可以直接通过HTTP获取，不再经过浏览器。
+        
+        Returns:
+            bool: 是否导入成功
+        """
+        if not self.driver:
+            return False
+        try:
+            cookies = self.driver.get_cookies()
+            user_agent = self.driver.execute_script("return navigator.userAgent")
+        except Exception as e:
+            print(f"⚠️ 导出浏览器Cookie失败: {e}")
+            return False
+        
+        self.http.update_cookies(cookies, user_agent)
+        if user_agent:
+            self.headers = {**self.headers, 'User-Agent': user_agent}
+        self.browser_session_synced = True
+        self._browser_session_generation += 1
+        print(f"✓ 已将浏览器的 {len(cookies)} 个Cookie导入HTTP会话")
+        return True
+    
+    def reverify_browser_session(self, generation):
+        """HTTP请求被拦截（Cookie过期）时用浏览器重新验证并重新导入Cookie
+        
+        多个线程同时发现过期时只有一个线程访问浏览器，其他线程等待后直接使用新Cookie。
+        浏览器已经关闭时按需重新启动。同一会话版本重新验证失败后不再重试，
+        之后被拦截的请求直接按失败处理，不会都排队等待浏览器。
+        
+        Args:
+            generation: 发出被拦截请求时的会话版本号
+        
+        Returns:
+            bool: 是否已获得新的Cookie
+        """
+        if self._browser_session_generation != generation:
+            return True
+        if generation in self._reverify_failed_generations:
+            return False
+        
+        with self._driver_lock:
+            if self._browser_session_generation != generation:
+                return True
+            if generation in self._reverify_failed_generations:
+                return False
+            
+            if self.ensure_driver():
+                print("🔄 Cookie已失效，使用浏览器重新验证...")
+                self.get_page_with_timeout_control(self.base_url, is_first_page=True)
+                if self._browser_session_generation != generation:
+                    return True
+                print("⚠️ 重新验证失败，之后被拦截的请求不再重新验证")
+            self._reverify_failed_generations.add(generation)
+            return False
+    
+    def renew_http_session(self, generation):
+        """异步抓取器的重新验证回调（在抓取器的线程中调用）
+        
+        Args:
+            generation: 抓取器当前Cookie对应的会话版本号
+        
+        Returns:
+            tuple: (新的会话版本号, Cookie列表, 请求头)，重新验证失败时返回None
+        """
+        if not self.reverify_browser_session(generation):
+            return None
+        with self._driver_lock:
+            return self._browser_session_generation, self.http.cookies(), dict(self.headers)
     
+    @with_driver_lock
     def handle_region_restriction(self):
         """处理地区限制"""
         try:
@@ -3126,51 +4416,7 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
         """快速轮询所有页面直到分页结束"""
         print("开始快速轮询所有页面...")
         
-        all_video_urls = []
-        current_page = start_page
-        max_pages = 100  # 最大页数限制，防止无限循环
-        is_first_page = True  # 标记是否为第一个页面
-        
-        while current_page <= max_pages:
-            try:
-                print(f"正在快速获取第 {current_page} 页...")
-                
-                # 构建页面URL
-                page_url = f"{self.base_url}?page={current_page}"
-                
-                # 快速获取页面内容（带超时控制）
-                page_source = self.get_page_with_timeout_control(page_url, is_first_page)
-                
-                if not page_source:
-                    print(f"第 {current_page} 页获取失败，跳过此页")
-                    current_page += 1
-                    continue
-                
-                # 快速解析视频链接（不获取详细信息）
-                video_urls = self.fast_parse_video_urls(page_source)
-                
-                if not video_urls:
-                    print(f"第 {current_page} 页没有找到视频链接，可能已到最后一页")
-                    break
-                
-                print(f"第 {current_page} 页找到 {len(video_urls)} 个视频链接")
-                all_video_urls.extend(video_urls)
-                
-                # 检查是否为最后一页
-                if self.check_is_last_page(page_source):
-                    print(f"检测到第 {current_page} 页为最后一页")
-                    break
-                
-                current_page += 1
-                is_first_page = False  # 第一个页面处理完毕
-                
-                # 短暂延迟，避免请求过快
-                time.sleep(0.5)
-                
-            except Exception as e:
-                print(f"处理第 {current_page} 页时出错: {e}")
-                current_page += 1
-                continue
+        all_video_urls = self.crawl_listing_pages(start_page)
         
         print(f"轮询完成，总共找到 {len(all_video_urls)} 个视频链接")
         return all_video_urls
@@ -3179,45 +4425,110 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
         """快速轮询指定数量的页面"""
         print(f"开始快速轮询 {max_pages} 个页面...")
         
-        all_video_urls = []
-        is_first_page = True
+        all_video_urls = self.crawl_listing_pages(start_page, start_page + max_pages - 1)
         
-        for page_num in range(start_page, start_page + max_pages):
-            try:
-                print(f"正在快速获取第 {page_num} 页...")
-                
-                # 构建页面URL
-                page_url = f"{self.base_url}?page={page_num}"
-                
-                # 快速获取页面内容（带超时控制）
+        print(f"限制轮询完成，总共找到 {len(all_video_urls)} 个视频链接")
+        return all_video_urls
+    
+    def fetch_listing_page(self, page_num, use_selenium=False, is_first_page=False):
+        """获取一个列表页并解析视频链接
+        
+        Args:
+            page_num: 页码
+            use_selenium: 是否通过浏览器获取（需要已初始化driver，否则使用requests）
+            is_first_page: 是否为第一个页面（通过浏览器获取时进行年龄验证）
+        
+        Returns:
+            tuple: (页面源码, 视频链接列表)，获取失败时页面源码为None
+        """
+        page_url = f"{self.base_url}?page={page_num}"
+        try:
+            if use_selenium and self.driver:
                 page_source = self.get_page_with_timeout_control(page_url, is_first_page)
-                
-                if not page_source:
-                    print(f"第 {page_num} 页获取失败，跳过此页")
-                    continue
-                
-                # 快速解析视频链接（不获取详细信息）
-                video_urls = self.fast_parse_video_urls(page_source)
-                
-                if not video_urls:
-                    print(f"第 {page_num} 页没有找到视频链接")
-                    continue
-                
-                print(f"第 {page_num} 页找到 {len(video_urls)} 个视频链接")
-                all_video_urls.extend(video_urls)
-                
-                is_first_page = False
-                
-                # 短暂延迟，避免请求过快
-                time.sleep(0.5)
-                
-            except Exception as e:
-                print(f"处理第 {page_num} 页时出错: {e}")
-                continue
+            else:
+                page_source = self.get_page_requests(page_url)
+        except Exception as e:
+            print(f"处理第 {page_num} 页时出错: {e}")
+            return None, []
         
-        print(f"限制轮询完成，总共找到 {len(all_video_urls)} 个视频链接")
+        if not page_source:
+            return None, []
+        return page_source, self.fast_parse_video_urls(page_source)
+    
+    def crawl_listing_pages(self, start_page=1, end_page=None):
+        """并发抓取列表页
+        
+        先获取起始页（有浏览器时通过浏览器完成年龄验证），从showingCounter计算总页数，
+        其余页面通过共享HTTP会话按批（每批listing_workers页）并发获取；HTTP获取失败的页面再用浏览器补抓，
+        结果按页码顺序合并。无法计算总页数时获取到空页或最后一页为止。
+        未指定结束页时最多获取max_listing_pages页（无论能否计算总页数）。
+        
+        Args:
+            start_page: 起始页
+            end_page: 结束页（None表示到最后一页）
+        
+        Returns:
+            list: 视频链接（按页码顺序）
+        """
+        page_source, first_urls = self.fetch_listing_page(start_page, use_selenium=True, is_first_page=True)
+        if not page_source:
+            print(f"第 {start_page} 页获取失败")
+            return []
+        print(f"第 {start_page} 页找到 {len(first_urls)} 个视频链接")
+        page_urls = {start_page: first_urls}
+        
+        # 确定要抓取的最后一页（未指定结束页时不超过max_listing_pages页）
+        max_pages_end = start_page + SCRAPER_CONFIG.get('max_listing_pages', 100) - 1
+        total_pages = self.get_total_pages(page_source)
+        if not first_urls or self.check_is_last_page(page_source):
+            last_page = start_page
+        elif total_pages:
+            last_page = min(total_pages, max_pages_end if end_page is None else end_page)
+            if end_page is None and total_pages > max_pages_end:
+                print(f"检测到总页数: {total_pages}，超过max_listing_pages，只获取第 {start_page + 1}-{last_page} 页")
+            else:
+                print(f"检测到总页数: {total_pages}，并发获取第 {start_page + 1}-{last_page} 页")
+        else:
+            last_page = end_page
+            print("无法检测总页数，按批并发获取直到最后一页")
+        
+        workers = SCRAPER_CONFIG.get('listing_workers', 8)
+        page_limit = last_page if last_page is not None else max_pages_end
+        next_page = start_page + 1
+        reached_end = last_page == start_page
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while not reached_end and next_page <= page_limit:
+                # 每批提交workers个页面，乱序完成的页面最多只积压一批的HTML
+                batch_end = min(page_limit, next_page + workers - 1)
+                batch = list(range(next_page, batch_end + 1))
+                next_page = batch_end + 1
+                
+                for page_num, (page_source, video_urls) in zip(batch, executor.map(self.fetch_listing_page, batch)):
+                    # HTTP未拿到视频列表（失败或被年龄验证拦截）时用浏览器补抓
+                    if not video_urls and self.driver:
+                        page_source, video_urls = self.fetch_listing_page(page_num, use_selenium=True)
+                    
+                    if not page_source:
+                        print(f"第 {page_num} 页获取失败，跳过此页")
+                        continue
+                    if video_urls:
+                        page_urls[page_num] = video_urls
+                        if DEBUG['verbose']:
+                            print(f"第 {page_num} 页找到 {len(video_urls)} 个视频链接")
+                    
+                    if last_page is None and (not video_urls or self.check_is_last_page(page_source)):
+                        print(f"检测到第 {page_num} 页为最后一页")
+                        reached_end = True
+                        break
+        
+        all_video_urls = []
+        for page_num in sorted(page_urls):
+            all_video_urls.extend(page_urls[page_num])
+        print(f"共获取 {len(page_urls)} 个列表页")
         return all_video_urls
     
+    @with_driver_lock
     def get_page_with_timeout_control(self, url, is_first_page=False):
         """带超时控制的分页获取"""
         max_retries = 3
@@ -3229,6 +4540,7 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                 
                 # 访问页面，最多等待5秒
                 self.driver.set_page_load_timeout(5)
+                self.http.rate_limiter.acquire(url)
                 self.driver.get(url)
                 
                 # 等待页面基本加载
@@ -3250,6 +4562,10 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                                 page_source = self.driver.page_source
                             else:
                                 print("⚠️  年龄验证失败")
+                        
+                        # 通过验证后导入Cookie，后续列表页和详情页直接通过HTTP获取
+                        if not self.detect_interstitial(page_source):
+                            self.sync_browser_session()
                     
                     return page_source
                 else:
@@ -3340,166 +4656,199 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
     def fast_parse_video_urls(self, html_content):
         """快速解析视频链接（不获取详细信息）"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            video_list = soup.find('ul', {'id': 'videoCategory'})
-            
-            if not video_list:
-                return []
-            
-            video_urls = []
-            for li in video_list.find_all('li', class_='pcVideoListItem'):
-                try:
-                    # 获取视频链接
-                    link_element = li.find('a', class_='linkVideoThumb')
-                    if link_element:
-                        video_url = urljoin(self.base_url, link_element.get('href', ''))
-                        if video_url:
-                            video_urls.append(video_url)
-                except Exception as e:
-                    continue
-            
-            return video_urls
-            
+            return parse_listing_page(html_content).video_urls(self.base_url)
         except Exception as e:
             print(f"快速解析视频链接失败: {e}")
             return []
     
+    @staticmethod
+    def extract_viewkey(video_url):
+        """从视频链接中提取viewkey，提取失败返回空字符串"""
+        match = re.search(r'viewkey=([^&#]+)', video_url or '')
+        return match.group(1) if match else ''
+    
+    def filter_completed_video_urls(self, video_urls):
+        """按viewkey去重，并用一次批量查询剔除已采集成功的视频链接
+        
+        Args:
+            video_urls: 视频链接列表
+            
+        Returns:
+            list: 需要获取详情页的视频链接（保持原有顺序）
+        """
+        unique_urls = {}
+        for video_url in video_urls:
+            unique_urls.setdefault(self.extract_viewkey(video_url) or video_url, video_url)
+        
+        if not SCRAPER_CONFIG.get('skip_existing', True):
+            return list(unique_urls.values())
+        
+        completed = self.db.get_completed_video_ids(unique_urls.keys())
+        return [video_url for key, video_url in unique_urls.items() if key not in completed]
+    
     def analyze_video_urls_parallel(self, video_urls, max_workers=10, use_requests=True):
         """多线程分析视频URL，获取详细页面地址数据"""
         print(f"开始多线程分析 {len(video_urls)} 个视频URL...")
         
         if use_requests:
+            # 已安装httpx时使用异步抓取，否则使用requests线程池方式
+            if DETAIL_PAGE_CONFIG.get('use_async', True):
+                if AsyncDetailFetcher.available():
+                    return self.analyze_video_urls_async(video_urls)
+                print("💡 未安装httpx，使用线程池方式（pip install httpx 启用异步抓取）")
             # 使用requests方式（推荐）
             return self.analyze_video_urls_with_requests(video_urls, max_workers)
         else:
             # 使用Selenium多标签页方式
             return self.analyze_video_urls_with_selenium_tabs(video_urls, max_workers)
     
-    def regenerate_data_from_html_db(self, limit=None, update_existing=False):
+    def regenerate_data_from_html_db(self, limit=None, update_existing=False, workers=None, incremental=False):
         """从HTML数据库重新生成data目录和更新视频数据库
         
+        HTML解析是CPU密集型的，workers大于1时分发到多个进程并行解析；
+        数据库写入和文件生成始终在当前进程中完成。
+        
+        增量模式只处理上次增量运行之后新增或内容有变化的页面（按updated_at水位），
+        这些页面不做跳过检查。写入队列提交后再计算水位：水位推进到连续处理成功的最后一个页面，
+        失败的页面（解析出错、process_video失败或后台写入失败）记录到regenerate_failures，
+        连续失败达到regenerate_max_attempts次后视为永久失败，水位不再等待它。
+        
         Args:
             limit: 限制处理的HTML页面数量
             update_existing: 是否更新已存在的视频数据
-            
+            workers: 解析进程数（None使用配置，0表示CPU核数，1表示在当前进程中解析）
+            incremental: 是否只处理水位之后更新的页面
+        
         Returns:
             dict: 处理结果统计
         """
         print("🔄 开始从HTML数据库重新生成data目录...")
         
-        # 获取所有HTML页面
-        html_pages = self.db.get_all_html_pages(limit)
-        
-        if not html_pages:
+        # 增量模式从上次的水位开始（首次运行从头开始，按更新时间正序处理）
+        since = None
+        if incremental:
+            since = self.db.get_regenerate_watermark() or ('', 0)
+            print(f"📍 增量模式，上次水位: {since[0] or '无'} (ID: {since[1]})")
+        
+        # 统计页面数量（页面内容在处理时分批流式读取）
+        total_pages = self.db.count_html_pages(since=since)
+        if limit:
+            total_pages = min(total_pages, limit)
+        
+        if not total_pages:
+            if incremental:
+                print("✅ 没有新增或更新的HTML页面")
+                return {'success': 0, 'failed': 0, 'skipped': 0, 'total': 0}
             print("❌ HTML数据库中没有找到页面数据")
             return {'success': 0, 'failed': 0, 'skipped': 0}
         
-        print(f"📊 找到 {len(html_pages)} 个HTML页面")
+        print(f"📊 找到 {total_pages} 个HTML页面")
+        
+        if workers is None:
+            workers = SCRAPER_CONFIG.get('regenerate_workers', 1)
+        workers = max(1, workers or os.cpu_count() or 1)
+        if workers > 1:
+            print(f"🚀 使用 {workers} 个进程并行解析HTML")
         
         # 启动下载工作线程
         if not hasattr(self, 'download_workers') or not self.download_workers:
             self.start_download_workers()
         
-        success_count = 0
-        failed_count = 0
-        skipped_count = 0
+        stats = {'success': 0, 'failed': 0, 'skipped': 0}
         
-        for i, html_page in enumerate(html_pages, 1):
-            url = html_page['url']
-            html_content = html_page['html_content']
-            
-            print(f"🔄 处理页面 {i}/{len(html_pages)}: {url}")
-            
-            try:
+        # 各页面的处理结果，写入队列提交后按页面顺序计算水位（并行解析时完成顺序不固定）
+        page_order = []
+        outcomes = {}  # 水位键 -> (url, viewkey, 失败原因)，成功时失败原因为None
+        
+        def mark_finished(key, url, viewkey=None, error=None):
+            if incremental:
+                outcomes[key] = (url, viewkey, error)
+
+        def pending_pages():
+            """逐个产出需要解析的 (url, viewkey, html_content, 水位键)，跳过的页面在这里统计"""
+            for i, html_page in enumerate(self.db.iter_html_pages(since=since, limit=limit), 1):
+                url = html_page['url']
+                key = (html_page['updated_at'], html_page['id'])
+                page_order.append(key)
+                print(f"🔄 处理页面 {i}/{total_pages}: {url}")
+                
                 # 从URL提取viewkey
-                import re
                 viewkey_match = re.search(r'viewkey=([^&]+)', url)
                 if not viewkey_match:
                     print(f"⚠️ 无法从URL提取viewkey: {url}")
-                    failed_count += 1
+                    stats['failed'] += 1
+                    mark_finished(key, url)  # 重试也无法处理，不阻塞水位
                     continue
                 
                 viewkey = viewkey_match.group(1)
                 
-                # 检查是否需要跳过
-                if not update_existing:
-                    # 检查视频是否已存在且文件完整
-                    if self.db.video_exists(viewkey) and self.is_video_completed(viewkey):
+                # 检查是否需要跳过（增量模式下页面内容已变化，不跳过）
+                if not update_existing and not incremental:
+                    # 检查视频是否已采集成功（数据库和文件都已生成）
+                    if self.is_video_completed(viewkey):
                         print(f"⏭️ 跳过已存在的视频: {viewkey}")
-                        skipped_count += 1
+                        stats['skipped'] += 1
+                        mark_finished(key, url)
                         continue
                 
-                # 解析HTML内容
-                soup = BeautifulSoup(html_content, 'html.parser')
-                
-                # 使用现有的提取函数获取视频数据
-                video_data = self.extract_video_metadata(soup, url)
-                
-                # 提取缩略图和预览视频URL
-                thumbnail_url, preview_url = self.extract_thumbnail_and_preview_urls(soup)
-                video_data['thumbnail_url'] = thumbnail_url
-                video_data['preview_url'] = preview_url
-                
-                # 提取M3U8地址
-                m3u8_urls = []
-                scripts = soup.find_all('script')
-                for script in scripts:
-                    script_content = script.string
-                    if script_content:
-                        m3u8_patterns = [
-                            r'https?://[^"\']*\.m3u8[^"\']*',
-                            r'"videoUrl":"([^"]*\.m3u8[^"]*)"',
-                            r"'videoUrl':'([^']*\.m3u8[^']*)'",
-                        ]
-                        
-                        for pattern in m3u8_patterns:
-                            matches = re.findall(pattern, script_content, re.IGNORECASE)
-                            for match in matches:
-                                if isinstance(match, tuple):
-                                    match = match[0]
-                                if match and match not in m3u8_urls:
-                                    clean_url = match.replace('\\/', '/')
-                                    m3u8_urls.append(clean_url)
-                
-                video_data['m3u8_urls'] = m3u8_urls
-                
-                # 选择最佳m3u8地址
-                if m3u8_urls:
-                    # 优先选择1080P，然后是720P
-                    best_m3u8 = None
-                    for quality in ['1080P', '720P', '480P', '240P']:
-                        for url in m3u8_urls:
-                            if quality in url:
-                                best_m3u8 = url
-                                break
-                        if best_m3u8:
-                            break
-                    
-                    if not best_m3u8:
-                        best_m3u8 = m3u8_urls[0]
-                    
-                    video_data['best_m3u8_url'] = best_m3u8
-                
-                # 设置兼容字段
-                video_data['url'] = url
-                video_data['alt_text'] = ''
-                
-                # 处理视频（保存到数据库和创建文件）
-                success = self.process_video(video_data)
-                
-                if success:
-                    success_count += 1
-                    print(f"✅ 成功处理: {video_data.get('title', 'N/A')} (ID: {viewkey})")
-                else:
-                    failed_count += 1
-                    print(f"❌ 处理失败: {viewkey}")
-                    
-            except Exception as e:
-                failed_count += 1
-                print(f"❌ 处理页面失败 {url}: {e}")
-                if DEBUG.get('verbose', False):
-                    import traceback
-                    traceback.print_exc()
+                yield url, viewkey, html_page['html_content'], key
+        
+        def handle_parsed(url, viewkey, video_data, key):
+            """保存解析结果（保存到数据库和创建文件）"""
+            success = self.process_video(video_data)
+            
+            if success:
+                stats['success'] += 1
+                mark_finished(key, url, viewkey)
+                print(f"✅ 成功处理: {video_data.get('title', 'N/A')} (ID: {viewkey})")
+            else:
+                stats['failed'] += 1
+                mark_finished(key, url, viewkey, 'process_video失败')
+                print(f"❌ 处理失败: {viewkey}")
+        
+        def handle_error(url, viewkey, key, e):
+            stats['failed'] += 1
+            mark_finished(key, url, viewkey, e)
+            print(f"❌ 处理页面失败 {url}: {e}")
+            if DEBUG.get('verbose', False):
+                import traceback
+                traceback.print_exc()
+        
+        if workers == 1:
+            for url, viewkey, html_content, key in pending_pages():
+                try:
+                    handle_parsed(url, viewkey, parse_video_detail_html(html_content, url), key)
+                except Exception as e:
+                    handle_error(url, viewkey, key, e)
+        else:
+            # 限制在途任务数量，避免HTML全部堆积在内存中
+            max_in_flight = workers * 4
+            in_flight = {}
+            
+            def drain(return_when):
+                done, _ = wait(in_flight, return_when=return_when)
+                for future in done:
+                    url, viewkey, key = in_flight.pop(future)
+                    try:
+                        handle_parsed(url, viewkey, future.result(), key)
+                    except Exception as e:
+                        handle_error(url, viewkey, key, e)
+            
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for url, viewkey, html_content, key in pending_pages():
+                    future = executor.submit(parse_video_detail_html, html_content, url)
+                    in_flight[future] = (url, viewkey, key)
+                    if len(in_flight) >= max_in_flight:
+                        drain(FIRST_COMPLETED)
+                if in_flight:
+                    drain(ALL_COMPLETED)
+        
+        # 确保所有视频数据已写入数据库
+        self.db.flush_writes()
+        
+        # 视频数据提交后再计算并保存水位
+        if incremental:
+            self.update_regenerate_watermark(since, page_order, outcomes)
         
         # 等待下载完成
         print("⏳ 等待下载队列完成...")
@@ -3508,210 +4857,105 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
         # 停止下载工作线程
         self.stop_download_workers()
         
-        result = {
-            'success': success_count,
-            'failed': failed_count,
-            'skipped': skipped_count,
-            'total': len(html_pages)
-        }
+        result = dict(stats, total=total_pages)
         
         print(f"\n🎉 重新生成完成!")
         print(f"📊 处理统计:")
-        print(f"  - 成功: {success_count}")
-        print(f"  - 失败: {failed_count}")
-        print(f"  - 跳过: {skipped_count}")
-        print(f"  - 总计: {len(html_pages)}")
+        print(f"  - 成功: {stats['success']}")
+        print(f"  - 失败: {stats['failed']}")
+        print(f"  - 跳过: {stats['skipped']}")
+        print(f"  - 总计: {total_pages}")
         
         return result
     
-    def extract_video_metadata(self, soup, video_url):
-        """提取视频元数据（时长、上传者、观看次数、发布时间等）"""
-        import re
-        
-        video_data = {
-            'video_id': '',
-            'viewkey': '',
-            'title': '',
-            'video_url': video_url,
-            'duration': '',
-            'uploader': '',
-            'views': '',
-            'publish_time': '',
-            'categories': [],
-            'thumbnail_url': '',
-            'preview_url': '',
-            'best_m3u8_url': '',
-            'm3u8_urls': []
-        }
-        
-        # 从URL提取viewkey
-        viewkey_match = re.search(r'viewkey=([^&]+)', video_url)
-        if viewkey_match:
-            video_data['viewkey'] = viewkey_match.group(1)
-            video_data['video_id'] = viewkey_match.group(1)
-        
-        # 提取标题
-        title_element = soup.find('title')
-        if title_element:
-            video_data['title'] = title_element.get_text(strip=True)
-            # 清理标题
-            for suffix in [' - Pornhub.com', ' - PornHub', ' | Pornhub']:
-                video_data['title'] = video_data['title'].replace(suffix, '')
-        
-        # 提取时长 - 尝试多种选择器
-        duration_element = (soup.find('span', class_='duration') or 
-                          soup.find('span', {'class': 'runtime'}) or 
-                          soup.find('span', {'data-role': 'duration'}) or
-                          soup.find('div', class_='duration'))
-        if duration_element:
-            video_data['duration'] = duration_element.get_text(strip=True)
-        else:
-            # 从脚本中提取时长
-            duration_match = re.search(r'"duration"[:\s]*"([^"]+)"', str(soup))
-            if not duration_match:
-                duration_match = re.search(r'"runtime"[:\s]*"([^"]+)"', str(soup))
-            if duration_match:
-                video_data['duration'] = duration_match.group(1)
-        
-        # 提取上传者 - 尝试多种选择器
-        uploader_element = (soup.find('a', class_='username') or 
-                          soup.find('a', class_='usernameLink') or 
-                          soup.find('span', class_='username') or
-                          soup.find('div', class_='usernameBadgesWrapper') or
-                          soup.find('a', {'data-qa': 'user-name'}))
-        if uploader_element:
-            video_data['uploader'] = uploader_element.get_text(strip=True)
-        else:
-            # 从脚本中提取上传者
-            uploader_match = re.search(r'"uploader"[:\s]*"([^"]+)"', str(soup))
-            if not uploader_match:
-                uploader_match = re.search(r'"author"[:\s]*"([^"]+)"', str(soup))
-            if uploader_match:
-                video_data['uploader'] = uploader_match.group(1)
-        
-        # 提取观看次数 - 尝试多种选择器
-        views_element = (soup.find('span', class_='views') or 
-                       soup.find('span', class_='count') or
-                       soup.find('div', class_='views') or
-                       soup.find('span', {'data-qa': 'view-count'}))
-        if views_element:
-            video_data['views'] = views_element.get_text(strip=True)
-        else:
-            # 从脚本中提取观看次数
-            views_match = re.search(r'"views"[:\s]*"([^"]+)"', str(soup))
-            if not views_match:
-                views_match = re.search(r'"viewCount"[:\s]*(\d+)', str(soup))
-            if views_match:
-                video_data['views'] = views_match.group(1)
-        
-        # 提取发布时间 - 尝试多种选择器
-        publish_element = (soup.find('span', class_='publishDate') or 
-                         soup.find('time') or
-                         soup.find('span', class_='added') or
-                         soup.find('div', class_='date'))
-        if publish_element:
-            video_data['publish_time'] = publish_element.get_text(strip=True)
-        else:
-            # 从脚本中提取发布时间
-            publish_match = re.search(r'"publishDate"[:\s]*"([^"]+)"', str(soup))
-            if not publish_match:
-                publish_match = re.search(r'"datePublished"[:\s]*"([^"]+)"', str(soup))
-            if publish_match:
-                video_data['publish_time'] = publish_match.group(1)
-        
-        # 提取分类 - 尝试多种选择器
-        categories = []
-        # 尝试多种分类选择器
-        category_selectors = [
-            'a.category',           # 常见的分类链接
-            'a[href*="/categories/"]',  # 包含categories路径的链接
-            '.category-link',       # 分类链接class
-            '.categoriesWrapper a', # 分类包装器内的链接
-            '.video-categories a',  # 视频分类容器内的链接
-            '.tags a',              # 标签链接
-            'a[data-type="category"]', # 带有data-type的分类链接
-            '.tagsContainer a',     # 标签容器内的链接
-            '.video-tags a',        # 视频标签链接
-            'a.tag',                # 标签链接
-        ]
+    def update_regenerate_watermark(self, since, page_order, outcomes):
+        """按页面顺序推进并保存增量重新生成的水位（写入队列提交后调用）
         
-        if DEBUG.get('verbose', False):
-            print(f"开始提取分类，视频URL: {video_url}")
+        后台写入失败的视频也算作处理失败。失败次数未达到上限的页面使水位停在其之前，下次重试；
+        达到上限的页面视为永久失败，水位越过它（失败记录保留在regenerate_failures中）。
         
-        for i, selector in enumerate(category_selectors):
-            try:
-                elements = soup.select(selector)
-                
-                if DEBUG.get('verbose', False):
-                    print(f"选择器 {i+1} '{selector}': 找到 {len(elements)} 个元素")
-                
-                for element in elements:
-                    if element and element.get_text(strip=True):
-                        category_text = element.get_text(strip=True)
-                        href = element.get('href', '')
-                        
-                        if DEBUG.get('verbose', False):
-                            print(f"  - 候选分类: '{category_text}' -> '{href}'")
-                        
-                        # 过滤掉非分类的链接
-                        if (category_text and 
-                            len(category_text) < 50 and  # 分类名通常不会太长
-                            not any(skip in category_text.lower() for skip in ['pornhub', 'premium', 'upload', 'login', 'register', 'contact', 'view', 'watch', 'home', 'browse', 'faq', '常见问题', '信任', '安全', 'help', 'support', '视频']) and
-                            '/categories/' in href):  # 确保是真正的分类链接
-                            categories.append({
-                                'name': category_text,
-                                'url': href
-                            })
-                            if DEBUG.get('verbose', False):
-                                print(f"    ✓ 已添加分类: '{category_text}'")
-                
-                # 如果找到分类就停止搜索
-                if categories:
-                    if DEBUG.get('verbose', False):
-                        print(f"找到 {len(categories)} 个分类，停止搜索")
-                    break
-            except Exception as e:
-                if DEBUG.get('verbose', False):
-                    print(f"选择器 '{selector}' 出错: {e}")
+        Args:
+            since: 本次运行开始时的水位
+            page_order: 按处理顺序排列的页面水位键
+            outcomes: {水位键: (url, viewkey, 失败原因)}
+        """
+        max_attempts = max(1, SCRAPER_CONFIG.get('regenerate_max_attempts', 3))
+        write_failures = self.db.take_write_failures()
+        watermark = since
+        blocked_at = None
+        succeeded = []
+        permanent = 0
+        
+        for key in page_order:
+            if key not in outcomes:
+                # 未处理完（运行被中断），水位停在这里
+                if blocked_at is None:
+                    blocked_at = key
                 continue
+            url, viewkey, error = outcomes[key]
+            if error is None and viewkey and viewkey in write_failures:
+                error = '保存到数据库失败'
+            if error is None:
+                succeeded.append(key[1])
+            else:
+                attempts = self.db.record_regenerate_failure(key, url, error)
+                if attempts < max_attempts:
+                    if blocked_at is None:
+                        blocked_at = key
+                elif blocked_at is None:
+                    permanent += 1
+                    print(f"⚠️ 页面连续失败 {attempts} 次，不再重试: {url} ({error})")
+            if blocked_at is None:
+                watermark = key
+        
+        self.db.clear_regenerate_failures(succeeded)
+        if watermark != since:
+            self.db.set_regenerate_watermark(watermark)
+            print(f"📍 水位已更新: {watermark[0]} (ID: {watermark[1]})")
+        if permanent:
+            print(f"⚠️ {permanent} 个页面达到失败次数上限，已被水位越过（记录在regenerate_failures表中）")
+        if blocked_at is not None:
+            remaining = len(page_order) - page_order.index(blocked_at)
+            print(f"⚠️ 有页面处理失败，水位停在其之前，下次增量运行将从 {blocked_at[0]} (ID: {blocked_at[1]}) 重新处理 {remaining} 个页面")
+    
+    def analyze_video_urls_async(self, video_urls):
+        """使用asyncio异步抓取分析视频URL
         
-        # 如果还是没找到，尝试从脚本中提取
-        if not categories:
-            try:
-                # 从JavaScript中查找分类信息
-                category_patterns = [
-                    r'"categories":\s*\[([^\]]+)\]',
-                    r'"category":\s*"([^"]+)"',
-                    r'"tags":\s*\[([^\]]+)\]',
-                ]
-                
-                for pattern in category_patterns:
-                    matches = re.search(pattern, str(soup))
-                    if matches:
-                        category_text = matches.group(1)
-                        if '"' in category_text:
-                            # 提取引号内的内容
-                            cat_names = re.findall(r'"([^"]+)"', category_text)
-                            for name in cat_names:
-                                if name and len(name) < 50:
-                                    categories.append({
-                                        'name': name,
-                                        'url': ''
-                                    })
-                        break
-            except Exception:
-                pass
-        
-        video_data['categories'] = categories
+        大量详情页请求同时在途（按主机限制并发），解析在进程池中进行，
+        HTML入库和process_video在线程池中进行。
+        """
+        print("使用异步方式分析视频URL...")
+        
+        fetcher = AsyncDetailFetcher(
+            parse=parse_video_detail_html,
+            on_html=self.db.insert_html_page,
+            on_parsed=self.process_video,
+            headers=self.headers,
+            proxies=self.proxies,
+            use_proxy=not self.is_github_actions_environment(),
+            concurrency=self.analysis_concurrency,
+            cookies=self.http.cookies(),
+            reject=self.detect_interstitial,
+            reverify=self.renew_http_session,
+            session_generation=self._browser_session_generation,
+        )
+        analyzed_data = fetcher.run(video_urls)
         
-        return video_data
-
+        stats = fetcher.stats
+        print(f"分析完成，成功分析 {len(analyzed_data)} 个视频 "
+              f"(获取: {stats['fetched']}, 解析: {stats['parsed']}, 失败: {stats['failed']})")
+        self.print_concurrency_limits(self.analysis_concurrency)
+        return analyzed_data
+    
     def analyze_video_urls_with_requests(self, video_urls, max_workers=10):
-        """使用requests多线程分析视频URL"""
+        """使用requests多线程分析视频URL
+        
+        线程池按自适应并发上限创建，实际同时发出的请求数由analysis_concurrency按主机控制。
+        """
         print("使用requests方式分析视频URL...")
         
         # 创建线程池
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        with ThreadPoolExecutor(max_workers=max(max_workers, self.analysis_concurrency.max_limit)) as executor:
             # 提交所有任务
             future_to_url = {executor.submit(self.analyze_single_video_url_with_requests, url): url for url in video_urls}
             
@@ -3735,8 +4979,15 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                     completed += 1
         
         print(f"分析完成，成功分析 {len(analyzed_data)} 个视频")
+        self.print_concurrency_limits(self.analysis_concurrency)
         return analyzed_data
     
+    def print_concurrency_limits(self, concurrency):
+        """输出自适应并发控制器当前各主机的并发上限"""
+        limits = concurrency.limits()
+        if limits:
+            print(f"⚙️ {concurrency.name}当前并发: " + ', '.join(f"{host}={limit}" for host, limit in limits.items()))
+    
     def analyze_single_video_url_with_requests(self, video_url):
         """使用requests分析单个视频URL，同时进行下载"""
         try:
@@ -3753,59 +5004,8 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                 if DEBUG.get('verbose', False):
                     print(f"保存HTML源码失败: {e}")
             
-            # 解析视频详细信息
-            soup = BeautifulSoup(page_source, 'html.parser')
-            
-            # 使用改进的提取函数获取基本信息
-            video_data = self.extract_video_metadata(soup, video_url)
-            
-            # 保持原有字段名的兼容性
-            video_data['url'] = video_url
-            video_data['alt_text'] = ''
-            
-            # 提取缩略图和预览视频 - 使用改进的方法
-            thumbnail_url, preview_url = self.extract_thumbnail_and_preview_urls(soup)
-            video_data['thumbnail_url'] = thumbnail_url
-            video_data['preview_url'] = preview_url
-            
-            # 分类已在extract_video_metadata中提取，无需重复
-            
-            # 提取m3u8地址
-            m3u8_urls = []
-            scripts = soup.find_all('script')
-            for script in scripts:
-                script_content = script.string
-                if script_content:
-                    m3u8_patterns = [
-                        r'https?://[^"\']*\.m3u8[^"\']*',
-                        r'"videoUrl":"([^"]*\.m3u8[^"]*)"',
-                        r"'videoUrl':'([^']*\.m3u8[^']*)'",
-                    ]
-                    
-                    for pattern in m3u8_patterns:
-                        matches = re.findall(pattern, script_content, re.IGNORECASE)
-                        for match in matches:
-                            if isinstance(match, tuple):
-                                match = match[0]
-                            if match and match not in m3u8_urls:
-                                clean_url = match.replace('\\/', '/')
-                                m3u8_urls.append(clean_url)
-            
-            video_data['m3u8_urls'] = m3u8_urls
-            
-            # 选择最佳m3u8地址
-            if m3u8_urls:
-                priority_order = ['1080P', '720P', '480P', '240P']
-                for priority in priority_order:
-                    for url in m3u8_urls:
-                        if priority in url:
-                            video_data['best_m3u8_url'] = url
-                            break
-                    if video_data['best_m3u8_url']:
-                        break
-                
-                if not video_data['best_m3u8_url'] and m3u8_urls:
-                    video_data['best_m3u8_url'] = m3u8_urls[0]
+            # 解析视频详细信息（字段、缩略图、预览视频和m3u8地址）
+            video_data = parse_video_detail_html(page_source, video_url)
             
             # 保存到数据库
             if video_data.get('viewkey'):
@@ -3849,17 +5049,18 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                 preview_path = os.path.join(folder_path, OUTPUT_CONFIG['preview_filename'])
                 self.add_download_task(video_data['preview_url'], preview_path, "预览视频")
             
-            # 创建采集日志
-            self.create_collection_log(video_data, folder_path, success=True)
+            # 记录采集状态
+            self.record_collection(video_data, folder_path, success=True)
             
         except Exception as e:
             print(f"处理视频数据失败 {video_data.get('viewkey', 'unknown')}: {e}")
-            # 创建失败日志
+            # 记录失败状态
             try:
-                self.create_collection_log(video_data, folder_path, success=False, error_msg=str(e))
+                self.record_collection(video_data, folder_path, success=False, error_msg=str(e))
             except:
                 pass
     
+    @with_driver_lock
     def analyze_single_video_url_with_tab(self, video_url):
         """使用新标签页分析单个视频URL"""
         try:
@@ -3900,6 +5101,7 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             
             # 访问视频页面
             try:
+                self.http.rate_limiter.acquire(video_url)
                 self.driver.get(video_url)
                 time.sleep(2)
             except Exception as e:
@@ -3945,58 +5147,8 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                     pass
                 return None
             
-            # 解析视频详细信息
-            soup = BeautifulSoup(page_source, 'html.parser')
-            
-            # 使用改进的提取函数获取基本信息
-            video_data = self.extract_video_metadata(soup, video_url)
-            
-            # 保持原有字段名的兼容性
-            video_data['url'] = video_url
-            
-            # 提取缩略图和预览视频 - 使用改进的方法
-            thumbnail_url, preview_url = self.extract_thumbnail_and_preview_urls(soup)
-            video_data['thumbnail_url'] = thumbnail_url
-            video_data['preview_url'] = preview_url
-            
-            # 分类已在extract_video_metadata中提取，无需重复
-            
-            # 提取m3u8地址
-            m3u8_urls = []
-            scripts = soup.find_all('script')
-            for script in scripts:
-                script_content = script.string
-                if script_content:
-                    m3u8_patterns = [
-                        r'https?://[^"\']*\.m3u8[^"\']*',
-                        r'"videoUrl":"([^"]*\.m3u8[^"]*)"',
-                        r"'videoUrl':'([^']*\.m3u8[^']*)'",
-                    ]
-                    
-                    for pattern in m3u8_patterns:
-                        matches = re.findall(pattern, script_content, re.IGNORECASE)
-                        for match in matches:
-                            if isinstance(match, tuple):
-                                match = match[0]
-                            if match and match not in m3u8_urls:
-                                clean_url = match.replace('\\/', '/')
-                                m3u8_urls.append(clean_url)
-            
-            video_data['m3u8_urls'] = m3u8_urls
-            
-            # 选择最佳m3u8地址
-            if m3u8_urls:
-                priority_order = ['1080P', '720P', '480P', '240P']
-                for priority in priority_order:
-                    for url in m3u8_urls:
-                        if priority in url:
-                            video_data['best_m3u8_url'] = url
-                            break
-                    if video_data['best_m3u8_url']:
-                        break
-                
-                if not video_data['best_m3u8_url'] and m3u8_urls:
-                    video_data['best_m3u8_url'] = m3u8_urls[0]
+            # 解析视频详细信息（字段、缩略图、预览视频和m3u8地址）
+            video_data = parse_video_detail_html(page_source, video_url)
             
             # 保存到数据库
             if video_data.get('viewkey'):
@@ -4038,12 +5190,13 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
         
         # 确保主标签页存在（用于年龄验证）
         try:
-            if len(self.driver.window_handles) == 0:
-                print("错误：没有可用的标签页")
-                return []
-            
-            # 记录主标签页
-            main_handle = self.driver.window_handles[0]
+            with self._driver_lock:
+                if len(self.driver.window_handles) == 0:
+                    print("错误：没有可用的标签页")
+                    return []
+                
+                # 记录主标签页
+                main_handle = self.driver.window_handles[0]
         except Exception as e:
             print(f"检查标签页失败: {e}")
             return []
@@ -4082,10 +5235,11 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
         
         # 确保最终回到主标签页
         try:
-            if main_handle in self.driver.window_handles:
-                self.driver.switch_to.window(main_handle)
-            elif len(self.driver.window_handles) > 0:
-                self.driver.switch_to.window(self.driver.window_handles[0])
+            with self._driver_lock:
+                if main_handle in self.driver.window_handles:
+                    self.driver.switch_to.window(main_handle)
+                elif len(self.driver.window_handles) > 0:
+                    self.driver.switch_to.window(self.driver.window_handles[0])
         except Exception as e:
             print(f"切换回主标签页失败: {e}")
         
@@ -4107,13 +5261,15 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
         """多线程下载视频数据"""
         print(f"开始多线程下载 {len(analyzed_data)} 个视频数据...")
         
-        # 创建下载任务
-        download_tasks = []
+        # 创建下载任务（同一视频的同一文件只下载一次）
+        download_tasks = {}
         for video_data in analyzed_data:
+            viewkey = video_data.get('viewkey', 'unknown')
             if video_data.get('thumbnail_url'):
-                download_tasks.append(('thumbnail', video_data['thumbnail_url'], video_data))
+                download_tasks.setdefault(('thumbnail', viewkey), ('thumbnail', video_data['thumbnail_url'], video_data))
             if video_data.get('preview_url'):
-                download_tasks.append(('preview', video_data['preview_url'], video_data))
+                download_tasks.setdefault(('preview', viewkey), ('preview', video_data['preview_url'], video_data))
+        download_tasks = list(download_tasks.values())
         
         # 创建线程池
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -4164,7 +5320,7 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             filepath = os.path.join(folder_path, filename)
             
             # 下载文件
-            success = self.download_file(url, filepath)
+            success = self.download_file(url, filepath, task_type=file_type)
             
             # 创建HTML页面
             if success:
@@ -4209,7 +5365,25 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             
             print(f"✅ 第一阶段完成，找到 {len(video_urls)} 个视频链接")
             
-            # 获取完视频地址列表后关闭Selenium（如果使用requests方式）
+            # 批量剔除重复和已采集的视频（一次数据库查询），避免重复请求详情页
+            pending_urls = self.filter_completed_video_urls(video_urls)
+            skipped_count = len(video_urls) - len(pending_urls)
+            if skipped_count:
+                print(f"⏭️ 跳过 {skipped_count} 个已采集或重复的视频链接，剩余 {len(pending_urls)} 个需要获取详情")
+            
+            if not pending_urls:
+                print("✅ 所有视频都已采集，无需获取详情页")
+                return {
+                    'video_urls': video_urls,
+                    'analyzed_data': [],
+                    'success_count': 0,
+                    'skipped_count': skipped_count,
+                    'total_count': 0,
+                    'duration': time.time() - start_time,
+                    'success_rate': 100.0
+                }
+            
+            # 获取完视频地址列表后关闭Selenium（如果使用requests方式；Cookie过期时reverify_browser_session会重新启动）
             if use_requests_for_details and self.driver:
                 print("💾 视频地址列表获取完成，关闭Selenium以释放资源...")
                 self.close_driver()
@@ -4219,12 +5393,15 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             max_workers = DETAIL_PAGE_CONFIG.get('max_workers_requests' if use_requests_for_details else 'max_workers_selenium', 5)
             print(f"使用 {max_workers} 个工作线程")
             
-            analyzed_data = self.analyze_video_urls_parallel(video_urls, max_workers=max_workers, use_requests=use_requests_for_details)
+            analyzed_data = self.analyze_video_urls_parallel(pending_urls, max_workers=max_workers, use_requests=use_requests_for_details)
             
             if not analyzed_data:
                 print("❌ 未成功分析任何视频数据")
                 return None
             
+            # 确保所有视频数据已写入数据库
+            self.db.flush_writes()
+            
             # 等待下载完成
             if hasattr(self, 'download_workers') and self.download_workers:
                 print("\n⏳ 等待下载队列完成...")
@@ -4238,8 +5415,9 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             print(f"\n=== 🎉 采集完成 ===")
             print(f"⏱️  总耗时: {duration:.1f} 秒")
             print(f"🔗 总视频链接数: {len(video_urls)}")
+            print(f"⏭️  已采集跳过数: {skipped_count}")
             print(f"✅ 成功分析数: {len(analyzed_data)}")
-            print(f"📈 成功率: {len(analyzed_data)/len(video_urls)*100:.1f}%")
+            print(f"📈 成功率: {len(analyzed_data)/len(pending_urls)*100:.1f}%")
             print(f"📁 数据已保存到数据库: {self.db.db_path}")
             
             # 显示数据库统计信息
@@ -4250,9 +5428,10 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
                 'video_urls': video_urls,
                 'analyzed_data': analyzed_data,
                 'success_count': len(analyzed_data),
-                'total_count': len(video_urls),
+                'skipped_count': skipped_count,
+                'total_count': len(pending_urls),
                 'duration': duration,
-                'success_rate': len(analyzed_data)/len(video_urls)*100
+                'success_rate': len(analyzed_data)/len(pending_urls)*100
             }
             
         except KeyboardInterrupt:
@@ -4267,161 +5446,35 @@ ViewKey: {video_data.get('viewkey', 'N/A')}
             if hasattr(self, 'download_workers') and self.download_workers:
                 self.stop_download_workers()
             return None
+        finally:
+            # 无论哪种方式结束（包括所有视频都已采集时的提前返回）都关闭浏览器，避免Chrome进程残留
+            self.close_driver()
 
-    def extract_thumbnail_and_preview_urls(self, soup):
-        """
-        改进的缩略图和预览视频URL提取方法
-        """
-        thumbnail_url = ''
-        preview_url = ''
-        
-        # === 提取缩略图 ===
-        # 方法1：查找带有poster属性的video标签
-        video_with_poster = soup.find('video', attrs={'poster': True})
-        if video_with_poster and video_with_poster.get('poster'):
-            poster_url = video_with_poster.get('poster')
-            # 过滤掉base64占位符
-            if not poster_url.startswith('data:'):
-                thumbnail_url = poster_url
-                if DEBUG['verbose']:
-                    print(f"✓ 找到video poster缩略图: {thumbnail_url}")
-        
-        # 方法2：查找特定的缩略图img标签
-        if not thumbnail_url:
-            # 尝试不同的缩略图选择器
-            thumb_selectors = [
-                'img[data-poster]',
-                'img[data-thumb]',
-                'img[data-mediumthumb]',
-                'img.videoThumb',
-                'img[class*="thumb"]',
-                'img[src*="thumb"]'
-            ]
-            
-            for selector in thumb_selectors:
-                img_elements = soup.select(selector)
-                for img in img_elements:
-                    # 优先使用data属性
-                    url = img.get('data-poster') or img.get('data-thumb') or img.get('data-mediumthumb') or img.get('src')
-                    if url and ('thumb' in url.lower() or 'poster' in url.lower()):
-                        thumbnail_url = url
-                        if DEBUG['verbose']:
-                            print(f"✓ 找到img标签缩略图: {thumbnail_url}")
-                        break
-                if thumbnail_url:
-                    break
-        
-        # 方法3：从整个页面源码中提取缩略图URL
-        if not thumbnail_url:
-            # 直接在整个页面源码中搜索，不限于JavaScript
-            page_content = str(soup)
-            
-            # 查找常见的缩略图URL模式
-            thumb_patterns = [
-                r'"image":\s*"([^"]*\.jpg[^"]*)"',
-                r'"poster":\s*"([^"]*\.jpg[^"]*)"',
-                r'"thumbnail":\s*"([^"]*\.jpg[^"]*)"',
-                r'thumbUrl["\']:\s*["\']([^"\']*\.jpg[^"\']*)["\']',
-                r'"defaultThumb":\s*"([^"]*\.jpg[^"]*)"',
-                r'"thumb":\s*"([^"]*\.jpg[^"]*)"',
-                r'"image_url":\s*"([^"]*\.jpg[^"]*)"',
-                # 添加更多模式
-                r'data-original="([^"]*\.jpg[^"]*)"',
-                r'data-src="([^"]*\.jpg[^"]*)"',
-                r'data-mediumthumb="([^"]*\.jpg[^"]*)"',
-                r'data-thumb="([^"]*\.jpg[^"]*)"',
-                # 查找Pornhub特定的缩略图模式
-                r'https://[^"\']*phncdn\.com/[^"\']*\.jpg[^"\']*',
-                r'https://[^"\']*pornhubpremium\.com/[^"\']*\.jpg[^"\']*',
-                # 直接搜索完整的URL
-                r'https://ei\.phncdn\.com/videos/[^"\']*\.jpg[^"\']*'
-            ]
-            
-            for pattern in thumb_patterns:
-                matches = re.findall(pattern, page_content, re.IGNORECASE)
-                for match in matches:
-                    clean_url = match.replace('\\/', '/')
-                    # 更宽松的验证，不仅限于包含"thumb"的URL
-                    if (clean_url and len(clean_url) > 20 and 
-                        '.jpg' in clean_url.lower() and 
-                        ('phncdn.com' in clean_url or 'pornhub' in clean_url or 'thumb' in clean_url.lower()) and
-                        not clean_url.startswith('data:')):  # 排除base64编码的占位符
-                        thumbnail_url = clean_url
-                        if DEBUG['verbose']:
-                            print(f"✓ 从页面找到缩略图: {thumbnail_url}")
-                        break
-                if thumbnail_url:
-                    break
-        
-        # === 提取预览视频 ===
-        # 方法1：查找video标签及其source子标签
-        video_elements = soup.find_all('video')
-        for video in video_elements:
-            # 检查video标签的src属性
-            src = video.get('src', '')
-            if src and ('.webm' in src.lower() or '.mp4' in src.lower()) and 'preview' in src.lower():
-                preview_url = src
-                if DEBUG['verbose']:
-                    print(f"✓ 找到video标签预览: {preview_url}")
-                break
-            
-            # 检查source子标签
-            sources = video.find_all('source')
-            for source in sources:
-                src = source.get('src', '')
-                src_type = source.get('type', '').lower()
-                if src and ('webm' in src_type or '.webm' in src.lower() or 'preview' in src.lower()):
-                    preview_url = src
-                    if DEBUG['verbose']:
-                        print(f"✓ 找到source标签预览: {preview_url}")
-                    break
-            
-            if preview_url:
-                break
-        
-        # 方法2：从整个页面源码中提取预览视频URL
-        if not preview_url:
-            # 直接在整个页面源码中搜索，不限于JavaScript
-            page_content = str(soup)
-            
-            # 查找常见的预览视频URL模式
-            video_patterns = [
-                r'"preview":\s*"([^"]*\.webm[^"]*)"',
-                r'"videoPreview":\s*"([^"]*\.webm[^"]*)"',
-                r'"previewUrl":\s*"([^"]*\.webm[^"]*)"',
-                r'previewUrl["\']:\s*["\']([^"\']*\.webm[^"\']*)["\']',
-                r'"preview":\s*"([^"]*\.mp4[^"]*)"',
-                r'"preview_url":\s*"([^"]*\.webm[^"]*)"',
-                # 添加更多模式
-                r'data-mediabook="([^"]*\.webm[^"]*)"',
-                r'data-preview="([^"]*\.webm[^"]*)"',
-                r'data-video-preview="([^"]*\.webm[^"]*)"',
-                # 查找Pornhub特定的预览视频模式
-                r'https://[^"\']*phncdn\.com/[^"\']*\.webm[^"\']*',
-                r'https://[^"\']*pornhubpremium\.com/[^"\']*\.webm[^"\']*',
-                # 直接搜索完整的预览视频URL
-                r'https://ew\.phncdn\.com/[^"\']*\.webm[^"\']*'
-            ]
-            
-            for pattern in video_patterns:
-                matches = re.findall(pattern, page_content, re.IGNORECASE)
-                for match in matches:
-                    clean_url = match.replace('\\/', '/')
-                    # 解码HTML实体
-                    import html
-                    clean_url = html.unescape(clean_url)
-                    # 更宽松的验证
-                    if (clean_url and len(clean_url) > 20 and 
-                        ('.webm' in clean_url.lower() or '.mp4' in clean_url.lower()) and 
-                        ('phncdn.com' in clean_url or 'pornhub' in clean_url or 'preview' in clean_url.lower())):
-                        preview_url = clean_url
-                        if DEBUG['verbose']:
-                            print(f"✓ 从页面找到预览视频: {preview_url}")
-                        break
-                if preview_url:
-                    break
-        
-        return thumbnail_url, preview_url
+def parse_video_detail_html(html_content, video_url):
+    """解析视频详情页HTML，返回可直接交给process_video的视频数据字典
+    
+    只依赖参数、返回普通字典，可以在ProcessPoolExecutor的子进程中运行。
+    
+    Args:
+        html_content: 详情页HTML源码
+        video_url: 详情页URL
+    
+    Returns:
+        dict: 视频数据
+    """
+    # 按提取规范获取视频字段、缩略图和预览视频URL（lxml解析一次）
+    video_data = extract_video_detail(html_content, video_url)
+    
+    # 提取M3U8地址并选择最佳地址（优先选择1080P，然后是720P）
+    m3u8 = extract_m3u8(html_content)
+    video_data['m3u8_urls'] = m3u8['m3u8_urls']
+    video_data['best_m3u8_url'] = m3u8['best_m3u8_url']
+    
+    # 设置兼容字段
+    video_data['url'] = video_url
+    video_data['alt_text'] = ''
+    
+    return video_data
 
 def show_database_stats():
     """显示数据库统计信息"""
@@ -4437,8 +5490,7 @@ def show_database_stats():
     
     # HTML数据库统计
     try:
-        import sqlite3
-        with sqlite3.connect(db.html_db_path) as conn:
+        with db.get_connection(html=True) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT COUNT(*) FROM html_pages')
             html_count = cursor.fetchone()[0]
@@ -4446,8 +5498,14 @@ def show_database_stats():
             cursor.execute('SELECT MAX(created_at) FROM html_pages')
             latest_html = cursor.fetchone()[0]
             
+            cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM html_blobs')
+            blob_count, raw_size, stored_size = cursor.fetchone()
+            
             print(f"总HTML页面数: {html_count}")
             print(f"最新HTML采集: {latest_html or 'N/A'}")
+            if blob_count:
+                print(f"HTML压缩存储: {blob_count} 份内容, {raw_size / 1024 / 1024:.1f}MB → {stored_size / 1024 / 1024:.1f}MB"
+                      f" (压缩比 {raw_size / max(stored_size, 1):.1f}x)")
     except Exception as e:
         print(f"HTML数据库统计失败: {e}")
     
@@ -4461,13 +5519,17 @@ def show_database_stats():
         for i, category in enumerate(stats['top_categories'][:10], 1):
             print(f"  {i:2d}. {category['name']:<20} ({category['count']} 个视频)")
 
-def search_videos_cli(query, limit=20):
-    """搜索视频命令行接口"""
+def search_videos_cli(query, limit=20, after=None):
+    """搜索视频命令行接口（按相关度排序，支持--after翻页）"""
     db = DatabaseManager()
-    videos = db.search_videos(query=query, limit=limit)
+    try:
+        videos = db.search_videos(query=query, limit=limit, after=after)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
     
     print("=" * 60)
-    print(f"🔍 搜索结果: '{query}' (前{limit}条)")
+    print(f"🔍 搜索结果: '{query}' ({'下一页' if after else '前'}{limit}条)")
     print("=" * 60)
     
     if not videos:
@@ -4481,6 +5543,11 @@ def search_videos_cli(query, limit=20):
         print(f"    观看数: {video['views'] or 'N/A'}")
         print(f"    时长: {video['duration'] or 'N/A'}")
         print(f"    采集时间: {video['created_at']}")
+        if video.get('score') is not None:
+            print(f"    相关度: {-video['score']:.3f}")
+    
+    if len(videos) == limit:
+        print(f"\n➡️  下一页: python app.py --search '{query}' {limit} --after '{videos[-1]['search_cursor']}'")
 
 def list_recent_videos_cli(limit=20):
     """列出最近采集的视频"""
@@ -4507,12 +5574,23 @@ def export_database_data(output_file, limit=None):
     except Exception as e:
         print(f"❌ 导出失败: {e}")
 
+def compact_html_database_cli():
+    """压缩HTML数据库命令行接口"""
+    db = DatabaseManager()
+    print("🗜️ 压缩HTML数据库...")
+    try:
+        result = db.compact_html_database()
+        print(f"✅ 压缩完成: 迁移 {result['migrated']} 个页面, 清理 {result['removed_blobs']} 份无引用内容")
+        print(f"📦 文件大小: {result['size_before'] / 1024 / 1024:.1f}MB → {result['size_after'] / 1024 / 1024:.1f}MB")
+    except Exception as e:
+        print(f"❌ 压缩失败: {e}")
+
 def main():
     """主函数 - 支持命令行参数和数据库查询"""
     import sys
     
     # 检查是否是数据库查询命令或重新生成命令
-    if len(sys.argv) > 1 and sys.argv[1] in ['--stats', '--search', '--recent', '--export', '--regenerate']:
+    if len(sys.argv) > 1 and sys.argv[1] in ['--stats', '--search', '--recent', '--export', '--regenerate', '--compact-html']:
         command = sys.argv[1]
         
         if command == '--stats':
@@ -4523,8 +5601,12 @@ def main():
                 print("❌ 请提供搜索关键词：python app.py --search '关键词'")
                 return
             query = sys.argv[2]
-            limit = int(sys.argv[3]) if len(sys.argv) > 3 else 20
-            search_videos_cli(query, limit)
+            after = None
+            if '--after' in sys.argv:
+                after_index = sys.argv.index('--after')
+                after = sys.argv[after_index + 1] if len(sys.argv) > after_index + 1 else None
+            limit = int(sys.argv[3]) if len(sys.argv) > 3 and sys.argv[3] != '--after' else 20
+            search_videos_cli(query, limit, after)
             return
         elif command == '--recent':
             limit = int(sys.argv[2]) if len(sys.argv) > 2 else 20
@@ -4538,14 +5620,23 @@ def main():
             limit = int(sys.argv[3]) if len(sys.argv) > 3 else None
             export_database_data(output_file, limit)
             return
+        elif command == '--compact-html':
+            compact_html_database_cli()
+            return
         elif command == '--regenerate':
             print("🔄 从HTML数据库重新生成data目录...")
-            limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            limit = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else None
             update_existing = '--update' in sys.argv
+            incremental = '--incremental' in sys.argv
+            workers = None
+            if '--workers' in sys.argv:
+                workers_index = sys.argv.index('--workers')
+                workers = int(sys.argv[workers_index + 1]) if len(sys.argv) > workers_index + 1 else None
             
             scraper = PornhubScraper()
             try:
-                result = scraper.regenerate_data_from_html_db(limit=limit, update_existing=update_existing)
+                result = scraper.regenerate_data_from_html_db(limit=limit, update_existing=update_existing,
+                                                              workers=workers, incremental=incremental)
                 
                 print(f"\n✅ 重新生成完成!")
                 print(f"📊 处理统计:")
@@ -4609,6 +5700,7 @@ def main():
             print(f"📈 详细统计:")
             print(f"  - 成功率: {result.get('success_rate', 0):.1f}%")
             print(f"  - 处理数量: {result.get('success_count', 0)}/{result.get('total_count', 0)}")
+            print(f"  - 已采集跳过: {result.get('skipped_count', 0)}")
             print(f"  - 总耗时: {result.get('duration', 0):.1f} 秒")
         else:
             print("\n❌ 采集失败或被中断")
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步详情页抓取
+用asyncio + httpx同时保持大量详情页请求在途（按主机限制并发），HTML交给解析进程池，
+吞吐量只受目标站点可承受的并发限制，而不是线程数
+"""
+
+import asyncio
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+from config import PROXY_CONFIG, HEADERS, SCRAPER_CONFIG, DETAIL_PAGE_CONFIG
+from network import get_rate_limiter, get_route_selector
+
+# 可选依赖：未安装httpx时回退到线程池方式
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class AsyncDetailFetcher:
+    """异步详情页抓取器
+
+    抓取、保存HTML、解析和保存视频数据都通过回调完成，本模块不依赖app.py：
+    - parse(html, url) 在进程池中运行，必须是可pickle的模块级函数
+    - on_html(url, html) 和 on_parsed(video_data) 在线程池中运行（同步的数据库和文件操作）
+    - reverify(generation) 在页面被拦截（Cookie过期）时在线程中运行，换上新Cookie后重试该页面
+    """
+
+    def __init__(self, parse, on_html=None, on_parsed=None, headers=None, proxies=None, use_proxy=True,
+                 rate_limiter=None, concurrency=None, cookies=None, reject=None, routes=None,
+                 reverify=None, session_generation=0):
+        """初始化抓取器
+
+        Args:
+            parse: 解析函数 parse(html, url) -> dict
+            on_html: 获取到HTML后的回调（如保存到HTML数据库）
+            on_parsed: 解析完成后的回调（如process_video），返回False表示处理失败
+            headers: 请求头
+            proxies: 代理设置
+            use_proxy: 是否允许使用代理
+            rate_limiter: 限速器，为None时使用进程内共享的限速器（与requests和Selenium共用令牌桶）
+            concurrency: 自适应并发控制器（AdaptiveConcurrency），在async_per_host_limit以内动态调整每个主机的并发
+            cookies: 请求时携带的Cookie（HttpSessionManager.cookies()的格式）
+            reject: 检查HTML的函数，返回真值（如拦截页面类型）时该页面按失败处理，不保存也不解析
+            routes: 直连/代理线路选择器，为None时使用进程内共享的选择器（与requests共用熔断状态）
+            reverify: 页面被拦截时重新验证的函数 reverify(generation) -> (新版本号, Cookie列表, 请求头)，失败时返回None
+            session_generation: cookies对应的会话版本号（传给reverify，已被其他路径更新时不再重复验证）
+        """
+        self.parse = parse
+        self.on_html = on_html
+        self.on_parsed = on_parsed
+        self.headers = dict(headers if headers is not None else HEADERS)
+        self.proxy = (proxies if proxies is not None else PROXY_CONFIG).get('https') if use_proxy else None
+        self.max_in_flight = DETAIL_PAGE_CONFIG.get('async_max_in_flight', 200)
+        self.per_host_limit = DETAIL_PAGE_CONFIG.get('async_per_host_limit', 16)
+        self.parse_workers = DETAIL_PAGE_CONFIG.get('async_parse_workers', 0) or os.cpu_count() or 1
+        self.timeout = SCRAPER_CONFIG.get('timeout', 60)
+        self.max_retries = SCRAPER_CONFIG.get('max_retries', 3)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+        self.concurrency = concurrency
+        self.cookies = cookies or []
+        self.reject = reject
+        self.routes = routes if routes is not None else get_route_selector()
+        self.reverify = reverify
+        self.session_generation = session_generation
+        self.stats = {'fetched': 0, 'failed': 0, 'parsed': 0}
+
+    @staticmethod
+    def available():
+        """是否可以使用异步抓取（已安装httpx）"""
+        return httpx is not None
+
+    def run(self, video_urls):
+        """抓取并解析所有视频链接（阻塞直到完成）
+
+        Args:
+            video_urls: 详情页链接列表
+
+        Returns:
+            list: 成功解析的视频数据
+        """
+        return asyncio.run(self._run(list(video_urls)))
+
+    def _create_client(self, proxied):
+        """创建httpx异步客户端（连接池大小与在途请求上限一致）"""
+        kwargs = {
+            'headers': self.headers,
+            'timeout': self.timeout,
+            'verify': False,
+            'follow_redirects': True,
+            'limits': httpx.Limits(max_connections=self.max_in_flight,
+                                   max_keepalive_connections=self.per_host_limit),
+        }
+        if proxied:
+            kwargs['proxy'] = self.proxy
+        client = httpx.AsyncClient(**kwargs)
+        self._set_cookies(client, self.cookies)
+        return client
+
+    @staticmethod
+    def _set_cookies(client, cookies):
+        for cookie in cookies:
+            client.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+
+    async def _run(self, video_urls):
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        host_limits = {}
+        results = []
+        completed = 0
+
+        direct_client = self._create_client(proxied=False)
+        proxy_client = None
+        if self.proxy:
+            try:
+                proxy_client = self._create_client(proxied=True)
+            except Exception as e:
+                # SOCKS代理需要安装httpx[socks]
+                print(f"⚠️ 无法创建代理客户端，只使用直连: {e}")
+
+        async def request(client, route, url):
+            # 自适应并发名额不足时轮询等待（控制器由线程共享，不能直接await）
+            if self.concurrency:
+                while not self.concurrency.try_acquire(url):
+                    await asyncio.sleep(0.05)
+            try:
+                # 令牌不足时在事件循环中等待，不占用线程
+                wait = self.rate_limiter.reserve(url)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                started = loop.time()
+                try:
+                    response = await client.get(url)
+                except httpx.TimeoutException:
+                    self.routes.record(route, False)
+                    if self.concurrency:
+                        self.concurrency.record(url, timeout=True)
+                    raise
+                except httpx.TransportError:
+                    self.routes.record(route, False)
+                    if self.concurrency:
+                        self.concurrency.record(url, error=True)
+                    raise
+                except Exception:
+                    self.routes.record(route, False)
+                    raise
+                if self.routes.is_failure_status(response.status_code):
+                    self.routes.record(route, False)
+                else:
+                    self.routes.record(route, True, loop.time() - started)
+                if self.concurrency:
+                    self.concurrency.record(url, loop.time() - started, status=response.status_code)
+                return response
+            finally:
+                if self.concurrency:
+                    self.concurrency.release(url)
+
+        async def fetch(url):
+            host = urlparse(url).netloc
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+            route = None
+            for attempt in range(self.max_retries):
+                # 按线路健康状况选择直连或代理，重试时优先换一条线路
+                route = self.routes.choose(allow_proxy=proxy_client is not None, avoid=route)
+                client = proxy_client if route == 'proxy' else direct_client
+                try:
+                    async with host_limit:
+                        response = await request(client, route, url)
+                    response.raise_for_status()
+                    return response.text
+                except Exception as e:
+                    if attempt < self.max_retries - 1:
+                        await asyncio.sleep(2 ** attempt + random.random())
+                    else:
+                        print(f"获取页面失败 {url}: {e}")
+            return None
+
+        session_lock = asyncio.Lock()
+        failed_generations = set()
+
+        async def renew_session(generation, blocked):
+            """页面被拦截时重新验证浏览器会话，返回是否已换上新Cookie（同时只验证一次，同一版本失败后不再重试）"""
+            if not self.reverify:
+                return False
+            async with session_lock:
+                if self.session_generation != generation:
+                    return True
+                if generation in failed_generations:
+                    return False
+                print(f"⚠️ 页面被拦截（{blocked}），重新验证浏览器会话...")
+                renewed = await loop.run_in_executor(None, self.reverify, generation)
+                if not renewed:
+                    failed_generations.add(generation)
+                    return False
+                self.session_generation, self.cookies, headers = renewed
+                self.headers.update(headers)
+                for client in (direct_client, proxy_client):
+                    if client:
+                        client.headers.update(headers)
+                        self._set_cookies(client, self.cookies)
+                return True
+
+        async def handle(url):
+            nonlocal completed
+            # 在途上限覆盖抓取到保存的全过程，解析跟不上时自动减慢抓取，HTML不会在内存中堆积
+            async with in_flight:
+                try:
+                    generation = self.session_generation
+                    html = await fetch(url)
+                    blocked = self.reject(html) if html and self.reject else None
+                    if blocked and await renew_session(generation, blocked):
+                        # 换上新Cookie后重试一次
+                        html = await fetch(url)
+                        blocked = self.reject(html) if html and self.reject else None
+                    if not html:
+                        self.stats['failed'] += 1
+                        return
+                    self.stats['fetched'] += 1
+
+                    if blocked:
+                        self.stats['failed'] += 1
+                        print(f"页面被拦截（{blocked}），跳过: {url}")
+                        return
+
+                    if self.on_html:
+                        await loop.run_in_executor(io_pool, self.on_html, url, html)
+
+                    video_data = await loop.run_in_executor(parse_pool, self.parse, html, url)
+                    self.stats['parsed'] += 1
+
+                    if self.on_parsed and video_data.get('viewkey'):
+                        saved = await loop.run_in_executor(io_pool, self.on_parsed, video_data)
+                        if saved is False:
+                            self.stats['failed'] += 1
+                            print(f"处理视频数据失败，跳过: {url}")
+                            return
+                    results.append(video_data)
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    print(f"分析视频URL失败 {url}: {e}")
+                finally:
+                    completed += 1
+                    if completed % 10 == 0:
+                        print(f"已分析 {completed}/{len(video_urls)} 个视频URL")
+
+        io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='detail-io')
+        parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        try:
+            await asyncio.gather(*(handle(url) for url in video_urls))
+        finally:
+            await direct_client.aclose()
+            if proxy_client:
+                await proxy_client.aclose()
+            parse_pool.shutdown()
+            io_pool.shutdown()
+
+        return results
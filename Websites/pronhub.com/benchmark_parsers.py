@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解析性能基准测试
+从HTML数据库中随机抽取已采集的页面保存为样本集，离线测量列表页解析、详情页字段提取、
+m3u8地址提取和完整详情页解析的耗时（预热后多轮运行，输出分位数和每秒页面数），
+并与保存的基线比较，用于证明解析优化的效果、发现性能回退。
+
+使用方法:
+    python benchmark_parsers.py --sample 200          # 从HTML数据库抽取200个页面作为样本集
+    python benchmark_parsers.py                       # 对样本集运行基准测试（有基线时自动比较）
+    python benchmark_parsers.py --save-baseline       # 运行并把结果保存为基线
+    python benchmark_parsers.py --only m3u8 --rounds 10
+"""
+
+import gc
+import gzip
+import json
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+from listing_parser import ListingPage, _sample_page as sample_listing_page
+from detail_extractor import extract_video_detail
+from m3u8_extractor import extract_m3u8
+from app import parse_video_detail_html
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(SCRIPT_DIR, 'benchmarks', 'parser_corpus.jsonl.gz')
+DEFAULT_BASELINE = os.path.join(SCRIPT_DIR, 'benchmarks', 'parser_baseline.json')
+LISTING_BASE_URL = 'https://cn.pornhub.com/video'
+
+
+def page_kind(url):
+    """按URL区分详情页和列表页"""
+    return 'detail' if 'view_video.php' in url else 'listing'
+
+
+def parse_listing_urls(page):
+    """列表页快速解析：fast_parse_video_urls、get_total_pages和check_is_last_page"""
+    listing = ListingPage(page['html_content'])
+    return listing.video_urls(LISTING_BASE_URL), listing.total_pages(), listing.is_last_page()
+
+
+def parse_listing_items(page):
+    """parse_video_list的解析部分（建立#videoCategory的BeautifulSoup节点并取出视频条目）"""
+    video_list = ListingPage(page['html_content']).video_list_soup()
+    return video_list.find_all('li', class_='pcVideoListItem') if video_list else []
+
+
+# (名称, 页面类型, 函数)
+BENCHMARKS = [
+    ('listing_urls', 'listing', parse_listing_urls),
+    ('parse_video_list', 'listing', parse_listing_items),
+    ('detail_fields', 'detail', lambda page: extract_video_detail(page['html_content'], page['url'])),
+    ('m3u8', 'detail', lambda page: extract_m3u8(page['html_content'])),
+    ('parse_video_detail_html', 'detail', lambda page: parse_video_detail_html(page['html_content'], page['url'])),
+]
+
+
+def sample_corpus(count, corpus_path):
+    """从HTML数据库随机抽取页面保存为样本集
+
+    Args:
+        count: 抽取的页面数量
+        corpus_path: 样本集文件路径（gzip压缩的JSON Lines）
+
+    Returns:
+        int: 保存的页面数量
+    """
+    from app import DatabaseManager
+
+    db = DatabaseManager()
+    pages = db.sample_html_pages(count)
+    os.makedirs(os.path.dirname(corpus_path), exist_ok=True)
+    with gzip.open(corpus_path, 'wt', encoding='utf-8') as f:
+        for page in pages:
+            f.write(json.dumps({
+                'url': page['url'],
+                'kind': page_kind(page['url']),
+                'html_content': page['html_content'],
+            }, ensure_ascii=False) + '\n')
+    return len(pages)
+
+
+def load_corpus(corpus_path):
+    """读取样本集，按页面类型分组
+
+    样本集中没有列表页时（HTML数据库只保存详情页）使用合成的列表页。
+
+    Returns:
+        dict: {'listing': [...], 'detail': [...]}
+    """
+    corpus = {'listing': [], 'detail': []}
+    with gzip.open(corpus_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            page = json.loads(line)
+            corpus[page.get('kind') or page_kind(page['url'])].append(page)
+
+    if not corpus['listing']:
+        print("ℹ️ 样本集中没有列表页，列表页解析使用合成页面")
+        corpus['listing'] = [{'url': f'{LISTING_BASE_URL}?page={i}', 'html_content': sample_listing_page(items)}
+                             for i, items in enumerate((32, 44, 44, 20), 1)]
+    return corpus
+
+
+def percentile(sorted_values, fraction):
+    """已排序数据的分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_benchmark(func, pages, rounds, warmup):
+    """预热后对每个页面运行rounds轮并统计单页耗时
+
+    Returns:
+        dict: pages、samples、mean_ms、p50_ms、p90_ms、p99_ms、max_ms、pages_per_sec
+    """
+    for _ in range(warmup):
+        for page in pages:
+            func(page)
+
+    gc.collect()
+    timings = []
+    for _ in range(rounds):
+        for page in pages:
+            start = time.perf_counter()
+            func(page)
+            timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        'pages': len(pages),
+        'samples': len(timings),
+        'mean_ms': total / len(timings) * 1000,
+        'p50_ms': percentile(timings, 0.50) * 1000,
+        'p90_ms': percentile(timings, 0.90) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'max_ms': timings[-1] * 1000,
+        'pages_per_sec': len(timings) / total if total else 0.0,
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """与基线比较，中位数耗时比基线慢超过threshold的测试视为性能回退
+
+    Returns:
+        list: 性能回退的测试名称
+    """
+    regressions = []
+    print(f"\n📏 与基线比较 (基线时间: {baseline.get('created_at', 'N/A')}，回退阈值 {threshold:.0%})")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base.get('p50_ms'):
+            print(f"  {name:<26} 基线中没有该测试")
+            continue
+        change = result['p50_ms'] / base['p50_ms'] - 1
+        mark = '✅'
+        if change > threshold:
+            mark = '❌'
+            regressions.append(name)
+        elif change < -threshold:
+            mark = '🚀'
+        print(f"  {mark} {name:<24} p50 {base['p50_ms']:.3f} → {result['p50_ms']:.3f} ms ({change:+.1%})，"
+              f"{base['pages_per_sec']:.0f} → {result['pages_per_sec']:.0f} 页/秒")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='解析器离线性能基准测试')
+    parser.add_argument('--sample', type=int, metavar='N', help='从HTML数据库随机抽取N个页面作为样本集')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='样本集文件路径')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件路径')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--rounds', type=int, default=5, help='每个页面的测量轮数 (默认: 5)')
+    parser.add_argument('--warmup', type=int, default=1, help='预热轮数 (默认: 1)')
+    parser.add_argument('--threshold', type=float, default=0.15, help='判定性能回退的中位数变慢比例 (默认: 0.15)')
+    parser.add_argument('--only', nargs='+', choices=[name for name, _, _ in BENCHMARKS], help='只运行指定的测试')
+    args = parser.parse_args()
+
+    if args.sample:
+        saved = sample_corpus(args.sample, args.corpus)
+        print(f"✅ 已保存 {saved} 个页面到样本集: {args.corpus}")
+        if not saved:
+            return 1
+
+    if not os.path.exists(args.corpus):
+        print(f"❌ 样本集不存在: {args.corpus}")
+        print("   先运行: python benchmark_parsers.py --sample 200")
+        return 1
+
+    corpus = load_corpus(args.corpus)
+    print(f"📂 样本集: {len(corpus['detail'])} 个详情页, {len(corpus['listing'])} 个列表页 "
+          f"(预热 {args.warmup} 轮, 测量 {args.rounds} 轮)")
+    print(f"  {'测试':<26}{'页面':>6}{'平均':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'页/秒':>10}")
+
+    results = {}
+    for name, kind, func in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        if not corpus[kind]:
+            print(f"  {name:<26}没有{kind}页面，跳过")
+            continue
+        result = run_benchmark(func, corpus[kind], args.rounds, args.warmup)
+        results[name] = result
+        print(f"  {name:<26}{result['pages']:>6}{result['mean_ms']:>9.3f}ms{result['p50_ms']:>8.3f}ms"
+              f"{result['p90_ms']:>8.3f}ms{result['p99_ms']:>8.3f}ms{result['pages_per_sec']:>10.0f}")
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.threshold)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'corpus': os.path.relpath(args.corpus, SCRIPT_DIR),
+                'rounds': args.rounds,
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 基线已保存: {args.baseline}")
+
+    if regressions:
+        print(f"\n❌ 性能回退: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应并发控制
+按主机统计响应延迟、429/5xx和超时，用AIMD（加性增、乘性减）在运行时调整详情页和下载的并发数
+"""
+
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from config import CONCURRENCY_CONFIG
+
+
+class _HostState:
+    """单个主机的并发状态和当前统计窗口"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.latencies = []
+        self.throttled = 0    # 429
+        self.errors = 0       # 5xx和连接错误
+        self.timeouts = 0
+        self.samples = 0
+        self.baseline = None  # 延迟基线（下降时立即跟随，上升时按baseline_alpha缓慢跟随）
+
+
+class AdaptiveConcurrency:
+    """按主机的AIMD并发控制器
+
+    工作线程在每个请求前通过slot()占用一个并发名额，超过当前上限时等待；请求结束后用record()上报结果。
+    每积累window个样本评估一次：
+    - 出现429，或429/5xx/超时比例超过error_threshold：上限乘以decrease_factor
+    - 延迟中位数超过基线的latency_tolerance倍：上限乘以latency_decrease_factor
+      （基线随没有错误的窗口的延迟中位数缓慢上调，延迟整体变高后不会一直减少并发）
+    - 否则上限增加increase_step，直到max_limit
+    """
+
+    def __init__(self, name, initial, max_limit, min_limit=None, config=None):
+        """初始化控制器
+
+        Args:
+            name: 控制器名称（用于日志，如"详情页"、"下载"）
+            initial: 每个主机的初始并发数
+            max_limit: 并发数上限（线程池按此大小创建）
+            min_limit: 并发数下限，为None时使用配置
+            config: 控制参数，为None时使用配置文件中的CONCURRENCY_CONFIG
+        """
+        config = config if config is not None else CONCURRENCY_CONFIG
+        self.name = name
+        self.enabled = config.get('enabled', True)
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min_limit if min_limit is not None else config.get('min_limit', 1))
+        self.initial = min(max(initial, self.min_limit), self.max_limit)
+        self.window = config.get('window', 20)
+        self.error_threshold = config.get('error_threshold', 0.1)
+        self.latency_tolerance = config.get('latency_tolerance', 2.0)
+        self.decrease_factor = config.get('decrease_factor', 0.5)
+        self.latency_decrease_factor = config.get('latency_decrease_factor', 0.8)
+        self.baseline_alpha = config.get('baseline_alpha', 0.1)
+        self.increase_step = config.get('increase_step', 1)
+        self.log_decisions = config.get('log_decisions', True)
+        self._hosts = {}
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _host(url):
+        return (urlparse(url).hostname or '').lower()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState(self.initial)
+            self._hosts[host] = state
+        return state
+
+    def acquire(self, url):
+        """占用一个并发名额（超过当前上限时阻塞等待）"""
+        with self._cond:
+            state = self._state(self._host(url))
+            while state.active >= state.limit:
+                self._cond.wait()
+            state.active += 1
+
+    def try_acquire(self, url):
+        """尝试占用一个并发名额（不阻塞，供异步代码轮询）
+
+        Returns:
+            bool: 是否成功占用
+        """
+        with self._cond:
+            state = self._state(self._host(url))
+            if state.active >= state.limit:
+                return False
+            state.active += 1
+            return True
+
+    def release(self, url):
+        """释放并发名额"""
+        with self._cond:
+            state = self._state(self._host(url))
+            state.active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, url):
+        """在with块内占用一个并发名额"""
+        self.acquire(url)
+        try:
+            yield
+        finally:
+            self.release(url)
+
+    def record(self, url, latency=None, status=None, timeout=False, error=False):
+        """上报一次请求的结果
+
+        Args:
+            url: 请求地址
+            latency: 请求耗时（秒），失败时可为None
+            status: HTTP状态码
+            timeout: 是否超时
+            error: 是否发生连接错误
+        """
+        decision = None
+        with self._cond:
+            state = self._state(self._host(url))
+            state.samples += 1
+            if latency is not None:
+                state.latencies.append(latency)
+            if status == 429:
+                state.throttled += 1
+            elif (status and status >= 500) or error:
+                state.errors += 1
+            if timeout:
+                state.timeouts += 1
+
+            if state.samples >= self.window:
+                decision = self._evaluate(state)
+                if decision:
+                    self._cond.notify_all()
+
+        if decision and self.log_decisions:
+            old, new, reason = decision
+            print(f"⚙️ {self.name}并发 {self._host(url)}: {old} → {new} ({reason})")
+
+    def _evaluate(self, state):
+        """评估一个统计窗口并调整上限（调用方持有锁）
+
+        Returns:
+            tuple: (原上限, 新上限, 原因)，上限未变化时返回None
+        """
+        samples, throttled, errors, timeouts = state.samples, state.throttled, state.errors, state.timeouts
+        bad = throttled + errors + timeouts
+        latencies = sorted(state.latencies)
+        median = latencies[len(latencies) // 2] if latencies else None
+
+        state.latencies = []
+        state.samples = state.throttled = state.errors = state.timeouts = 0
+
+        old = state.limit
+        if not self.enabled:
+            return None
+
+        if throttled or bad / samples > self.error_threshold:
+            new = int(old * self.decrease_factor)
+            reason = f"429: {throttled}，5xx/连接错误: {errors}，超时: {timeouts}，共{samples}次请求"
+        elif median is not None and state.baseline and median > state.baseline * self.latency_tolerance:
+            new = int(old * self.latency_decrease_factor)
+            reason = f"延迟中位数 {median:.2f}s 超过基线 {state.baseline:.2f}s 的{self.latency_tolerance}倍"
+        else:
+            new = old + self.increase_step
+            reason = f"{samples}次请求无异常" + (f"，延迟中位数 {median:.2f}s" if median is not None else '')
+
+        # 只用没有错误的窗口更新延迟基线：更快时立即采用，更慢时按指数移动平均上调
+        if median is not None and not bad:
+            if state.baseline is None or median < state.baseline:
+                state.baseline = median
+            else:
+                state.baseline += self.baseline_alpha * (median - state.baseline)
+
+        new = min(max(new, self.min_limit), self.max_limit)
+        if new == old:
+            return None
+        state.limit = new
+        return old, new, reason
+
+    def limits(self):
+        """当前各主机的并发上限
+
+        Returns:
+            dict: {主机: 并发上限}
+        """
+        with self._cond:
+            return {host: state.limit for host, state in self._hosts.items()}
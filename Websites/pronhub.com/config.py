@@ -34,15 +34,20 @@ BASE_URL = "https://cn.pornhub.com/language/chinese"
 SCRAPER_CONFIG = {
     'start_page': 1,      # 开始页数
     'end_page': 5,        # 结束页数（当auto_detect_last=True时会被忽略）
-    'delay_min': 2,       # 最小延迟秒数（增加以减少请求频率）
-    'delay_max': 5,       # 最大延迟秒数（增加以减少请求频率）
     'timeout': 60,        # 请求超时时间（增加到60秒）
     'max_retries': 3,     # 最大重试次数（减少到3次）
     'verify_ssl': False,  # 是否验证SSL证书
     'download_threads': 10,  # 下载线程数（减少到10个以减少并发）
+    'download_chunk_size': 65536,  # 流式下载每次写入的块大小（字节）
+    'download_revalidate': False,  # 已下载的文件是否用条件请求（ETag/Last-Modified）确认是否有更新，False时直接跳过
+    'download_hardlink': True,  # 内容相同的文件（按SHA-256）在不同视频之间使用硬链接
     'auto_detect_last': True,  # 是否自动检测最后一页
+    'listing_workers': 8,  # 并发获取列表页的线程数（第1页确定总页数后并发获取其余页面）
+    'max_listing_pages': 100,  # 未指定结束页时最多获取的列表页数（检测到的总页数更大时也只获取这么多页）
     'skip_existing': True,  # 是否跳过已存在的ID
     'show_worker_info': False,  # 是否显示工作线程信息
+    'regenerate_workers': 1,  # 从HTML数据库重新生成时的解析进程数（0表示CPU核数）
+    'regenerate_max_attempts': 3,  # 增量重新生成时同一页面连续失败多少次后水位不再等待它
 }
 
 # 输出设置
@@ -51,6 +56,7 @@ OUTPUT_CONFIG = {
     'html_filename': 'index.html',   # HTML文件名
     'thumbnail_filename': 'thumbnail.jpg',  # 缩略图文件名
     'preview_filename': 'preview.webm',     # 预览视频文件名
+    'write_collection_log': True,   # 是否同时导出collection_log.txt（完成状态以数据库collection_state表为准）
 }
 
 # 文件类型映射
@@ -83,6 +89,110 @@ DETAIL_PAGE_CONFIG = {
     'use_requests': True,  # True: 使用requests方式（更稳定）, False: 使用Selenium多标签页方式（更快但不稳定）
     'max_workers_requests': 5,  # requests方式的最大线程数（减少以减少并发）
     'max_workers_selenium': 2,   # selenium方式的最大线程数（进一步减少以提高稳定性）
+    'use_async': True,           # requests方式下优先使用asyncio异步抓取（需要安装httpx，未安装时使用线程池）
+    'async_max_in_flight': 200,  # 异步抓取同时在途的最大请求数
+    'async_per_host_limit': 16,  # 异步抓取对同一主机的最大并发连接数
+    'async_parse_workers': 0,    # 异步抓取的HTML解析进程数（0: CPU核数）
+}
+
+# 网络连接设置（共享Session连接池）
+NETWORK_CONFIG = {
+    'pool_connections': 10,   # 缓存连接池的主机数量
+    'pool_maxsize': None,     # 每个主机的最大连接数（None: 按下载线程数和详情页线程数自动计算）
+    'pool_headroom': 4,       # 自动计算连接池大小时额外预留的连接数
+    'retry_total': 2,         # 底层重试的总次数（429/5xx状态码不在底层重试，由外层重试和自适应并发处理）
+    'retry_connect': 0,       # 连接错误的底层重试次数（0: 由外层重试换线路，熔断器立即记录失败）
+    'retry_read': 1,          # 读取超时的底层重试次数
+    'retry_backoff': 0.5,     # 重试退避系数（秒）
+}
+
+# 直连/代理线路选择（熔断器）
+ROUTE_CONFIG = {
+    'prefer': 'direct',        # 两条线路都正常且延迟未知时优先使用的线路
+    'failure_threshold': 3,    # 连续失败多少次后熔断该线路
+    'cooldown': 30,            # 熔断后多少秒发送一次探测请求（探测失败时加倍）
+    'max_cooldown': 600,       # 最长熔断时间（秒）
+    'probe_timeout': 150,      # 探测请求超过该时间（秒）没有上报结果时重新探测
+    'latency_alpha': 0.2,      # 线路延迟指数移动平均的权重
+}
+
+# 请求限速设置（按主机的令牌桶，所有抓取路径共享）
+RATE_LIMIT_CONFIG = {
+    'enabled': True,
+    # 按域名后缀匹配：rate为每秒请求数，burst为允许连续发出的请求数
+    'hosts': {
+        'pornhub.com': {'rate': 1.0, 'burst': 3},
+    },
+    'default': None,  # 未配置主机（如图片和视频CDN）的限速，None表示不限速
+}
+
+# 自适应并发设置（按主机根据429/5xx、超时和延迟自动调整详情页和下载的并发数）
+CONCURRENCY_CONFIG = {
+    'enabled': True,                  # False: 并发数固定为初始值
+    'analysis_max_workers': 20,       # 详情页并发上限（初始值为DETAIL_PAGE_CONFIG['max_workers_requests']）
+    'download_max_workers': 30,       # 下载并发上限（初始值为SCRAPER_CONFIG['download_threads']）
+    'min_limit': 1,                   # 并发数下限
+    'window': 20,                     # 每多少次请求评估一次
+    'error_threshold': 0.1,           # 429/5xx/超时比例超过该值时减半并发（出现429时总是减少）
+    'latency_tolerance': 2.0,         # 延迟中位数超过基线的倍数时减少并发
+    'decrease_factor': 0.5,           # 出错时的并发乘数
+    'latency_decrease_factor': 0.8,   # 延迟升高时的并发乘数
+    'baseline_alpha': 0.1,            # 延迟基线上调的速度（每个窗口向延迟中位数移动的比例）
+    'increase_step': 1,               # 正常时每个窗口增加的并发数
+    'log_decisions': True,            # 是否输出并发调整日志
+}
+
+# 下载调度设置（缩略图优先，同一类别内在各视频之间轮流下载）
+DOWNLOAD_SCHEDULER_CONFIG = {
+    # priority越小越先下载，相同时size_estimate（字节）小的先下载；max_workers为该类别同时下载的线程上限（None不限制）
+    'classes': {
+        'thumbnail': {'priority': 0, 'size_estimate': 50 * 1024, 'max_workers': None},
+        'preview': {'priority': 1, 'size_estimate': 2 * 1024 * 1024, 'max_workers': 20},
+    },
+    'report_interval': 30,  # 输出队列深度和等待时间的间隔（秒），0表示不输出
+}
+
+# 下载带宽设置（所有下载线程共享，避免下载占满代理链路影响详情页请求）
+BANDWIDTH_CONFIG = {
+    'max_bytes_per_sec': 4 * 1024 * 1024,  # 全局下载速率上限（字节/秒），None表示不限制
+    'class_bytes_per_sec': {               # 按类别的速率上限（类别见DOWNLOAD_SCHEDULER_CONFIG）
+        'preview': 3 * 1024 * 1024,
+    },
+    'burst_seconds': 1.0,                  # 允许突发的时长（秒）
+    'max_connections_per_host': 8,         # 每个主机的最大同时下载连接数，None表示不限制
+}
+
+# 数据库设置
+DATABASE_CONFIG = {
+    'journal_mode': 'WAL',      # 日志模式（WAL允许读写并发，减少fsync次数）
+    'synchronous': 'NORMAL',    # 同步级别（WAL模式下NORMAL即可保证一致性）
+    'cache_size_kb': 65536,     # 每个连接的页缓存大小（KB）
+    'mmap_size': 268435456,     # 内存映射大小（字节，256MB）
+    'busy_timeout': 30000,      # 等待数据库锁的超时时间（毫秒）
+    'write_batch_size': 50,     # 后台写入线程每批提交的视频数
+    'write_flush_interval_ms': 500,  # 未满一批时的最长等待时间（毫秒）
+    'html_codec': 'auto',       # HTML压缩方式（auto: 已安装zstandard时用zstd，否则zlib）
+    'html_compress_level': None,  # 压缩级别（None使用默认值：zstd为10，zlib为6）
+}
+
+# 本地模拟服务器设置（fixture_server.py和load_test.py使用，离线进行端到端负载测试）
+FIXTURE_SERVER_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8765,                 # 0表示随机选择空闲端口
+    'cdn_host': 'localhost',      # 改写后的CDN地址使用的主机名（与站点主机不同，限速和连接数限制与真实站点一致）
+    'listing_path': '/video',     # 列表页路径（BASE_URL指向 http://host:port/video）
+    'pages': 5,                   # 列表页数量
+    'items_per_page': 32,         # 每个列表页的视频数
+    'source_pages': 200,          # 从HTML数据库读取的详情页数量上限（不足时循环使用）
+    'latency': 0.05,              # 每个请求的基础延迟（秒）
+    'jitter': 0.05,               # 额外随机延迟的上限（秒）
+    'error_rate': 0.0,            # 随机返回503的比例
+    'burst_every': 0,             # 每隔多少秒出现一次429突发，0表示不出现
+    'burst_duration': 2.0,        # 每次429突发持续的秒数
+    'retry_after': 1,             # 429响应的Retry-After（秒）
+    'thumbnail_size': 40 * 1024,  # 模拟缩略图大小（字节）
+    'preview_size': 800 * 1024,   # 模拟预览视频大小（字节）
+    'seed': 1,                    # 随机数种子（延迟和错误注入可重复）
 }
 
 # 调试设置
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+详情页字段提取
+每个字段由一组按优先级排列的规则描述（XPath选择器在前，页面源码正则在后），规则在模块加载时编译一次，
+对每个页面只用lxml解析一次，按顺序取第一条得到非空值的规则。每条规则的命中次数都会统计，
+从未命中的后备规则可以据此删除。
+
+结果与原来基于BeautifulSoup（html.parser）的提取基本一致，但不保证完全相同：lxml对不规范HTML的
+容错方式与html.parser不同，极少数页面的节点结构（以及随之命中的规则）可能有差别。
+
+直接运行本文件可以测量单页提取耗时，或统计HTML数据库中各规则的命中情况：
+    python detail_extractor.py [详情页HTML文件 ...]
+    python detail_extractor.py --db [页面数]
+"""
+
+import html
+import re
+import threading
+from collections import namedtuple, Counter
+import lxml.html
+from lxml import etree
+
+# 一条提取规则：name用于命中统计和日志，evaluate(tree, html_content)按优先级依次产生候选值
+Rule = namedtuple('Rule', ['name', 'evaluate'])
+# 一个字段：many为True时规则产生的是列表（如分类），取第一个非空列表
+FieldSpec = namedtuple('FieldSpec', ['name', 'rules', 'many'])
+
+
+def _has_class(name):
+    """与BeautifulSoup的class_=name相同：class按空白分隔的任意一个值等于name"""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+# BeautifulSoup的get_text()不包含这些元素内的文本（以及注释）
+_NON_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+
+def text_content(element):
+    """与BeautifulSoup的get_text(strip=True)相同：每段文本去掉首尾空白后拼接
+
+    lxml的itertext()会包含<script>、<style>等元素的文本和注释，这里与BeautifulSoup一样跳过它们。
+    """
+    parts = []
+
+    def walk(node):
+        if node.text and isinstance(node.tag, str) and (node is element or node.tag not in _NON_TEXT_TAGS):
+            parts.append(node.text.strip())
+        for child in node:
+            if isinstance(child.tag, str) and child.tag not in _NON_TEXT_TAGS:
+                walk(child)
+            if child.tail:
+                parts.append(child.tail.strip())
+    walk(element)
+    return ''.join(parts)
+
+
+def xpath_rule(name, expression, value=text_content):
+    """XPath规则：按文档顺序对每个匹配的节点计算value"""
+    compiled = etree.XPath(expression)
+
+    def evaluate(tree, html_content):
+        if tree is None:
+            return
+        for node in compiled(tree):
+            yield value(node)
+    return Rule(name, evaluate)
+
+
+def regex_rule(name, pattern, value=None, flags=0):
+    """页面源码正则规则：按出现顺序对每个匹配计算value（默认取第一个分组）"""
+    compiled = re.compile(pattern, flags)
+    value = value or (lambda match: match.group(1))
+
+    def evaluate(tree, html_content):
+        for match in compiled.finditer(html_content):
+            yield value(match)
+    return Rule(name, evaluate)
+
+
+# === 各字段的值处理 ===
+
+TITLE_SUFFIXES = [' - Pornhub.com', ' - PornHub', ' | Pornhub']
+
+# 分类链接中需要过滤掉的文本（导航、页脚等）
+CATEGORY_SKIP_WORDS = ['pornhub', 'premium', 'upload', 'login', 'register', 'contact', 'view', 'watch', 'home',
+                       'browse', 'faq', '常见问题', '信任', '安全', 'help', 'support', '视频']
+
+
+def _title(element):
+    title = text_content(element)
+    for suffix in TITLE_SUFFIXES:
+        title = title.replace(suffix, '')
+    return title
+
+
+def _category_link(element):
+    """分类链接转换为{'name', 'url'}，不是分类链接时返回None"""
+    name = text_content(element)
+    href = element.get('href', '')
+    if (name and len(name) < 50 and '/categories/' in href
+            and not any(skip in name.lower() for skip in CATEGORY_SKIP_WORDS)):
+        return {'name': name, 'url': href}
+    return None
+
+
+def category_regex_rules(patterns):
+    """脚本中的分类规则：只取第一个匹配，其中引号内的每个名称作为一个分类（没有链接）
+
+    与原来的逻辑相同，只使用第一个能匹配的模式：即使其中没有引号内的名称（如"category":"Amateur"），
+    后面的模式也不再尝试，所以每条规则在前面的模式能匹配时不产生值。
+
+    Args:
+        patterns: [(规则名称, 正则)]，按优先级排列
+    """
+    rules = []
+    earlier = []
+    for name, pattern in patterns:
+        compiled = re.compile(pattern)
+
+        def evaluate(tree, html_content, compiled=compiled, preceding=tuple(earlier)):
+            if any(previous.search(html_content) for previous in preceding):
+                return
+            match = compiled.search(html_content)
+            if match:
+                for category_name in re.findall(r'"([^"]+)"', match.group(1)):
+                    if len(category_name) < 50:
+                        yield {'name': category_name, 'url': ''}
+        rules.append(Rule(name, evaluate))
+        earlier.append(compiled)
+    return rules
+
+
+def _poster(element):
+    poster = element.get('poster') or ''
+    return '' if poster.startswith('data:') else poster
+
+
+def _img_thumbnail(element):
+    url = element.get('data-poster') or element.get('data-thumb') or element.get('data-mediumthumb') or element.get('src')
+    if url and ('thumb' in url.lower() or 'poster' in url.lower()):
+        return url
+    return ''
+
+
+def _thumbnail_from_source(match):
+    url = match.group(match.lastindex or 0).replace('\\/', '/')
+    if (len(url) > 20 and '.jpg' in url.lower() and not url.startswith('data:')
+            and ('phncdn.com' in url or 'pornhub' in url or 'thumb' in url.lower())):
+        return url
+    return ''
+
+
+def _video_preview(element):
+    """<video>的src或其<source>子元素（文档顺序与逐个video检查src再检查source相同）"""
+    src = element.get('src', '')
+    if element.tag == 'video':
+        return src if src and ('.webm' in src.lower() or '.mp4' in src.lower()) and 'preview' in src.lower() else ''
+    src_type = element.get('type', '').lower()
+    return src if src and ('webm' in src_type or '.webm' in src.lower() or 'preview' in src.lower()) else ''
+
+
+def _preview_from_source(match):
+    url = html.unescape(match.group(match.lastindex or 0).replace('\\/', '/'))
+    if (len(url) > 20 and ('.webm' in url.lower() or '.mp4' in url.lower())
+            and ('phncdn.com' in url or 'pornhub' in url or 'preview' in url.lower())):
+        return url
+    return ''
+
+
+def _thumbnail_regex(name, pattern):
+    return regex_rule(name, pattern, _thumbnail_from_source, re.IGNORECASE)
+
+
+def _preview_regex(name, pattern):
+    return regex_rule(name, pattern, _preview_from_source, re.IGNORECASE)
+
+
+def _category_xpath(name, expression):
+    return xpath_rule(name, expression, _category_link)
+
+
+# === 提取规范 ===
+
+DETAIL_SPEC = [
+    FieldSpec('title', [
+        xpath_rule('title', '(//title)[1]', _title),
+    ], False),
+    FieldSpec('duration', [
+        xpath_rule('span.duration', f'//span[{_has_class("duration")}]'),
+        xpath_rule('span.runtime', f'//span[{_has_class("runtime")}]'),
+        xpath_rule('span[data-role=duration]', '//span[@data-role="duration"]'),
+        xpath_rule('div.duration', f'//div[{_has_class("duration")}]'),
+        regex_rule('"duration"', r'"duration"[:\s]*"([^"]+)"'),
+        regex_rule('"runtime"', r'"runtime"[:\s]*"([^"]+)"'),
+    ], False),
+    FieldSpec('uploader', [
+        xpath_rule('a.username', f'//a[{_has_class("username")}]'),
+        xpath_rule('a.usernameLink', f'//a[{_has_class("usernameLink")}]'),
+        xpath_rule('span.username', f'//span[{_has_class("username")}]'),
+        xpath_rule('div.usernameBadgesWrapper', f'//div[{_has_class("usernameBadgesWrapper")}]'),
+        xpath_rule('a[data-qa=user-name]', '//a[@data-qa="user-name"]'),
+        regex_rule('"uploader"', r'"uploader"[:\s]*"([^"]+)"'),
+        regex_rule('"author"', r'"author"[:\s]*"([^"]+)"'),
+    ], False),
+    FieldSpec('views', [
+        xpath_rule('span.views', f'//span[{_has_class("views")}]'),
+        xpath_rule('span.count', f'//span[{_has_class("count")}]'),
+        xpath_rule('div.views', f'//div[{_has_class("views")}]'),
+        xpath_rule('span[data-qa=view-count]', '//span[@data-qa="view-count"]'),
+        regex_rule('"views"', r'"views"[:\s]*"([^"]+)"'),
+        regex_rule('"viewCount"', r'"viewCount"[:\s]*(\d+)'),
+    ], False),
+    FieldSpec('publish_time', [
+        xpath_rule('span.publishDate', f'//span[{_has_class("publishDate")}]'),
+        xpath_rule('time', '//time'),
+        xpath_rule('span.added', f'//span[{_has_class("added")}]'),
+        xpath_rule('div.date', f'//div[{_has_class("date")}]'),
+        regex_rule('"publishDate"', r'"publishDate"[:\s]*"([^"]+)"'),
+        regex_rule('"datePublished"', r'"datePublished"[:\s]*"([^"]+)"'),
+    ], False),
+    FieldSpec('categories', [
+        _category_xpath('a.category', f'//a[{_has_class("category")}]'),
+        _category_xpath('a[href*=/categories/]', '//a[contains(@href, "/categories/")]'),
+        _category_xpath('.category-link', f'//*[{_has_class("category-link")}]'),
+        _category_xpath('.categoriesWrapper a', f'//*[{_has_class("categoriesWrapper")}]//a'),
+        _category_xpath('.video-categories a', f'//*[{_has_class("video-categories")}]//a'),
+        _category_xpath('.tags a', f'//*[{_has_class("tags")}]//a'),
+        _category_xpath('a[data-type=category]', '//a[@data-type="category"]'),
+        _category_xpath('.tagsContainer a', f'//*[{_has_class("tagsContainer")}]//a'),
+        _category_xpath('.video-tags a', f'//*[{_has_class("video-tags")}]//a'),
+        _category_xpath('a.tag', f'//a[{_has_class("tag")}]'),
+        *category_regex_rules([
+            ('"categories"', r'"categories":\s*\[([^\]]+)\]'),
+            ('"category"', r'"category":\s*"([^"]+)"'),
+            ('"tags"', r'"tags":\s*\[([^\]]+)\]'),
+        ]),
+    ], True),
+    FieldSpec('thumbnail_url', [
+        xpath_rule('video[poster]', '(//video[@poster])[1]', _poster),
+        xpath_rule('img[data-poster]', '//img[@data-poster]', _img_thumbnail),
+        xpath_rule('img[data-thumb]', '//img[@data-thumb]', _img_thumbnail),
+        xpath_rule('img[data-mediumthumb]', '//img[@data-mediumthumb]', _img_thumbnail),
+        xpath_rule('img.videoThumb', f'//img[{_has_class("videoThumb")}]', _img_thumbnail),
+        xpath_rule('img[class*=thumb]', '//img[contains(@class, "thumb")]', _img_thumbnail),
+        xpath_rule('img[src*=thumb]', '//img[contains(@src, "thumb")]', _img_thumbnail),
+        _thumbnail_regex('"image"', r'"image":\s*"([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('"poster"', r'"poster":\s*"([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('"thumbnail"', r'"thumbnail":\s*"([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('thumbUrl', r'thumbUrl["\']:\s*["\']([^"\']*\.jpg[^"\']*)["\']'),
+        _thumbnail_regex('"defaultThumb"', r'"defaultThumb":\s*"([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('"thumb"', r'"thumb":\s*"([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('"image_url"', r'"image_url":\s*"([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('data-original', r'data-original="([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('data-src', r'data-src="([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('data-mediumthumb', r'data-mediumthumb="([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('data-thumb', r'data-thumb="([^"]*\.jpg[^"]*)"'),
+        _thumbnail_regex('phncdn.com/*.jpg', r'https://[^"\']*phncdn\.com/[^"\']*\.jpg[^"\']*'),
+        _thumbnail_regex('pornhubpremium.com/*.jpg', r'https://[^"\']*pornhubpremium\.com/[^"\']*\.jpg[^"\']*'),
+        _thumbnail_regex('ei.phncdn.com/videos/*.jpg', r'https://ei\.phncdn\.com/videos/[^"\']*\.jpg[^"\']*'),
+    ], False),
+    FieldSpec('preview_url', [
+        xpath_rule('video[src]/source', '//video | //video//source', _video_preview),
+        _preview_regex('"preview" webm', r'"preview":\s*"([^"]*\.webm[^"]*)"'),
+        _preview_regex('"videoPreview"', r'"videoPreview":\s*"([^"]*\.webm[^"]*)"'),
+        _preview_regex('"previewUrl"', r'"previewUrl":\s*"([^"]*\.webm[^"]*)"'),
+        _preview_regex('previewUrl', r'previewUrl["\']:\s*["\']([^"\']*\.webm[^"\']*)["\']'),
+        _preview_regex('"preview" mp4', r'"preview":\s*"([^"]*\.mp4[^"]*)"'),
+        _preview_regex('"preview_url"', r'"preview_url":\s*"([^"]*\.webm[^"]*)"'),
+        _preview_regex('data-mediabook', r'data-mediabook="([^"]*\.webm[^"]*)"'),
+        _preview_regex('data-preview', r'data-preview="([^"]*\.webm[^"]*)"'),
+        _preview_regex('data-video-preview', r'data-video-preview="([^"]*\.webm[^"]*)"'),
+        _preview_regex('phncdn.com/*.webm', r'https://[^"\']*phncdn\.com/[^"\']*\.webm[^"\']*'),
+        _preview_regex('pornhubpremium.com/*.webm', r'https://[^"\']*pornhubpremium\.com/[^"\']*\.webm[^"\']*'),
+        _preview_regex('ew.phncdn.com/*.webm', r'https://ew\.phncdn\.com/[^"\']*\.webm[^"\']*'),
+    ], False),
+]
+
+VIEWKEY_PATTERN = re.compile(r'viewkey=([^&]+)')
+
+# 各规则的命中次数（当前进程）
+_rule_hits = Counter()
+_pages_extracted = 0
+_stats_lock = threading.Lock()
+
+
+def parse_html(html_content):
+    """用lxml解析详情页，空页面返回None"""
+    if not html_content or not html_content.strip():
+        return None
+    try:
+        return lxml.html.fromstring(html_content)
+    except ValueError:
+        # 带编码声明的XML头不能以str解析，改用字节
+        return lxml.html.fromstring(html_content.encode('utf-8'))
+    except etree.ParserError:
+        return None
+
+
+def extract_fields(tree, html_content, spec=None):
+    """按提取规范计算各字段
+
+    Args:
+        tree: lxml解析树（None时只使用正则规则）
+        html_content: 页面源码
+        spec: 提取规范，为None时使用DETAIL_SPEC
+
+    Returns:
+        tuple: (字段值字典, {字段: 命中的规则名})，没有规则命中的字段为空字符串或空列表
+    """
+    values = {}
+    matched = {}
+    for field in spec or DETAIL_SPEC:
+        values[field.name] = [] if field.many else ''
+        for rule in field.rules:
+            if field.many:
+                value = [item for item in rule.evaluate(tree, html_content) if item]
+            else:
+                value = next((item for item in rule.evaluate(tree, html_content) if item), '')
+            if value:
+                values[field.name] = value
+                matched[field.name] = rule.name
+                break
+    return values, matched
+
+
+def extract_video_detail(html_content, video_url):
+    """提取详情页的视频字段（标题、时长、上传者、观看次数、发布时间、分类、缩略图、预览视频）
+
+    Args:
+        html_content: 详情页HTML源码
+        video_url: 详情页URL
+
+    Returns:
+        dict: 视频数据（m3u8字段为空，由m3u8_extractor填充）
+    """
+    global _pages_extracted
+
+    video_data = {
+        'video_id': '',
+        'viewkey': '',
+        'title': '',
+        'video_url': video_url,
+        'duration': '',
+        'uploader': '',
+        'views': '',
+        'publish_time': '',
+        'categories': [],
+        'thumbnail_url': '',
+        'preview_url': '',
+        'best_m3u8_url': '',
+        'm3u8_urls': []
+    }
+
+    # 从URL提取viewkey
+    viewkey_match = VIEWKEY_PATTERN.search(video_url)
+    if viewkey_match:
+        video_data['viewkey'] = viewkey_match.group(1)
+        video_data['video_id'] = viewkey_match.group(1)
+
+    values, matched = extract_fields(parse_html(html_content), html_content or '')
+    video_data.update(values)
+
+    with _stats_lock:
+        _pages_extracted += 1
+        _rule_hits.update(matched.items())
+    return video_data
+
+
+def rule_stats():
+    """各规则的命中次数
+
+    Returns:
+        tuple: (已提取的页面数, {字段: [(规则名, 命中次数), ...]})，包括从未命中的规则
+    """
+    with _stats_lock:
+        return _pages_extracted, {
+            field.name: [(rule.name, _rule_hits[(field.name, rule.name)]) for rule in field.rules]
+            for field in DETAIL_SPEC
+        }
+
+
+def format_rule_stats():
+    """规则命中情况的多行文本（未命中的规则标记为可删除的候选）"""
+    pages, stats = rule_stats()
+    lines = [f"已提取 {pages} 个页面"]
+    for field_name, rules in stats.items():
+        hits = sum(count for _, count in rules)
+        lines.append(f"{field_name}: 命中 {hits}/{pages}")
+        for rule_name, count in rules:
+            lines.append(f"    {'✓' if count else '·'} {rule_name:<32} {count}")
+    return '\n'.join(lines)
+
+
+def _sample_page(video_id=123456):
+    """生成一个结构与详情页相近的测试页面（没有提供HTML文件时使用）"""
+    menu = ''.join(f'<li class="menu-item"><a href="/categories/{j}" class="js-menu">Category {j}</a></li>\n' for j in range(80))
+    related = ''.join(
+        f'<li class="pcVideoListItem"><a href="/view_video.php?viewkey=ph{j}" class="linkVideoThumb">'
+        f'<img data-mediumthumb="https://ei.phncdn.com/videos/{j}/thumb.jpg" class="js-videoThumb thumb" alt="related {j}"/></a>'
+        f'<var class="duration">9:{j % 60:02d}</var><span class="views"><var>{j}K</var> 次观看</span></li>\n' for j in range(40))
+    scripts = ''.join(f'<script type="text/javascript">var conf{j} = {{"a": "{"z" * 300}"}};</script>\n' for j in range(30))
+    categories = ''.join(f'<a href="/categories/cat{j}" class="gtm-event-link">分类{j}</a>' for j in range(6))
+    return (f'<!DOCTYPE html><html><head><title>Sample video {video_id} - Pornhub.com</title>{scripts}</head><body>'
+            f'<ul class="menu">{menu}</ul>'
+            f'<div class="video-wrapper"><video poster="https://ei.phncdn.com/videos/{video_id}/poster.jpg" '
+            f'src="https://ew.phncdn.com/videos/{video_id}/preview.webm"></video>'
+            f'<div class="userInfo"><div class="usernameWrap"><a class="username" href="/model/u{video_id}">Uploader {video_id}</a></div>'
+            f'<span class="count">{video_id % 1000},123</span><div class="videoInfo">1 年前</div></div>'
+            f'<div class="categoriesWrapper">建议:{categories}</div></div>'
+            f'<ul id="relatedVideosCenter">{related}</ul>'
+            f'<script>var flashvars_{video_id} = {{"video_duration": "612", "image_url": "https:\\/\\/ei.phncdn.com\\/videos\\/{video_id}\\/thumb.jpg"}};</script>'
+            f'</body></html>')
+
+
+def _benchmark(pages, rounds=20):
+    """extract_video_detail的平均单页耗时"""
+    import time
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html_content in pages:
+            extract_video_detail(html_content, 'https://cn.pornhub.com/view_video.php?viewkey=ph0')
+    elapsed = (time.perf_counter() - start) / (rounds * len(pages))
+    print(f"页面数: {len(pages)}，运行 {rounds} 轮")
+    print(f"extract_video_detail: {elapsed * 1000:.3f} ms/页")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--db':
+        # 统计HTML数据库中的详情页各规则的命中情况
+        from app import DatabaseManager
+        limit = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+        for page in DatabaseManager().iter_html_pages(limit=limit):
+            if 'view_video.php' in page['url']:
+                extract_video_detail(page['html_content'], page['url'])
+    else:
+        if len(sys.argv) > 1:
+            sample_pages = []
+            for path in sys.argv[1:]:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    sample_pages.append(f.read())
+        else:
+            sample_pages = [_sample_page(video_id) for video_id in range(100000, 100010)]
+        _benchmark(sample_pages)
+    print(format_rule_stats())
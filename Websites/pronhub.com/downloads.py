@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载任务调度和带宽控制
+按任务类别的优先级和大小估计排序（缩略图先于预览视频），同一类别内在各视频之间轮流分配，
+每个类别可以限制同时下载的线程数，并统计队列深度和等待时间；
+下载带宽按全局和类别限速，并限制每个主机的同时连接数，避免下载占满代理链路拖慢详情页请求
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from queue import Empty
+from urllib.parse import urlparse
+from config import DOWNLOAD_SCHEDULER_CONFIG, BANDWIDTH_CONFIG
+from network import TokenBucket
+
+# 不同调用方使用的任务类型名称
+TASK_TYPE_CLASSES = {
+    '缩略图': 'thumbnail',
+    'thumbnail': 'thumbnail',
+    '预览视频': 'preview',
+    'preview': 'preview',
+}
+
+
+class _TaskClass:
+    """一个任务类别的队列和统计"""
+
+    def __init__(self, name, priority, size_estimate, max_workers):
+        self.name = name
+        self.priority = priority
+        self.size_estimate = size_estimate
+        self.max_workers = max_workers
+        self.videos = OrderedDict()  # 视频目录 -> deque[(入队时间, 大小估计, 任务)]
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.total_wait = 0.0
+
+
+class DownloadScheduler:
+    """下载任务调度器
+
+    接口与queue.Queue兼容（put/get/task_done/join/qsize），可以直接替换原来的download_queue：
+    - put(None)是工作线程的结束信号，只在没有待下载任务时才会被取出
+    - get()按 优先级 → 大小估计 的顺序选择类别，类别内按视频目录轮流取任务，达到类别线程上限时跳过该类别
+    - task_done()由取出任务的同一个线程调用
+    - 同一(url, 保存路径)的任务在排队或下载期间重复添加时忽略
+    """
+
+    def __init__(self, config=None):
+        """初始化调度器
+
+        Args:
+            config: 调度配置，为None时使用配置文件中的DOWNLOAD_SCHEDULER_CONFIG
+        """
+        config = config if config is not None else DOWNLOAD_SCHEDULER_CONFIG
+        self.report_interval = config.get('report_interval', 30)
+        self._classes = {
+            name: _TaskClass(name, options.get('priority', 0), options.get('size_estimate', 0), options.get('max_workers'))
+            for name, options in config.get('classes', {}).items()
+        }
+        self._classes.setdefault('other', _TaskClass('other', 99, 0, None))
+        self._order = sorted(self._classes.values(), key=lambda c: (c.priority, c.size_estimate))
+
+        self._cond = threading.Condition()
+        self._unfinished = 0
+        self._stop_signals = 0
+        self._queued = set()
+        self._local = threading.local()
+        self._last_report = time.monotonic()
+
+    @staticmethod
+    def task_class(task_type):
+        """任务类型对应的类别名称"""
+        return TASK_TYPE_CLASSES.get(task_type, 'other')
+
+    def put(self, task, size_hint=None):
+        """添加下载任务
+
+        Args:
+            task: (url, filepath, task_type)，None表示工作线程结束信号
+            size_hint: 文件大小估计（字节），同一视频同一类别内小文件优先，为None时使用类别的估计值
+
+        Returns:
+            bool: 是否加入了队列（重复任务返回False）
+        """
+        with self._cond:
+            if task is None:
+                self._stop_signals += 1
+            else:
+                if (task[0], task[1]) in self._queued:
+                    return False
+                self._queued.add((task[0], task[1]))
+                task_class = self._classes[self.task_class(task[2])]
+                video_key = os.path.dirname(task[1])
+                size = size_hint if size_hint is not None else task_class.size_estimate
+                tasks = task_class.videos.setdefault(video_key, deque())
+                tasks.append((time.monotonic(), size, task))
+                if size_hint is not None and len(tasks) > 1:
+                    task_class.videos[video_key] = deque(sorted(tasks, key=lambda item: item[1]))
+                task_class.pending += 1
+                self._unfinished += 1
+            self._cond.notify()
+            return True
+
+    def _take(self):
+        """按优先级取出下一个可以执行的任务（调用方持有锁）"""
+        for task_class in self._order:
+            if not task_class.pending:
+                continue
+            if task_class.max_workers and task_class.active >= task_class.max_workers:
+                continue
+
+            # 轮流：取第一个视频的任务，该视频还有任务时移到末尾
+            video_key, tasks = next(iter(task_class.videos.items()))
+            queued_at, _, task = tasks.popleft()
+            if tasks:
+                task_class.videos.move_to_end(video_key)
+            else:
+                del task_class.videos[video_key]
+
+            task_class.pending -= 1
+            task_class.active += 1
+            task_class.total_wait += time.monotonic() - queued_at
+            return task_class, task
+        return None, None
+
+    def get(self, block=True, timeout=None):
+        """取出下一个下载任务
+
+        Returns:
+            tuple: (url, filepath, task_type)，或结束信号None
+
+        Raises:
+            queue.Empty: 超时仍没有可执行的任务
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                task_class, task = self._take()
+                if task_class:
+                    self._local.task_class = task_class
+                    self._local.task = task
+                    self._maybe_report()
+                    return task
+
+                # 没有待下载任务时才处理结束信号
+                if self._stop_signals and not any(c.pending for c in self._order):
+                    self._stop_signals -= 1
+                    return None
+
+                if not block:
+                    raise Empty
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise Empty
+                self._cond.wait(remaining)
+
+    def task_done(self):
+        """标记当前线程取出的任务已完成"""
+        task_class = getattr(self._local, 'task_class', None)
+        with self._cond:
+            if task_class is None or self._unfinished <= 0:
+                raise ValueError('task_done() called too many times')
+            self._local.task_class = None
+            self._queued.discard((self._local.task[0], self._local.task[1]))
+            task_class.active -= 1
+            task_class.completed += 1
+            self._unfinished -= 1
+            # 释放类别线程名额后，等待中的线程可能可以取到该类别的任务
+            self._cond.notify_all()
+
+    def join(self):
+        """等待所有任务完成"""
+        with self._cond:
+            while self._unfinished:
+                self._cond.wait()
+
+    def qsize(self):
+        """待下载的任务数"""
+        with self._cond:
+            return sum(c.pending for c in self._order)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def stats(self):
+        """各类别的队列统计
+
+        Returns:
+            dict: {类别: {'pending', 'active', 'completed', 'oldest_age', 'avg_wait'}}
+        """
+        now = time.monotonic()
+        with self._cond:
+            result = {}
+            for task_class in self._order:
+                oldest = min((tasks[0][0] for tasks in task_class.videos.values()), default=None)
+                result[task_class.name] = {
+                    'pending': task_class.pending,
+                    'active': task_class.active,
+                    'completed': task_class.completed,
+                    'oldest_age': now - oldest if oldest is not None else 0.0,
+                    'avg_wait': task_class.total_wait / (task_class.completed + task_class.active)
+                    if task_class.completed + task_class.active else 0.0,
+                }
+            return result
+
+    def format_stats(self):
+        """队列统计的单行文本"""
+        parts = []
+        for name, item in self.stats().items():
+            if item['pending'] or item['active'] or item['completed']:
+                parts.append(f"{name}: 等待{item['pending']} 下载中{item['active']} 完成{item['completed']} "
+                             f"最久等待{item['oldest_age']:.0f}s 平均等待{item['avg_wait']:.1f}s")
+        return '；'.join(parts) or '队列为空'
+
+    def _maybe_report(self):
+        """按report_interval定期输出队列状态（调用方持有锁）"""
+        if not self.report_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_report < self.report_interval:
+            return
+        self._last_report = now
+        # stats()需要重新获取锁，Condition默认使用可重入锁
+        print(f"📥 下载队列 - {self.format_stats()}")
+
+
+class BandwidthGovernor:
+    """下载带宽控制
+
+    所有下载线程共享：全局字节速率上限、可选的按类别速率上限（如限制预览视频），
+    以及每个主机的最大同时连接数。下载线程每写入一块数据前调用consume()。
+    """
+
+    def __init__(self, config=None):
+        """初始化带宽控制
+
+        Args:
+            config: 带宽配置，为None时使用配置文件中的BANDWIDTH_CONFIG
+        """
+        config = config if config is not None else BANDWIDTH_CONFIG
+        self.burst_seconds = config.get('burst_seconds', 1.0)
+        self.global_bucket = self._bucket(config.get('max_bytes_per_sec'))
+        self.class_buckets = {
+            name: self._bucket(rate) for name, rate in config.get('class_bytes_per_sec', {}).items() if rate
+        }
+        self.max_connections_per_host = config.get('max_connections_per_host')
+        self._host_slots = {}
+        self._lock = threading.Lock()
+        self.bytes_transferred = 0
+        self.throttled_seconds = 0.0
+
+    def _bucket(self, bytes_per_sec):
+        if not bytes_per_sec:
+            return None
+        return TokenBucket(bytes_per_sec, bytes_per_sec * self.burst_seconds)
+
+    def consume(self, nbytes, task_class=None):
+        """申请传输nbytes字节，超过速率上限时阻塞
+
+        Args:
+            nbytes: 字节数
+            task_class: 任务类别（见DownloadScheduler.task_class）
+        """
+        buckets = [self.global_bucket, self.class_buckets.get(task_class)]
+        wait = max([bucket.reserve(nbytes) for bucket in buckets if bucket], default=0.0)
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            self.bytes_transferred += nbytes
+            self.throttled_seconds += wait
+
+    @contextmanager
+    def connection(self, url):
+        """在with块内占用该主机的一个下载连接（超过每主机连接上限时等待）"""
+        if not self.max_connections_per_host:
+            yield
+            return
+
+        host = (urlparse(url).hostname or '').lower()
+        with self._lock:
+            slots = self._host_slots.get(host)
+            if slots is None:
+                slots = threading.BoundedSemaphore(self.max_connections_per_host)
+                self._host_slots[host] = slots
+        with slots:
+            yield
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟服务器（端到端负载测试用）
+回放HTML数据库中已采集的详情页，并用这些视频合成带showingCounter分页的列表页；
+页面中的站点地址和CDN地址（缩略图、预览视频）改写为本服务器地址，CDN文件按URL生成固定大小的内容，
+支持Range续传和ETag。可以配置每个请求的延迟、随机503错误率和周期性的429突发，
+让optimized_run不依赖真实站点和代理就能测量吞吐量、调整并发和重试设置。
+
+HTML数据库只保存详情页，列表页总是合成的；数据库中没有详情页时使用合成的详情页。
+
+使用方法:
+    python fixture_server.py                                   # 默认配置（FIXTURE_SERVER_CONFIG）
+    python fixture_server.py --pages 10 --latency 0.3 --error-rate 0.05 --burst-every 30
+    然后把config.py中的BASE_URL改为输出的地址，或者直接使用load_test.py
+"""
+
+import os
+import re
+import sys
+import sqlite3
+import time
+import random
+import hashlib
+import posixpath
+import argparse
+import mimetypes
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from config import FIXTURE_SERVER_CONFIG
+from detail_extractor import VIEWKEY_PATTERN, _sample_page as sample_detail_page
+
+# 页面中的站点和CDN绝对地址（包括JSON中转义的 https:\/\/ 形式）
+ABSOLUTE_URL_PATTERN = re.compile(r'https?:(\\?/)\1([\w.-]*(?:phncdn|pornhub)\.com)', re.IGNORECASE)
+RANGE_PATTERN = re.compile(r'bytes=(\d+)-(\d*)$')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+VIDEO_EXTENSIONS = ('.webm', '.mp4')
+DEFAULT_FILE_SIZE = 16 * 1024
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_source_pages(db_path=None, limit=200):
+    """从HTML数据库读取已采集的详情页
+
+    用只读连接直接查询html_pages和html_blobs，不创建DatabaseManager（不会迁移、建表或创建数据库文件），
+    负载测试不会改动正式数据库。
+
+    Args:
+        db_path: 视频数据库路径（HTML数据库在同一目录），为None时使用默认路径
+        limit: 最多读取的页面数量
+
+    Returns:
+        list: HTML页面数据（url、html_content），数据库不存在或不可用时返回空列表
+    """
+    from app import DatabaseManager
+
+    db_dir = os.path.dirname(db_path) if db_path else os.path.join(SCRIPT_DIR, 'database')
+    html_db_path = os.path.join(db_dir, 'pornhub.com.html.db')
+    if not os.path.exists(html_db_path):
+        return []
+
+    try:
+        conn = sqlite3.connect(f'file:{html_db_path}?mode=ro', uri=True)
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if 'html_pages' not in tables:
+                return []
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(html_pages)')}
+            if 'html_blobs' in tables and 'content_hash' in columns:
+                query = ('SELECT p.url, p.html_content, b.codec, b.data FROM html_pages p '
+                         'LEFT JOIN html_blobs b ON b.hash = p.content_hash')
+            else:
+                # 未升级的旧数据库：HTML以明文保存在html_pages中
+                query = 'SELECT p.url, p.html_content, NULL, NULL FROM html_pages p'
+            query += " WHERE p.url LIKE '%view_video.php%' ORDER BY p.created_at DESC LIMIT ?"
+
+            pages = []
+            for url, html_content, codec, data in conn.execute(query, (limit,)):
+                if data is not None:
+                    html_content = DatabaseManager._decompress_html(data, codec)
+                if html_content:
+                    pages.append({'url': url, 'html_content': html_content})
+            return pages
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ 读取HTML数据库失败: {e}")
+        return []
+
+
+def render_listing_page(viewkeys, first_index, total):
+    """合成一个列表页（视频条目的结构与真实列表页相同）
+
+    Args:
+        viewkeys: 本页视频的viewkey
+        first_index: 本页第一个视频的序号（从1开始）
+        total: 视频总数
+
+    Returns:
+        str: 列表页HTML
+    """
+    items = ''.join(
+        f'<li class="pcVideoListItem js-pop videoblock videoBox" data-video-vkey="{key}">'
+        f'<div class="phimage"><a href="/view_video.php?viewkey={key}" title="{key}" '
+        f'class="fade videoPreviewBg linkVideoThumb js-linkVideoThumb img">'
+        f'<img src="data:image/gif;base64,R0lGOD" alt="{key}" class="js-videoThumb thumb"/></a></div>'
+        f'<span class="title"><a href="/view_video.php?viewkey={key}" title="{key}">{key}</a></span></li>\n'
+        for key in viewkeys
+    )
+    last_index = first_index + len(viewkeys) - 1
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Fixture listing</title></head><body>'
+            f'<div class="showingCounter pornstarsCounter">显示{first_index}-{last_index}个，共有{total}个</div>'
+            f'<ul id="videoCategory" class="nf-videos videos">{items}</ul></body></html>')
+
+
+class FixtureServer:
+    """本地模拟站点
+
+    在后台线程中运行的多线程HTTP服务器：列表页（listing_path?page=N）、详情页（/view_video.php?viewkey=）
+    和CDN文件（/cdn/<viewkey>/<原主机>/<原路径>），并统计各类请求的状态码和发送的字节数。
+    """
+
+    def __init__(self, config=None, source_pages=None, db_path=None):
+        """初始化模拟服务器（绑定端口，调用start()后开始处理请求）
+
+        Args:
+            config: 覆盖FIXTURE_SERVER_CONFIG的设置
+            source_pages: 回放的详情页（url、html_content），为None时从HTML数据库读取
+            db_path: 读取HTML数据库时使用的视频数据库路径，为None时使用默认路径
+        """
+        self.config = dict(FIXTURE_SERVER_CONFIG, **(config or {}))
+        if source_pages is None:
+            source_pages = load_source_pages(db_path, self.config['source_pages'])
+
+        # 回放的详情页模板：[(原viewkey, 页面源码)]
+        self.templates = []
+        for page in source_pages:
+            match = VIEWKEY_PATTERN.search(page['url'])
+            if match and page.get('html_content'):
+                self.templates.append((match.group(1), page['html_content']))
+        if not self.templates:
+            print("ℹ️ HTML数据库中没有详情页，使用合成的详情页")
+
+        # 列表页中的视频：先用已采集的viewkey，不够时生成新的viewkey（详情页循环使用模板）
+        total = self.config['pages'] * self.config['items_per_page']
+        viewkeys = list(dict.fromkeys(key for key, _ in self.templates))[:total]
+        viewkeys += [f'fx{index:08x}' for index in range(len(viewkeys), total)]
+        self.viewkeys = viewkeys
+        self._video_index = {key: index for index, key in enumerate(viewkeys)}
+
+        self.httpd = ThreadingHTTPServer((self.config['host'], self.config['port']), _FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fixture = self
+        port = self.httpd.server_address[1]
+        self.site_netloc = f"{self.config['host']}:{port}"
+        self.cdn_netloc = f"{self.config['cdn_host'] or self.config['host']}:{port}"
+
+        self.started = time.monotonic()
+        self._random = random.Random(self.config['seed'])
+        self._lock = threading.Lock()
+        self._counts = Counter()  # (请求类型, 状态码) -> 次数
+        self.bytes_sent = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """列表页地址（作为采集器的BASE_URL）"""
+        return f"http://{self.site_netloc}{self.config['listing_path']}"
+
+    def start(self):
+        """在后台线程中开始处理请求"""
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器并释放端口"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def request_kind(self, path):
+        """按路径区分请求类型：listing、detail、cdn或other"""
+        if path.startswith('/cdn/'):
+            return 'cdn'
+        if path == '/view_video.php':
+            return 'detail'
+        if path == self.config['listing_path']:
+            return 'listing'
+        return 'other'
+
+    def in_burst(self):
+        """当前是否处于429突发期（每个burst_every周期的最后burst_duration秒）"""
+        every = self.config['burst_every']
+        if not every:
+            return False
+        return (time.monotonic() - self.started) % every >= every - self.config['burst_duration']
+
+    def inject_faults(self):
+        """等待配置的延迟后决定是否返回错误
+
+        Returns:
+            int: 需要返回的错误状态码（429或503），不注入错误时返回None
+        """
+        with self._lock:
+            delay = self.config['latency'] + self._random.uniform(0, self.config['jitter'])
+            failed = self._random.random() < self.config['error_rate']
+        if delay > 0:
+            time.sleep(delay)
+        if self.in_burst():
+            return 429
+        if failed:
+            return 503
+        return None
+
+    def listing_page(self, page_num):
+        """第page_num个列表页的HTML，超出页数时返回None"""
+        per_page = self.config['items_per_page']
+        start = (page_num - 1) * per_page
+        if page_num < 1 or start >= len(self.viewkeys):
+            return None
+        return render_listing_page(self.viewkeys[start:start + per_page], start + 1, len(self.viewkeys))
+
+    def detail_page(self, viewkey):
+        """视频详情页的HTML（地址已改写为本服务器），未知的viewkey返回None"""
+        index = self._video_index.get(viewkey)
+        if index is None:
+            return None
+        if self.templates:
+            original_key, html_content = self.templates[index % len(self.templates)]
+            if original_key != viewkey:
+                html_content = html_content.replace(original_key, viewkey)
+        else:
+            html_content = sample_detail_page(100000 + index)
+        return self.rewrite_urls(html_content, viewkey)
+
+    def rewrite_urls(self, html_content, viewkey):
+        """把页面中的站点地址和CDN地址改写为本服务器地址（CDN路径带上viewkey，每个视频的文件地址都不同）"""
+        def replace(match):
+            separator, host = match.group(1), match.group(2).lower()
+            if host.endswith('phncdn.com'):
+                return f'http:{separator}{separator}{self.cdn_netloc}{separator}cdn{separator}{viewkey}{separator}{host}'
+            return f'http:{separator}{separator}{self.site_netloc}'
+        return ABSOLUTE_URL_PATTERN.sub(replace, html_content)
+
+    def cdn_file(self, path):
+        """按路径生成CDN文件内容（大小按扩展名决定，内容由路径确定且各不相同）
+
+        Returns:
+            tuple: (文件内容, ETag)
+        """
+        extension = posixpath.splitext(path)[1].lower()
+        if extension in IMAGE_EXTENSIONS:
+            size = self.config['thumbnail_size']
+        elif extension in VIDEO_EXTENSIONS:
+            size = self.config['preview_size']
+        else:
+            size = DEFAULT_FILE_SIZE
+        digest = hashlib.sha256(path.encode('utf-8')).digest()
+        content = (digest * (size // len(digest) + 1))[:size]
+        return content, f'"{digest.hex()[:16]}"'
+
+    def record(self, kind, status, nbytes):
+        """记录一次响应"""
+        with self._lock:
+            self._counts[(kind, status)] += 1
+            self.bytes_sent += nbytes
+
+    def stats(self):
+        """请求统计
+
+        Returns:
+            dict: {'requests': 总请求数, 'bytes_sent': 发送的字节数, 'by_kind': {请求类型: {状态码: 次数}}}
+        """
+        with self._lock:
+            by_kind = {}
+            for (kind, status), count in sorted(self._counts.items()):
+                by_kind.setdefault(kind, {})[status] = count
+            return {'requests': sum(self._counts.values()), 'bytes_sent': self.bytes_sent, 'by_kind': by_kind}
+
+    def format_stats(self):
+        """请求统计的单行文本"""
+        stats = self.stats()
+        parts = [f"{kind}: " + ' '.join(f"{status}×{count}" for status, count in statuses.items())
+                 for kind, statuses in stats['by_kind'].items()]
+        return f"{stats['requests']} 个请求，发送 {stats['bytes_sent'] / 1024 / 1024:.1f}MB（{'；'.join(parts) or '无'}）"
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """模拟服务器的请求处理（HTTP/1.1长连接，与真实站点一样复用连接）"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        fixture = self.server.fixture
+        parsed = urlparse(self.path)
+        kind = fixture.request_kind(parsed.path)
+
+        status = fixture.inject_faults()
+        if status:
+            headers = {'Retry-After': str(fixture.config['retry_after'])} if status == 429 else None
+            return self._send(kind, status, b'', headers)
+
+        if kind == 'cdn':
+            return self._send_file(kind, parsed.path)
+
+        query = parse_qs(parsed.query)
+        html_content = None
+        if kind == 'detail':
+            html_content = fixture.detail_page(query.get('viewkey', [''])[0])
+        elif kind == 'listing':
+            page = query.get('page', ['1'])[0]
+            html_content = fixture.listing_page(int(page)) if page.isdigit() else None
+
+        if html_content is None:
+            return self._send(kind, 404, b'')
+        self._send(kind, 200, html_content.encode('utf-8'), {'Content-Type': 'text/html; charset=utf-8'})
+
+    def _send_file(self, kind, path):
+        """发送CDN文件（支持Range续传和If-None-Match）"""
+        content, etag = self.server.fixture.cdn_file(path)
+        if self.headers.get('If-None-Match') == etag:
+            return self._send(kind, 304, b'', {'ETag': etag})
+
+        headers = {
+            'Content-Type': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+            'ETag': etag,
+            'Accept-Ranges': 'bytes',
+        }
+        match = RANGE_PATTERN.match(self.headers.get('Range', ''))
+        if not match:
+            return self._send(kind, 200, content, headers)
+
+        start = int(match.group(1))
+        if start >= len(content):
+            return self._send(kind, 416, b'', {'Content-Range': f'bytes */{len(content)}'})
+        end = min(int(match.group(2)), len(content) - 1) if match.group(2) else len(content) - 1
+        headers['Content-Range'] = f'bytes {start}-{end}/{len(content)}'
+        self._send(kind, 206, content[start:end + 1], headers)
+
+    def _send(self, kind, status, body, headers=None):
+        try:
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已断开（超时或采集结束），不影响统计
+            pass
+        self.server.fixture.record(kind, status, len(body))
+
+    def log_message(self, format, *args):
+        # 负载测试时请求量很大，不输出访问日志
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端负载测试用的本地模拟服务器')
+    parser.add_argument('--host', default=FIXTURE_SERVER_CONFIG['host'], help='监听地址')
+    parser.add_argument('--port', type=int, default=FIXTURE_SERVER_CONFIG['port'], help='监听端口 (0: 随机端口)')
+    parser.add_argument('--db', help='读取详情页的视频数据库路径（默认使用database目录）')
+    parser.add_argument('--pages', type=int, default=FIXTURE_SERVER_CONFIG['pages'], help='列表页数量')
+    parser.add_argument('--latency', type=float, default=FIXTURE_SERVER_CONFIG['latency'], help='每个请求的基础延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=FIXTURE_SERVER_CONFIG['jitter'], help='额外随机延迟的上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=FIXTURE_SERVER_CONFIG['error_rate'], help='随机返回503的比例')
+    parser.add_argument('--burst-every', type=float, default=FIXTURE_SERVER_CONFIG['burst_every'],
+                        help='每隔多少秒出现一次429突发 (0: 不出现)')
+    parser.add_argument('--burst-duration', type=float, default=FIXTURE_SERVER_CONFIG['burst_duration'],
+                        help='每次429突发持续的秒数')
+    args = parser.parse_args()
+
+    server = FixtureServer({
+        'host': args.host,
+        'port': args.port,
+        'pages': args.pages,
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'burst_every': args.burst_every,
+        'burst_duration': args.burst_duration,
+    }, db_path=args.db)
+    server.start()
+    print(f"🚀 模拟服务器已启动: {server.base_url}")
+    print(f"📄 {args.pages} 个列表页，{len(server.viewkeys)} 个视频（{len(server.templates)} 个已采集的详情页模板）")
+    print("   把config.py中的BASE_URL改为上面的地址后运行采集，Ctrl+C停止")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"\n📊 {server.format_stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,13 +9,15 @@
     python generate_data.py --limit 10         # 限制处理10个视频
     python generate_data.py --update           # 强制更新已存在的文件
     python generate_data.py --viewkey 123456   # 只处理指定的视频ID
+    python generate_data.py --workers 8        # 使用8个进程并行解析HTML
+    python generate_data.py --incremental      # 只处理上次增量运行后新增或更新的HTML页面
     python generate_data.py --stats            # 显示数据库统计信息
 """
 
 import os
 import sys
 import argparse
-from app import PornhubScraper, DatabaseManager, show_database_stats
+from app import PornhubScraper, DatabaseManager, show_database_stats, parse_video_detail_html
 
 def main():
     parser = argparse.ArgumentParser(description='从数据库重新生成data目录下的采集文件')
@@ -26,6 +28,8 @@ def main():
     parser.add_argument('--viewkey', type=str, help='只处理指定的视频ID')
     parser.add_argument('--stats', action='store_true', help='显示数据库统计信息')
     parser.add_argument('--verbose', action='store_true', help='显示详细信息')
+    parser.add_argument('--workers', type=int, help='HTML解析进程数 (0=CPU核数, 默认使用配置文件)')
+    parser.add_argument('--incremental', action='store_true', help='只处理上次增量运行后新增或更新的HTML页面')
     parser.add_argument('--source', choices=['html', 'video'], default='html', 
                        help='数据源: html=从HTML数据库, video=从视频数据库 (默认: html)')
     
@@ -84,6 +88,8 @@ def generate_from_html_database(scraper, args):
     print(f"  - 强制更新: {'是' if args.update else '否'}")
     print(f"  - 指定视频: {args.viewkey or '全部'}")
     print(f"  - 详细输出: {'是' if args.verbose else '否'}")
+    print(f"  - 解析进程: {args.workers if args.workers is not None else '默认'}")
+    print(f"  - 增量模式: {'是' if args.incremental else '否'}")
     
     if args.viewkey:
         # 处理指定视频
@@ -92,7 +98,9 @@ def generate_from_html_database(scraper, args):
         # 批量处理
         return scraper.regenerate_data_from_html_db(
             limit=args.limit, 
-            update_existing=args.update
+            update_existing=args.update,
+            workers=args.workers,
+            incremental=args.incremental
         )
 
 def generate_from_video_database(scraper, args):
@@ -127,7 +135,7 @@ def generate_from_video_database(scraper, args):
                 query += f' LIMIT {args.limit}'
             
             cursor.execute(query)
-            videos = cursor.fetchall()
+            videos = [dict(row) for row in cursor.fetchall()]
     
     if not videos:
         print("❌ 没有找到视频数据")
@@ -174,8 +182,8 @@ def generate_from_video_database(scraper, args):
                     preview_path = os.path.join(data_folder, 'preview.webm')
                     scraper.add_download_task(video_data['preview_url'], preview_path, 'preview')
                 
-                # 创建采集日志
-                scraper.create_collection_log(video_data, data_folder, success=True)
+                # 记录采集状态（并按配置导出采集日志）
+                scraper.record_collection(video_data, data_folder, success=True)
                 
                 success_count += 1
                 
@@ -190,6 +198,7 @@ def generate_from_video_database(scraper, args):
         # 等待下载完成
         print("\n⏳ 等待文件下载完成...")
         scraper.wait_for_downloads()
+        scraper.db.flush_writes()
         
     finally:
         scraper.stop_download_workers()
@@ -207,37 +216,30 @@ def generate_single_video_from_html(scraper, viewkey, update_existing, verbose):
     video_url = f"https://cn.pornhub.com/view_video.php?viewkey={viewkey}"
     
     # 从HTML数据库获取
-    html_content = scraper.db.get_html_page(video_url)
-    if not html_content:
+    html_page = scraper.db.get_html_page(video_url)
+    if not html_page:
         print(f"❌ 在HTML数据库中未找到视频: {viewkey}")
         return {'success': 0, 'failed': 1, 'skipped': 0, 'total': 1}
+    html_content = html_page['html_content']
     
     print(f"🔄 处理单个视频: {viewkey}")
     
     try:
-        # 使用HTML重新生成逻辑
-        from bs4 import BeautifulSoup
-        
         # 确保HTML内容是字符串格式
         if isinstance(html_content, (tuple, list)):
             html_content = html_content[0] if html_content else ""
         elif not isinstance(html_content, str):
             html_content = str(html_content)
-            
-        soup = BeautifulSoup(html_content, 'html.parser')
         
-        # 提取视频信息
-        video_data = scraper.extract_video_metadata(soup, video_url)
+        # 使用与批量重新生成相同的解析逻辑提取视频信息
+        video_data = parse_video_detail_html(html_content, video_url)
         video_data['viewkey'] = viewkey
         video_data['video_id'] = viewkey
         video_data['video_url'] = video_url
         
         # 检查跳过逻辑
         if not update_existing:
-            file_exists = scraper.is_video_completed(viewkey)
-            db_exists = scraper.db.video_exists(viewkey)
-            
-            if file_exists and db_exists:
+            if scraper.is_video_completed(viewkey):
                 print(f"⏭️  跳过已存在: {viewkey}")
                 return {'success': 0, 'failed': 0, 'skipped': 1, 'total': 1}
         
@@ -256,34 +258,41 @@ def generate_single_video_from_html(scraper, viewkey, update_existing, verbose):
 
 def convert_db_video_to_data(video_row):
     """将数据库记录转换为视频数据格式"""
-    # 处理分类
+    # 处理分类（GROUP_CONCAT结果或get_video_by_id返回的列表）
     categories = []
-    if hasattr(video_row, 'category_names') and video_row.category_names:
-        for cat_name in video_row.category_names.split(','):
+    if video_row.get('category_names'):
+        for cat_name in video_row['category_names'].split(','):
             if cat_name.strip():
                 categories.append({'name': cat_name.strip()})
+    elif isinstance(video_row.get('categories'), list):
+        categories = [{'name': c['name']} for c in video_row['categories'] if c.get('name')]
     
     # 处理M3U8链接
     m3u8_urls = []
-    best_m3u8_url = ''
-    if hasattr(video_row, 'm3u8_urls') and video_row.m3u8_urls:
-        m3u8_urls = [url.strip() for url in video_row.m3u8_urls.split(',') if url.strip()]
-        if m3u8_urls:
-            best_m3u8_url = m3u8_urls[0]  # 第一个作为最佳质量
+    best_m3u8_url = video_row.get('best_m3u8_url') or ''
+    raw_m3u8 = video_row.get('m3u8_urls')
+    if isinstance(raw_m3u8, str):
+        m3u8_urls = [url.strip() for url in raw_m3u8.split(',') if url.strip()]
+    elif isinstance(raw_m3u8, list):
+        m3u8_urls = raw_m3u8
+    if m3u8_urls and not best_m3u8_url:
+        best_m3u8_url = m3u8_urls[0]  # 第一个作为最佳质量
     
+    video_id = video_row['video_id']
+    title = video_row.get('title')
     return {
-        'viewkey': video_row.video_id,
-        'video_id': video_row.video_id,
-        'title': video_row.title or 'N/A',
-        'video_url': video_row.original_url or f"https://cn.pornhub.com/view_video.php?viewkey={video_row.video_id}",
-        'uploader': video_row.uploader or 'N/A',
-        'views': video_row.views or 'N/A',
-        'duration': video_row.duration or 'N/A',
-        'publish_time': video_row.publish_time or 'N/A',
-        'alt_text': f"{video_row.title or '视频'} 缩略图",
+        'viewkey': video_id,
+        'video_id': video_id,
+        'title': title or 'N/A',
+        'video_url': video_row.get('original_url') or f"https://cn.pornhub.com/view_video.php?viewkey={video_id}",
+        'uploader': video_row.get('uploader') or 'N/A',
+        'views': video_row.get('views') or 'N/A',
+        'duration': video_row.get('duration') or 'N/A',
+        'publish_time': video_row.get('publish_time') or 'N/A',
+        'alt_text': f"{title or '视频'} 缩略图",
         'categories': categories,
-        'thumbnail_url': video_row.thumbnail_url or '',
-        'preview_url': video_row.preview_url or '',
+        'thumbnail_url': video_row.get('thumbnail_url') or '',
+        'preview_url': video_row.get('preview_url') or '',
         'best_m3u8_url': best_m3u8_url,
         'm3u8_urls': m3u8_urls
     }
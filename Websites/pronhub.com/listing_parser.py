@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列表页解析
+每个列表页只用lxml解析一次，解析结果按页面源码缓存，供fast_parse_video_urls、get_total_pages、
+check_is_last_page和parse_video_list共用：视频链接和分页计数（showingCounter）直接用XPath从lxml树中读取；
+需要BeautifulSoup元素的parse_video_list只为#videoCategory建立节点（SoupStrainer）。
+
+直接运行本文件可以对比旧的多次html.parser解析的耗时：
+    python listing_parser.py [列表页HTML文件 ...]
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import urljoin
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup, SoupStrainer
+
+# 匹配格式：显示1-32个，共有749个
+SHOWING_COUNTER_PATTERN = re.compile(r'显示(\d+)-(\d+)个，共有(\d+)个')
+
+# 与BeautifulSoup的find/find_all相同的匹配规则（class按空白分隔的任意一个值匹配）
+VIDEO_LIST_XPATH = etree.XPath('(//ul[@id="videoCategory"])[1]')
+VIDEO_ITEMS_XPATH = etree.XPath('.//li[contains(concat(" ", normalize-space(@class), " "), " pcVideoListItem ")]')
+VIDEO_LINK_XPATH = etree.XPath('(.//a[contains(concat(" ", normalize-space(@class), " "), " linkVideoThumb ")])[1]')
+SHOWING_COUNTER_XPATH = etree.XPath('(//div[contains(concat(" ", normalize-space(@class), " "), " showingCounter ")])[1]')
+
+VIDEO_LIST_STRAINER = SoupStrainer('ul', attrs={'id': 'videoCategory'})
+
+# 同时在处理中的列表页数量很少（listing_workers个），只缓存最近的页面
+CACHE_SIZE = 32
+
+
+class ListingPage:
+    """一个列表页的解析结果（lxml树只解析一次，BeautifulSoup节点按需建立）"""
+
+    def __init__(self, html_content):
+        self.html_content = html_content
+        self.tree = self._parse(html_content)
+        self._counter = None
+        self._video_list_soup = None
+
+    @staticmethod
+    def _parse(html_content):
+        """用lxml解析页面，空页面返回None"""
+        if not html_content or not html_content.strip():
+            return None
+        try:
+            return lxml.html.fromstring(html_content)
+        except ValueError:
+            # 带编码声明的XML头不能以str解析，改用字节
+            return lxml.html.fromstring(html_content.encode('utf-8'))
+        except etree.ParserError:
+            return None
+
+    def video_list(self):
+        """#videoCategory列表元素（lxml），没有时返回None"""
+        if self.tree is None:
+            return None
+        found = VIDEO_LIST_XPATH(self.tree)
+        return found[0] if found else None
+
+    def video_urls(self, base_url):
+        """列表中各视频的链接（按页面顺序）
+
+        Args:
+            base_url: 用于补全相对链接的列表页地址
+
+        Returns:
+            list: 视频链接
+        """
+        video_list = self.video_list()
+        if video_list is None:
+            return []
+
+        video_urls = []
+        for li in VIDEO_ITEMS_XPATH(video_list):
+            link = VIDEO_LINK_XPATH(li)
+            if link:
+                video_url = urljoin(base_url, link[0].get('href', ''))
+                if video_url:
+                    video_urls.append(video_url)
+        return video_urls
+
+    def showing_counter(self):
+        """解析showingCounter
+
+        Returns:
+            tuple: (起始序号, 结束序号, 总数)，没有计数或格式不符时返回None
+        """
+        if self._counter is None:
+            self._counter = ()
+            found = SHOWING_COUNTER_XPATH(self.tree) if self.tree is not None else []
+            if found:
+                # 与BeautifulSoup的get_text(strip=True)相同：每段文本去掉首尾空白后拼接
+                counter_text = ''.join(text.strip() for text in found[0].itertext())
+                match = SHOWING_COUNTER_PATTERN.search(counter_text)
+                if match:
+                    self._counter = tuple(int(value) for value in match.groups())
+        return self._counter or None
+
+    def is_last_page(self):
+        """当前页是否为最后一页（结束序号等于总数）"""
+        counter = self.showing_counter()
+        return bool(counter) and counter[1] == counter[2]
+
+    def total_pages(self):
+        """按每页数量计算的总页数，无法计算时返回None"""
+        counter = self.showing_counter()
+        if not counter:
+            return None
+        start_num, end_num, total_num = counter
+        items_per_page = end_num - start_num + 1
+        return (total_num + items_per_page - 1) // items_per_page
+
+    def video_list_soup(self):
+        """#videoCategory列表的BeautifulSoup元素（只为该列表建立节点），没有时返回None"""
+        if self._video_list_soup is None:
+            soup = BeautifulSoup(self.html_content or '', 'lxml', parse_only=VIDEO_LIST_STRAINER)
+            self._video_list_soup = soup.find('ul', {'id': 'videoCategory'}) or False
+        return self._video_list_soup or None
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def parse_listing_page(html_content):
+    """获取列表页的解析结果，同一份页面源码只解析一次
+
+    Args:
+        html_content: 列表页HTML源码
+
+    Returns:
+        ListingPage: 解析结果
+    """
+    with _cache_lock:
+        page = _cache.get(html_content)
+        if page is not None:
+            _cache.move_to_end(html_content)
+            return page
+
+    page = ListingPage(html_content)
+    with _cache_lock:
+        _cache[html_content] = page
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return page
+
+
+def _legacy_parse(html_content, base_url):
+    """旧的解析方式（每个函数各自用html.parser完整解析一次），仅用于性能对比"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    video_list = soup.find('ul', {'id': 'videoCategory'})
+    video_urls = []
+    if video_list:
+        for li in video_list.find_all('li', class_='pcVideoListItem'):
+            link_element = li.find('a', class_='linkVideoThumb')
+            if link_element:
+                video_url = urljoin(base_url, link_element.get('href', ''))
+                if video_url:
+                    video_urls.append(video_url)
+
+    counters = []
+    for _ in range(2):  # get_total_pages和check_is_last_page各解析一次
+        soup = BeautifulSoup(html_content, 'html.parser')
+        showing_counter = soup.find('div', class_='showingCounter')
+        match = SHOWING_COUNTER_PATTERN.search(showing_counter.get_text(strip=True)) if showing_counter else None
+        counters.append(tuple(int(value) for value in match.groups()) if match else None)
+    return video_urls, counters[0]
+
+
+def _sample_page(items=44, filler=120):
+    """生成一个结构与列表页相近的测试页面（没有提供HTML文件时使用）"""
+    lis = []
+    for i in range(items):
+        vkey = f'ph{i:08x}'
+        lis.append(
+            f'<li class="pcVideoListItem js-pop videoblock videoBox" data-video-id="{1000 + i}" data-video-vkey="{vkey}">'
+            f'<div class="wrap"><div class="phimage">'
+            f'<a href="/view_video.php?viewkey={vkey}" title="Video {i}" class="fade videoPreviewBg linkVideoThumb js-linkVideoThumb img">'
+            f'<img src="data:image/gif;base64,R0lGOD" data-mediumthumb="https://ei.phncdn.com/videos/{i}/thumb.jpg" alt="Video {i}" '
+            f'data-mediabook="https://ew.phncdn.com/videos/{i}/preview.webm?x=1&amp;y=2" class="js-videoThumb thumb"/></a>'
+            f'<div class="marker-overlays"><var class="duration">10:{i % 60:02d}</var></div></div>'
+            f'<div class="thumbnail-info-wrapper"><span class="title">'
+            f'<a href="/view_video.php?viewkey={vkey}" title="Video {i}" class="gtm-event-thumb-click">Video title {i} &amp; more</a></span>'
+            f'<span class="usernameBadgesWrapper"><a href="/model/user{i}" title="user{i}">User {i}</a></span>'
+            f'<div class="views"><var>{i}.{i % 9}万</var> 次观看</div></div></div></li>\n'
+        )
+    menu = ''.join(f'<div class="menu-item"><a href="/categories/{j}" class="link js-menu">Category {j}</a>'
+                   f'<span class="count">{j * 7}</span></div>\n' for j in range(filler))
+    scripts = ''.join(f'<script type="text/javascript">var conf{j} = {{"a": "{"z" * 300}"}};</script>\n' for j in range(30))
+    pagination = ''.join(f'<li class="page_number"><a href="?page={p}">{p}</a></li>' for p in range(1, 10))
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>sample</title>{scripts}</head><body>'
+            f'<div id="header">{menu}</div><div class="sectionWrapper">'
+            f'<div class="showingCounter pornstarsCounter">\n  显示1-{items}个，共有749个\n</div>'
+            f'<ul id="videoCategory" class="nf-videos videos">{"".join(lis)}</ul>'
+            f'<div class="pagination3"><ul>{pagination}</ul></div></div><div id="footer">{menu}</div></body></html>')
+
+
+def _benchmark(pages, base_url='https://cn.pornhub.com/video', rounds=10):
+    """对比旧的解析方式和parse_listing_page的平均单页耗时（视频链接 + 总页数 + 是否最后一页）"""
+    import time
+
+    for html_content in pages:
+        page = ListingPage(html_content)
+        legacy_urls, legacy_counter = _legacy_parse(html_content, base_url)
+        if page.video_urls(base_url) != legacy_urls or page.showing_counter() != legacy_counter:
+            print("⚠️ 解析结果与旧方式不一致")
+
+    def current(html_content):
+        # 不使用缓存，每轮都重新解析
+        page = ListingPage(html_content)
+        return page.video_urls(base_url), page.total_pages(), page.is_last_page()
+
+    def measure(func):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for html_content in pages:
+                func(html_content)
+        return (time.perf_counter() - start) / (rounds * len(pages))
+
+    legacy_time = measure(lambda html_content: _legacy_parse(html_content, base_url))
+    current_time = measure(current)
+    print(f"页面数: {len(pages)}，每种方式运行 {rounds} 轮")
+    print(f"旧方式（html.parser解析3次）: {legacy_time * 1000:.2f} ms/页")
+    print(f"parse_listing_page（lxml解析1次）: {current_time * 1000:.2f} ms/页")
+    print(f"加速: {legacy_time / max(current_time, 1e-9):.1f}x")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1:
+        sample_pages = []
+        for path in sys.argv[1:]:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                sample_pages.append(f.read())
+    else:
+        sample_pages = [_sample_page(items) for items in (32, 44, 44, 20)]
+    _benchmark(sample_pages)
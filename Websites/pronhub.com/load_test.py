@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端负载测试
+启动本地模拟服务器（fixture_server.py），在临时目录中（独立的数据库和data目录）对它运行完整的
+optimized_run，报告每分钟采集的视频数、数据库写入速率和下载吞吐量。
+用--set覆盖config.py中的设置，就可以离线比较不同的并发、重试和限速配置。
+
+模拟站点沿用RATE_LIMIT_CONFIG中pornhub.com的限速（--no-rate-limit关闭），不经过代理。
+
+使用方法:
+    python load_test.py                                        # 默认配置，5个列表页
+    python load_test.py --pages 10 --latency 0.3 --error-rate 0.05 --burst-every 20
+    python load_test.py --set DETAIL_PAGE_CONFIG.max_workers_requests=10 --set NETWORK_CONFIG.retry_total=4
+    python load_test.py --set BANDWIDTH_CONFIG.max_bytes_per_sec=null --json result.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import config
+from config import FIXTURE_SERVER_CONFIG, OUTPUT_CONFIG, RATE_LIMIT_CONFIG
+from fixture_server import FixtureServer
+
+
+def apply_override(expression):
+    """应用一个--set设置
+
+    Args:
+        expression: SECTION.key[.key...]=value，value按JSON解析（null、数字、列表等），无法解析时作为字符串
+
+    Returns:
+        tuple: (设置名, 新值)
+    """
+    name, separator, raw_value = expression.partition('=')
+    section, *keys = name.strip().split('.')
+    target = getattr(config, section, None)
+    if not separator or not keys or not isinstance(target, dict):
+        raise ValueError(f"无效的设置: {expression}（格式: SECTION.key=value，如 SCRAPER_CONFIG.download_threads=20）")
+
+    for key in keys[:-1]:
+        target = target.setdefault(key, {})
+    try:
+        value = json.loads(raw_value)
+    except ValueError:
+        value = raw_value
+    target[keys[-1]] = value
+    return name.strip(), value
+
+
+def mirror_rate_limits(server):
+    """把真实站点和CDN的限速设置套用到模拟服务器的主机上"""
+    hosts = RATE_LIMIT_CONFIG.setdefault('hosts', {})
+    site_limits = hosts.get('pornhub.com')
+    cdn_limits = hosts.get('phncdn.com')
+    if site_limits:
+        hosts[server.config['host']] = site_limits
+    if cdn_limits and server.config['cdn_host']:
+        hosts[server.config['cdn_host']] = cdn_limits
+
+
+def collect_metrics(scraper, server, result, elapsed):
+    """汇总一次负载测试的结果
+
+    Returns:
+        dict: 采集、数据库写入、下载和模拟服务器的统计
+    """
+    analyzed = result['success_count'] if result else 0
+    write_stats = dict(scraper.db.write_stats)
+    downloads_ok = sum(1 for success in scraper.download_results.values() if success)
+    download_bytes = scraper.bandwidth.bytes_transferred
+    return {
+        'elapsed': elapsed,
+        'video_urls': len(result['video_urls']) if result else 0,
+        'videos': analyzed,
+        'videos_per_minute': analyzed / elapsed * 60 if elapsed else 0.0,
+        'db_videos_written': write_stats['videos'],
+        'db_batches': write_stats['batches'],
+        'db_errors': write_stats['errors'],
+        'db_writes_per_sec': write_stats['videos'] / elapsed if elapsed else 0.0,
+        'downloads_ok': downloads_ok,
+        'downloads_failed': len(scraper.download_results) - downloads_ok,
+        'download_bytes': download_bytes,
+        'download_mb_per_sec': download_bytes / 1024 / 1024 / elapsed if elapsed else 0.0,
+        'concurrency': {
+            'analysis': scraper.analysis_concurrency.limits(),
+            'download': scraper.download_concurrency.limits(),
+        },
+        'server': server.stats(),
+    }
+
+
+def print_report(metrics, server):
+    """输出负载测试结果"""
+    print("\n=== 📊 负载测试结果 ===")
+    print(f"⏱️  总耗时: {metrics['elapsed']:.1f} 秒")
+    print(f"🔗 视频链接: {metrics['video_urls']}，成功分析: {metrics['videos']}")
+    print(f"🎬 采集速率: {metrics['videos_per_minute']:.1f} 个视频/分钟")
+    print(f"💾 数据库写入: {metrics['db_videos_written']} 个视频 / {metrics['db_batches']} 批，"
+          f"{metrics['db_writes_per_sec']:.1f} 个视频/秒（错误 {metrics['db_errors']}）")
+    print(f"📥 下载: 成功 {metrics['downloads_ok']}，失败 {metrics['downloads_failed']}，"
+          f"{metrics['download_bytes'] / 1024 / 1024:.1f}MB，平均 {metrics['download_mb_per_sec']:.2f}MB/s")
+    print(f"⚙️  最终并发上限: 详情页 {metrics['concurrency']['analysis'] or 'N/A'}，"
+          f"下载 {metrics['concurrency']['download'] or 'N/A'}")
+    print(f"🖥️  模拟服务器: {server.format_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对本地模拟服务器运行optimized_run的端到端负载测试')
+    parser.add_argument('--pages', type=int, default=FIXTURE_SERVER_CONFIG['pages'], help='列表页数量')
+    parser.add_argument('--latency', type=float, default=FIXTURE_SERVER_CONFIG['latency'], help='每个请求的基础延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=FIXTURE_SERVER_CONFIG['jitter'], help='额外随机延迟的上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=FIXTURE_SERVER_CONFIG['error_rate'], help='随机返回503的比例')
+    parser.add_argument('--burst-every', type=float, default=FIXTURE_SERVER_CONFIG['burst_every'],
+                        help='每隔多少秒出现一次429突发 (0: 不出现)')
+    parser.add_argument('--burst-duration', type=float, default=FIXTURE_SERVER_CONFIG['burst_duration'],
+                        help='每次429突发持续的秒数')
+    parser.add_argument('--db', help='读取详情页的视频数据库路径（默认使用database目录）')
+    parser.add_argument('--set', dest='overrides', action='append', default=[], metavar='SECTION.key=value',
+                        help='覆盖config.py中的设置，可以多次使用')
+    parser.add_argument('--no-rate-limit', action='store_true', help='模拟站点不使用pornhub.com的限速')
+    parser.add_argument('--json', metavar='FILE', help='把结果保存为JSON文件')
+    parser.add_argument('--keep', action='store_true', help='保留临时目录（数据库和下载的文件）')
+    args = parser.parse_args()
+
+    overrides = {}
+    for expression in args.overrides:
+        try:
+            name, value = apply_override(expression)
+        except ValueError as e:
+            parser.error(str(e))
+        overrides[name] = value
+        print(f"⚙️  {name} = {value!r}")
+
+    # 数据库和data目录都放在临时目录中，不影响正式数据
+    work_dir = tempfile.mkdtemp(prefix='pornhub_load_test_')
+    OUTPUT_CONFIG['data_folder'] = os.path.join(work_dir, 'data')
+    db_path = os.path.join(work_dir, 'database', 'pornhub_videos.db')
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    from app import PornhubScraper
+
+    server = FixtureServer({
+        'port': 0,
+        'pages': args.pages,
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'burst_every': args.burst_every,
+        'burst_duration': args.burst_duration,
+    }, db_path=args.db)
+    if not args.no_rate_limit:
+        mirror_rate_limits(server)
+
+    scraper = None
+    try:
+        with server:
+            print(f"🚀 模拟服务器: {server.base_url}（{len(server.viewkeys)} 个视频，临时目录: {work_dir}）")
+            scraper = PornhubScraper(use_selenium=False, base_url=server.base_url, db_path=db_path, proxies={})
+            start_time = time.time()
+            result = scraper.optimized_run(max_pages=args.pages)
+            elapsed = time.time() - start_time
+            metrics = collect_metrics(scraper, server, result, elapsed)
+    finally:
+        if scraper:
+            scraper.db.close()
+        if args.keep:
+            print(f"📁 临时目录已保留: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(metrics, server)
+    if args.json:
+        metrics['settings'] = {
+            'fixture': server.config,
+            'overrides': overrides,
+            'rate_limited': not args.no_rate_limit,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.json}")
+
+    return 0 if result else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
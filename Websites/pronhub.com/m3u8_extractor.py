@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+M3U8地址提取
+详情页的所有解析路径（requests、浏览器标签页、异步抓取、从HTML数据库重新生成）共用：
+先直接解析flashvars中的mediaDefinitions JSON得到带质量和格式的播放地址，
+再对整个页面做一次预编译的字面量扫描补充其余m3u8地址（绝对地址和videoUrl/url键的值），用集合去重。
+
+直接运行本文件可以对比旧的逐个<script>多次正则扫描的耗时：
+    python m3u8_extractor.py [详情页HTML文件 ...]
+"""
+
+import json
+import re
+from collections import namedtuple
+
+# mediaDefinitions中的一个播放地址
+MediaDefinition = namedtuple('MediaDefinition', ['url', 'quality', 'format', 'default'])
+
+# 选择最佳地址时的质量优先级（URL中没有可用的数值质量时使用）
+QUALITY_PRIORITY = ['1080P', '720P', '480P', '240P']
+QUALITY_LABELS = QUALITY_PRIORITY + ['HD', 'SD']
+
+# 只搜索".m3u8"这个字面量（比在每个位置尝试整个URL正则快得多），命中后再向两边扩展到引号得到完整地址
+M3U8_PATTERN = re.compile(r'\.[mM]3[uU]8')
+# 命中所在的字符串是 "videoUrl"/"url" 键的值时，相对地址也算作m3u8地址
+KEY_PATTERN = re.compile(r'''["'](?:videoUrl|url)["']\s*:\s*["']$''', re.IGNORECASE)
+ABSOLUTE_PATTERN = re.compile(r'https?:(?:\\?/){2}', re.IGNORECASE)
+URL_TERMINATORS = re.compile(r'''["'\s<>]''')
+FLASHVARS_PATTERN = re.compile(r'flashvars_\d+\s*=\s*(?=\{)')
+
+_json_decoder = json.JSONDecoder()
+
+
+def _parse_quality(value):
+    """mediaDefinitions中的quality字段（"1080"、1080或列表）转换为整数，无法识别时返回None"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+def parse_media_definitions(html_content):
+    """解析页面中flashvars变量的mediaDefinitions
+
+    Args:
+        html_content: 详情页HTML源码
+
+    Returns:
+        list: MediaDefinition列表（按页面中的顺序），没有flashvars或JSON无法解析时返回空列表
+    """
+    definitions = []
+    for match in FLASHVARS_PATTERN.finditer(html_content):
+        try:
+            flashvars, _ = _json_decoder.raw_decode(html_content, match.end())
+        except ValueError:
+            continue
+        for item in flashvars.get('mediaDefinitions') or []:
+            if not isinstance(item, dict) or not isinstance(item.get('videoUrl'), str) or not item['videoUrl']:
+                continue
+            definitions.append(MediaDefinition(
+                url=item['videoUrl'],
+                quality=_parse_quality(item.get('quality')),
+                format=(item.get('format') or '').lower(),
+                default=bool(item.get('defaultQuality')),
+            ))
+    return definitions
+
+
+def extract_m3u8_urls(html_content, definitions=None):
+    """提取页面中的所有m3u8地址
+
+    Args:
+        html_content: 详情页HTML源码
+        definitions: 已解析的mediaDefinitions（为None时从html_content解析）
+
+    Returns:
+        list: 去重后的m3u8地址，mediaDefinitions中的地址在前，其余按在页面中出现的顺序
+    """
+    if definitions is None:
+        definitions = parse_media_definitions(html_content)
+
+    urls = []
+    seen = set()
+    for definition in definitions:
+        if '.m3u8' in definition.url.lower() and definition.url not in seen:
+            seen.add(definition.url)
+            urls.append(definition.url)
+
+    scanned_to = 0
+    for match in M3U8_PATTERN.finditer(html_content):
+        position = match.start()
+        if position < scanned_to:
+            continue
+
+        # 向两边扩展到引号、空白或尖括号
+        start = position
+        while start > 0 and not URL_TERMINATORS.match(html_content, start - 1):
+            start -= 1
+        terminator = URL_TERMINATORS.search(html_content, match.end())
+        end = terminator.start() if terminator else len(html_content)
+        scanned_to = end
+
+        candidate = html_content[start:end]
+        absolute = ABSOLUTE_PATTERN.search(candidate)
+        if absolute:
+            candidate = candidate[absolute.start():]
+        elif not KEY_PATTERN.search(html_content, max(0, start - 20), start):
+            continue
+
+        url = candidate.replace('\\/', '/')
+        if url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls
+
+
+def quality_label(url):
+    """从URL中推断质量标识（1080P、720P等），无法识别时返回None"""
+    for label in QUALITY_LABELS:
+        if label in url:
+            return label
+    return None
+
+
+def select_best_m3u8(m3u8_urls, definitions=None):
+    """选择最佳m3u8地址
+
+    优先使用mediaDefinitions中数值质量最高的HLS地址，其次按URL中的质量标识（1080P > 720P > ...），
+    都没有时使用第一个地址。
+
+    Returns:
+        str: 最佳地址，没有地址时返回空字符串
+    """
+    candidates = [d for d in definitions or [] if d.quality and d.url in m3u8_urls]
+    if candidates:
+        return max(candidates, key=lambda d: d.quality).url
+
+    for priority in QUALITY_PRIORITY:
+        for url in m3u8_urls:
+            if priority in url:
+                return url
+    return m3u8_urls[0] if m3u8_urls else ''
+
+
+def extract_m3u8(html_content):
+    """提取m3u8地址和最佳地址
+
+    Args:
+        html_content: 详情页HTML源码
+
+    Returns:
+        dict: {'m3u8_urls': 地址列表, 'best_m3u8_url': 最佳地址, 'media_definitions': MediaDefinition列表}
+    """
+    if not html_content:
+        return {'m3u8_urls': [], 'best_m3u8_url': '', 'media_definitions': []}
+    definitions = parse_media_definitions(html_content)
+    m3u8_urls = extract_m3u8_urls(html_content, definitions)
+    return {
+        'm3u8_urls': m3u8_urls,
+        'best_m3u8_url': select_best_m3u8(m3u8_urls, definitions),
+        'media_definitions': definitions,
+    }
+
+
+def _legacy_extract(soup):
+    """旧的提取方式（逐个<script>运行5个未编译的正则，列表去重），仅用于性能对比"""
+    m3u8_urls = []
+    for script in soup.find_all('script'):
+        script_content = script.string
+        if script_content:
+            m3u8_patterns = [
+                r'https?://[^"\']*\.m3u8[^"\']*',
+                r'"videoUrl":"([^"]*\.m3u8[^"]*)"',
+                r"'videoUrl':'([^']*\.m3u8[^']*)'",
+                r'"url":"([^"]*\.m3u8[^"]*)"',
+                r"'url':'([^']*\.m3u8[^']*)'",
+            ]
+            for pattern in m3u8_patterns:
+                for match in re.findall(pattern, script_content, re.IGNORECASE):
+                    if isinstance(match, tuple):
+                        match = match[0]
+                    if match and match not in m3u8_urls:
+                        m3u8_urls.append(match.replace('\\/', '/'))
+    return m3u8_urls
+
+
+def _sample_page(video_id=123456, filler_scripts=40):
+    """生成一个结构与详情页相近的测试页面（没有提供HTML文件时使用）"""
+    base = 'https:\\/\\/ev-h.phncdn.com\\/hls\\/videos\\/202401\\/01\\/%d' % video_id
+    definitions = [
+        {'defaultQuality': quality == 720, 'format': 'hls', 'quality': str(quality),
+         'videoUrl': f'{base}\\/{quality}P_4000K_{video_id}.mp4\\/master.m3u8?validfrom=1&validto=2&hash=abc'}
+        for quality in (1080, 720, 480, 240)
+    ]
+    definitions.append({'defaultQuality': False, 'format': 'mp4', 'quality': [],
+                        'videoUrl': 'https:\\/\\/cn.pornhub.com\\/video\\/get_media?s=abc&v=ph123'})
+    flashvars = json.dumps({'mediaDefinitions': definitions, 'video_duration': '600'}).replace('\\\\/', '\\/')
+    filler = ''.join(
+        f'<script>var cfg{i} = {{"key{i}": "{"x" * 400}", "list": [{", ".join(str(n) for n in range(60))}]}};</script>\n'
+        for i in range(filler_scripts)
+    )
+    body = ''.join(f'<div class="item"><a href="/view_video.php?viewkey=ph{i}">video {i}</a></div>\n' for i in range(300))
+    return (f'<html><head><title>sample</title>{filler}</head><body>{body}'
+            f'<script>var flashvars_{video_id} = {flashvars};\nvar player = true;</script></body></html>')
+
+
+def _benchmark(pages, rounds=20):
+    """对比旧的提取方式和extract_m3u8的平均单页耗时（不包括两者都需要的BeautifulSoup解析）"""
+    import time
+    from bs4 import BeautifulSoup
+
+    soups = [BeautifulSoup(page, 'html.parser') for page in pages]
+
+    for page, soup in zip(pages, soups):
+        legacy = set(_legacy_extract(soup))
+        current = set(extract_m3u8(page)['m3u8_urls'])
+        if not legacy <= current:
+            print(f"⚠️ 新的提取结果缺少 {len(legacy - current)} 个旧方式找到的地址")
+
+    def measure(func, items):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for item in items:
+                func(item)
+        return (time.perf_counter() - start) / (rounds * len(items))
+
+    legacy_time = measure(_legacy_extract, soups)
+    current_time = measure(extract_m3u8, pages)
+    print(f"页面数: {len(pages)}，每种方式运行 {rounds} 轮")
+    print(f"旧方式（逐个script多次正则）: {legacy_time * 1000:.3f} ms/页")
+    print(f"extract_m3u8（单次扫描）:    {current_time * 1000:.3f} ms/页")
+    print(f"加速: {legacy_time / max(current_time, 1e-9):.1f}x")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1:
+        sample_pages = []
+        for path in sys.argv[1:]:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                sample_pages.append(f.read())
+    else:
+        sample_pages = [_sample_page(video_id) for video_id in range(100000, 100010)]
+    _benchmark(sample_pages)